@@ -0,0 +1,111 @@
+"""Load test for the planning API: p50/p99 latency and throughput.
+
+    python benchmarks/bench_api.py                           # in-process, no server needed
+    python benchmarks/bench_api.py --url http://127.0.0.1:8000 --concurrency 32
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import http.client
+import json
+import sys
+import time
+import urllib.parse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from fitness_api import FitnessAPI, call  # noqa: E402
+from fitness_core import ACTIVITY_FACTORS, GOAL_ADJUSTMENT  # noqa: E402
+
+
+def synthetic_requests(count, distinct, seed=0):
+    """(path, body) pairs drawn from `distinct` profiles, so repeats exercise the response cache"""
+    rng = np.random.default_rng(seed)
+    profiles = [{
+        "sex": str(rng.choice(["Male", "Female"])),
+        "weight_kg": float(rng.integers(50, 120)),
+        "height_cm": float(rng.integers(150, 200)),
+        "age": int(rng.integers(18, 70)),
+        "activity_level": str(rng.choice(list(ACTIVITY_FACTORS))),
+        "goal": str(rng.choice(list(GOAL_ADJUSTMENT))),
+    } for _ in range(distinct)]
+    paths = ["/targets", "/meal-plan", "/meal-plan", "/workout-plan"]
+    out = []
+    for i in rng.integers(0, distinct, count):
+        path = paths[rng.integers(len(paths))]
+        body = ({"level": "beginner", "goal": profiles[i]["goal"]} if path == "/workout-plan"
+                else {**profiles[i], "solver": "greedy"} if path == "/meal-plan" else profiles[i])
+        out.append((path, body))
+    return out
+
+
+async def run_in_process(reqs, concurrency, workers):
+    app = FitnessAPI(workers=workers)
+    app.start()
+    queue = list(reversed(reqs))
+    latencies = []
+
+    async def client():
+        while queue:
+            path, body = queue.pop()
+            t0 = time.perf_counter()
+            status, _ = await call(app, "POST", path, body)
+            latencies.append(time.perf_counter() - t0)
+            assert status == 200, status
+
+    try:
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+    finally:
+        app.shutdown()
+    return latencies, app.cache.stats()
+
+
+def run_against(url, reqs, concurrency):
+    parsed = urllib.parse.urlsplit(url)
+
+    def client(chunk):
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80)
+        out = []
+        for path, body in chunk:
+            t0 = time.perf_counter()
+            conn.request("POST", path, json.dumps(body), {"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            resp.read()
+            out.append(time.perf_counter() - t0)
+            assert resp.status == 200, resp.status
+        conn.close()
+        return out
+
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as pool:
+        parts = pool.map(client, [reqs[i::concurrency] for i in range(concurrency)])
+        return [t for part in parts for t in part], None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--distinct", type=int, default=500, help="distinct profiles among the requests")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=None, help="in-process planning processes")
+    parser.add_argument("--url", help="benchmark a running server instead of an in-process app")
+    args = parser.parse_args()
+
+    reqs = synthetic_requests(args.requests, args.distinct)
+    started = time.perf_counter()
+    if args.url:
+        latencies, stats = run_against(args.url, reqs, args.concurrency)
+    else:
+        latencies, stats = asyncio.run(run_in_process(reqs, args.concurrency, args.workers))
+    elapsed = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000
+    print(f"{len(ms)} requests, concurrency {args.concurrency}: {len(ms) / elapsed:,.0f} req/s")
+    print(f"latency p50 {np.percentile(ms, 50):.2f} ms  p99 {np.percentile(ms, 99):.2f} ms  max {ms.max():.2f} ms")
+    if stats:
+        print(f"cache hit rate {stats['hit_rate']:.0%} ({stats['size']} entries)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Chart cost per rerun for each backend: build + serialize, cached vs uncached, and payload size.
+
+    python benchmarks/bench_charts.py
+
+"Marshal" is the work Streamlit does on every rerun for the chart element. For Plotly that is
+return_figure_from_figure_or_data plus plotly.io.to_json. For Vega-Lite it is json.dumps of the spec.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from fitness_core import calculate_tdee_and_targets, generate_meal_plan  # noqa: E402
+from plan_charts import BACKENDS, chart_cache, nutrition_charts  # noqa: E402
+
+
+def marshal(backend, chart):
+    if backend == "vega":
+        return json.dumps(chart)
+    import plotly.io
+    import plotly.tools
+    return plotly.io.to_json(plotly.tools.return_figure_from_figure_or_data(chart, validate_figure=True),
+                             validate=False)
+
+
+def per_call_ms(fn, repeat):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    targets = calculate_tdee_and_targets("Male", 80, 180, 30, "Moderate (3-5 days/week)", "Maintain weight")
+    plan = generate_meal_plan(targets["TargetCalories"], targets["Protein_g"], targets["Carbs_g"], targets["Fat_g"])
+    print(f"{'backend':8} {'uncached ms':>12} {'cached ms':>10} {'payload bytes':>14}")
+    for backend in BACKENDS:
+        cache = chart_cache()
+
+        def rerun(cache):
+            return [marshal(backend, c) for c in nutrition_charts(targets, plan, backend, cache)]
+
+        uncached = per_call_ms(lambda: rerun(None), args.repeat)
+        cached = per_call_ms(lambda: rerun(cache), args.repeat)
+        payload = sum(len(s.encode()) for s in rerun(cache))
+        print(f"{backend:8} {uncached:12.2f} {cached:10.3f} {payload:14,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Planning hot paths: throughput and peak memory by food-table size and batch size, with JSON baselines.
+
+    python benchmarks/bench_core.py --save benchmarks/baselines/main.json
+    python benchmarks/bench_core.py --baseline benchmarks/baselines/main.json [--threshold 0.2]
+
+Each case runs one batch of calls (e.g. 100 meal plans against a 100k-food table). The case time
+is the best of --repeat batches, which is the least noisy figure to compare. Peak memory is taken from a separate batch run under
+tracemalloc. When a baseline is given, any case whose time or peak memory grew by more than
+--threshold is reported and the exit status is 1. Food tables other than the built-in 15 foods
+are synthetic, with realistic calorie and macro ranges. The optimize solver stops at its time
+budget or when within tolerance, so its single-plan cases vary more than the others.
+"""
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from fitness_core import (  # noqa: E402
+    ACTIVITY_FACTORS, FOOD_DF, GOAL_ADJUSTMENT, ai_diet_suggestions, calculate_tdee_and_targets, generate_meal_plan,
+    generate_workout_plan,
+)
+from fitness_export import export_plan_csv  # noqa: E402
+from food_store import build_food_index  # noqa: E402
+from workout_program import cohort_loads  # noqa: E402
+
+FOOD_SIZES = (15, 1_000, 100_000)
+BATCH_SIZES = (1, 100)
+# growth below these is timer / allocator noise and never counts as a regression
+NOISE_FLOOR = {"seconds": 0.001, "peak_kb": 64}
+
+
+def synthetic_food_index(n, seed=0):
+    """Food table of n rows: macros drawn per food, calories from 4/4/9 plus a little noise"""
+    if n <= len(FOOD_DF):
+        return build_food_index(FOOD_DF.head(n))
+    rng = np.random.default_rng(seed)
+    protein = rng.gamma(1.5, 6.0, n)
+    carbs = rng.gamma(1.2, 15.0, n)
+    fat = rng.gamma(1.0, 6.0, n)
+    cal = (4 * protein + 4 * carbs + 9 * fat) * rng.uniform(0.95, 1.05, n)
+    return build_food_index(pd.DataFrame({
+        "name": [f"Food {i}" for i in range(n)],
+        "serving": rng.choice(["1 cup", "100 g", "1 medium", "2 tbsp", "1 slice"], n).astype(object),
+        "cal": cal.round(), "protein": protein.round(1), "carbs": carbs.round(1), "fat": fat.round(1),
+    }))
+
+
+def profiles(n, seed=0):
+    rng = np.random.default_rng(seed)
+    activity, goals = list(ACTIVITY_FACTORS), list(GOAL_ADJUSTMENT)
+    return [(str(rng.choice(["Male", "Female"])), float(rng.uniform(45, 120)), float(rng.uniform(150, 200)),
+             int(rng.integers(18, 70)), activity[rng.integers(len(activity))], goals[rng.integers(len(goals))])
+            for _ in range(n)]
+
+
+def cases(food_sizes, batch_sizes, time_budget):
+    """(name, foods, batch, fn) per case; fn runs the whole batch. Inputs are built before timing"""
+    for batch in batch_sizes:
+        people = profiles(batch)
+        all_targets = [calculate_tdee_and_targets(*p) for p in people]
+        yield "calculate_tdee_and_targets", None, batch, lambda people=people: [
+            calculate_tdee_and_targets(*p) for p in people]
+        yield "generate_workout_plan", None, batch, lambda people=people: [
+            generate_workout_plan(level, p[5]) for level, p in zip(["beginner", "intermediate", "advanced"] * batch,
+                                                                   people)]
+        cohort = pd.DataFrame(people, columns=["sex", "weight_kg", "height_cm", "age", "activity_level", "goal"])
+        cohort["experience"] = (["beginner", "intermediate", "advanced"] * batch)[:batch]
+        yield "cohort_loads[52 weeks]", None, batch, lambda cohort=cohort: cohort_loads(cohort, weeks=52)
+        for size in food_sizes:
+            foods = synthetic_food_index(size)
+            plans = [generate_meal_plan(t["TargetCalories"], t["Protein_g"], t["Carbs_g"], t["Fat_g"], foods=foods)
+                     for t in all_targets]
+            for solver in ("greedy", "optimize"):
+                yield f"generate_meal_plan[{solver}]", size, batch, lambda targets=all_targets, foods=foods, solver=solver: [
+                    generate_meal_plan(t["TargetCalories"], t["Protein_g"], t["Carbs_g"], t["Fat_g"], solver=solver,
+                                       time_budget=time_budget, foods=foods) for t in targets]
+            yield "ai_diet_suggestions", size, batch, lambda targets=all_targets, plans=plans: [
+                ai_diet_suggestions(t, p) for t, p in zip(targets, plans)]
+            yield "export_plan_csv", size, batch, lambda targets=all_targets, plans=plans: [
+                export_plan_csv(t, p, generated=datetime.datetime(2024, 1, 1)) for t, p in zip(targets, plans)]
+
+
+def case_key(name, foods, batch):
+    return f"{name} foods={foods if foods is not None else '-'} batch={batch}"
+
+
+def measure(fn, batch, repeat):
+    fn()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    seconds = min(times)
+    return {"seconds": seconds, "per_sec": batch / seconds if seconds else float("inf"), "peak_kb": peak / 1024}
+
+
+def regressions(results, baseline, threshold):
+    """Cases whose time or peak memory is more than threshold (and the noise floor) above the baseline"""
+    out = []
+    for key, now in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        for metric in ("seconds", "peak_kb"):
+            if now[metric] - before[metric] > max(before[metric] * threshold, NOISE_FLOOR[metric]):
+                out.append((key, metric, before[metric], now[metric]))
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--foods", type=int, nargs="+", default=FOOD_SIZES)
+    parser.add_argument("--batch", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--time-budget", type=float, default=0.05, help="optimize solver budget per plan, seconds")
+    parser.add_argument("--only", help="run only cases whose name contains this")
+    parser.add_argument("--save", help="write results as a JSON baseline")
+    parser.add_argument("--baseline", help="JSON baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown / memory growth")
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f"{'case':58} {'ms/batch':>10} {'calls/s':>10} {'peak KiB':>10}")
+    for name, foods, batch, fn in cases(args.foods, args.batch, args.time_budget):
+        if args.only and args.only not in name:
+            continue
+        key = case_key(name, foods, batch)
+        results[key] = r = measure(fn, batch, args.repeat)
+        print(f"{key:58} {r['seconds'] * 1000:10.2f} {r['per_sec']:10.1f} {r['peak_kb']:10.0f}", flush=True)
+
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        meta = {"created": datetime.datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                "numpy": np.__version__, "pandas": pd.__version__, "machine": platform.machine(),
+                "repeat": args.repeat, "time_budget": args.time_budget}
+        Path(args.save).write_text(json.dumps({"meta": meta, "results": results}, indent=1))
+        print(f"baseline written to {args.save}")
+    if args.baseline:
+        found = regressions(results, json.loads(Path(args.baseline).read_text())["results"], args.threshold)
+        for key, metric, before, now in found:
+            print(f"REGRESSION {key}: {metric} {before:.4g} -> {now:.4g} (+{now / before - 1 if before else 1:.0%})")
+        print(f"{len(found)} regressions over {args.threshold:.0%} against {args.baseline}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Food search latency benchmark.
+
+    python benchmarks/bench_food_search.py                 # synthetic 300k-food table
+    NOFIT_FOOD_STORE=food_store/ python benchmarks/bench_food_search.py
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from food_search import FoodSearchIndex  # noqa: E402
+from food_store import load_food_store  # noqa: E402
+
+WORDS = ("chicken breast thigh raw cooked roasted grilled beef ground lean pork salmon tuna canned rice brown white "
+         "bread whole wheat oats rolled yogurt greek plain milk skim cheese cheddar apple banana orange broccoli "
+         "spinach potato sweet baked fried egg large almonds peanut butter olive oil tofu firm quinoa lentils beans "
+         "black kidney pasta cereal granola bar protein shake chocolate vanilla strawberry").split()
+
+
+def synthetic_foods(n, seed=0):
+    rng = np.random.default_rng(seed)
+    words = np.array(WORDS)
+    lengths = rng.integers(2, 7, n)
+    names = [", ".join(rng.choice(words, k)) + f" {i}" for i, k in enumerate(lengths)]
+    servings = rng.choice(["1 cup", "100 g", "1 medium", "2 tbsp", "1 slice", "1 bar"], n).tolist()
+    return names, servings
+
+
+def queries(names, count, rng):
+    """Mix of typed prefixes, multi-word prefixes and one-typo words taken from real names"""
+    out = []
+    for name in rng.choice(names, count):
+        words = name.replace(",", "").split()
+        kind = rng.integers(3)
+        if kind == 0:
+            out.append(words[0][:rng.integers(1, len(words[0]) + 1)])
+        elif kind == 1:
+            out.append(" ".join(w[:4] for w in words[:2]))
+        else:
+            w = words[0]
+            i = rng.integers(len(w))
+            out.append(w[:i] + w[i + 1:] if len(w) > 3 else w)
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--foods", type=int, default=300_000)
+    parser.add_argument("--queries", type=int, default=5_000)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    store = os.environ.get("NOFIT_FOOD_STORE")
+    if store:
+        index = load_food_store(store)
+        names, servings = list(index.name), list(index.serving)
+    else:
+        names, servings = synthetic_foods(args.foods)
+
+    t0 = time.perf_counter()
+    search = FoodSearchIndex(names, servings)
+    build = time.perf_counter() - t0
+
+    qs = queries(names, args.queries, np.random.default_rng(1))
+    for q in qs[:100]:
+        search.search(q, args.limit)
+    times = np.empty(len(qs))
+    empty = 0
+    for i, q in enumerate(qs):
+        t = time.perf_counter()
+        found = search.search(q, args.limit)
+        times[i] = time.perf_counter() - t
+        empty += not len(found)
+
+    us = times * 1e6
+    print(f"foods={len(names)} vocab={len(search.vocab)} build={build:.2f}s queries={len(qs)} empty={empty}")
+    print(f"latency us: p50={np.percentile(us, 50):.0f} p90={np.percentile(us, 90):.0f} "
+          f"p99={np.percentile(us, 99):.0f} max={us.max():.0f} mean={us.mean():.0f}")
+
+
+if __name__ == "__main__":
+    main()
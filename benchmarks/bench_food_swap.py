@@ -0,0 +1,66 @@
+"""Food swap suggestion latency: KD-tree build and k-nearest alternatives against a brute-force scan.
+
+    python benchmarks/bench_food_swap.py [--foods 300000] [--queries 2000]
+    NOFIT_FOOD_STORE=food_store/ python benchmarks/bench_food_swap.py
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from bench_core import synthetic_food_index  # noqa: E402
+from bench_food_search import synthetic_foods  # noqa: E402
+from food_store import FoodIndex, load_food_store  # noqa: E402
+from food_swap import FoodSwapIndex, macro_profile  # noqa: E402
+from food_tags import infer_tags  # noqa: E402
+
+
+def percentiles(seconds):
+    ms = np.array(seconds) * 1000
+    return f"p50 {np.percentile(ms, 50):7.3f} ms  p99 {np.percentile(ms, 99):7.3f} ms"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--foods", type=int, default=300_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    store = os.environ.get("NOFIT_FOOD_STORE")
+    if store:
+        foods = load_food_store(store)
+    else:
+        names, servings = synthetic_foods(args.foods)
+        base = synthetic_food_index(args.foods)
+        foods = FoodIndex(np.array(names, dtype=object), np.array(servings, dtype=object), *base[2:-1],
+                          infer_tags(names))
+    t0 = time.perf_counter()
+    index = FoodSwapIndex(foods)
+    print(f"{len(foods):,} foods, tree built in {time.perf_counter() - t0:.2f} s")
+
+    rng = np.random.default_rng(0)
+    picks = rng.integers(0, len(foods), args.queries).tolist()
+    points = macro_profile(foods.nutrients)
+    cases = [
+        ("nearest (tree)", lambda i: index.nearest(points[i], args.k)),
+        ("nearest (full scan)", lambda i: np.argpartition(((points - points[i]) ** 2).sum(axis=1), args.k)[:args.k]),
+        ("alternatives", lambda i: index.alternatives(i, k=args.k)),
+        ("alternatives, vegan", lambda i: index.alternatives(i, k=args.k, restrictions=("Vegan",))),
+    ]
+    for name, fn in cases:
+        fn(picks[0])
+        times = []
+        for i in picks:
+            t0 = time.perf_counter()
+            fn(i)
+            times.append(time.perf_counter() - t0)
+        print(f"{name:22} {percentiles(times)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Dietary restriction filtering cost: tag bitmask test, restricted meal plans and restricted search.
+
+    python benchmarks/bench_food_tags.py [--foods 300000]
+
+Tags are drawn at random over all 64 bits of each food's tag word, so the filter sees as many tags
+as a store can hold. The bitmask test is timed with 1 to 64 forbidden bits to show that its cost
+depends on the number of foods only.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from bench_core import synthetic_food_index  # noqa: E402
+from bench_food_search import WORDS, synthetic_foods  # noqa: E402
+from fitness_core import calculate_tdee_and_targets, generate_meal_plan  # noqa: E402
+from food_search import FoodSearchIndex  # noqa: E402
+from food_store import FoodIndex  # noqa: E402
+from food_tags import allowed_foods, infer_tags  # noqa: E402
+
+
+def best_of(fn, repeat):
+    fn()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--foods", type=int, default=300_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(0)
+
+    tags = rng.integers(0, 2**63, args.foods, dtype=np.int64).astype(np.uint64) & \
+        rng.integers(0, 2**63, args.foods, dtype=np.int64).astype(np.uint64)
+    print(f"bitmask filter over {args.foods:,} foods")
+    print(f"{'forbidden tags':>15} {'ms':>8} {'ns/food':>8} {'allowed':>8}")
+    for bits in (1, 8, 32, 64):
+        forbidden = np.uint64((1 << bits) - 1 if bits < 64 else 2**64 - 1)
+        seconds = best_of(lambda: (tags & forbidden) == 0, args.repeat)
+        allowed = int(((tags & forbidden) == 0).sum())
+        print(f"{bits:15d} {seconds * 1000:8.2f} {seconds * 1e9 / args.foods:8.2f} {allowed:8,d}")
+
+    names, servings = synthetic_foods(args.foods)
+    t0 = time.perf_counter()
+    named_tags = infer_tags(names)
+    print(f"\ntagging {args.foods:,} names from keywords: {time.perf_counter() - t0:.2f} s")
+
+    foods = FoodIndex(*synthetic_food_index(args.foods)[:-1], named_tags)
+    targets = calculate_tdee_and_targets("Male", 80, 180, 30, "Moderate (3-5 days/week)", "Maintain weight")
+    daily = (targets["TargetCalories"], targets["Protein_g"], targets["Carbs_g"], targets["Fat_g"])
+    search = FoodSearchIndex(names, servings, named_tags)
+    queries = [str(w)[:k] for w, k in zip(rng.choice(WORDS, 200), rng.integers(2, 6, 200))]
+    print(f"\n{'restrictions':52} {'allowed':>8} {'mask ms':>8} {'greedy ms':>10} {'search ms':>10}")
+    for restrictions in ((), ("Vegetarian",), ("Vegan", "Gluten-free"), ("Vegan", "Gluten-free", "Nut-free",
+                                                                        "Soy-free", "Sesame-free")):
+        allowed = allowed_foods(foods.tags, restrictions)
+        mask_s = best_of(lambda: allowed_foods(foods.tags, restrictions), args.repeat)
+        greedy_s = best_of(lambda: generate_meal_plan(*daily, foods=foods, restrictions=restrictions), args.repeat)
+        search_s = best_of(lambda: [search.search(q, restrictions=restrictions) for q in queries], 3) / len(queries)
+        print(f"{', '.join(restrictions) or 'none':52} {len(foods) if allowed is None else int(allowed.sum()):8,d} "
+              f"{mask_s * 1000:8.2f} {greedy_s * 1000:10.2f} {search_s * 1000:10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Import-time budget check for the headless planning core.
+
+    python benchmarks/bench_import_time.py [--budget 1.0] [--runs 5]
+
+Each run imports fitness_core in a fresh interpreter. The check fails if the median import
+time exceeds the budget or if the import pulls in Streamlit or Plotly.
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+FORBIDDEN = ("streamlit", "plotly")
+PROBE = f"""
+import json, sys, time
+t = time.perf_counter()
+import fitness_core
+elapsed = time.perf_counter() - t
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {FORBIDDEN!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module_probe=PROBE):
+    out = subprocess.run([sys.executable, "-c", module_probe], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=1.0, help="max median import seconds")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = [measure() for _ in range(args.runs)]
+    times = sorted(r["seconds"] for r in results)
+    median = times[len(times) // 2]
+    loaded = sorted({m for r in results for m in r["loaded"]})
+    print(f"import fitness_core: median={median * 1000:.0f}ms min={times[0] * 1000:.0f}ms "
+          f"max={times[-1] * 1000:.0f}ms budget={args.budget * 1000:.0f}ms")
+    failed = False
+    if loaded:
+        print(f"FAIL: importing the core loaded UI packages: {', '.join(loaded)}")
+        failed = True
+    if median > args.budget:
+        print("FAIL: import time over budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
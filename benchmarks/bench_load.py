@@ -0,0 +1,172 @@
+"""Concurrent-session load test of fitness_streamlit.py: rerun latency, CPU, memory and saturation.
+
+    python benchmarks/bench_load.py [--sessions 1 2 4 8 16 32] [--flows 2] [--slo-ms 1000]
+
+Each simulated session is a Streamlit AppTest of the real script, so it runs headless in this process
+with no browser, server or network. Sessions share the process-wide caches the way server sessions
+do. A flow is one realistic visit:
+- page load
+- fill in the profile (age, weight, height, goal and experience drawn per session)
+- generate the nutrition plan
+- generate the workout plan
+- export the CSV (the same callable the download button serves)
+
+For each concurrency level all sessions run their flows at once on their own threads, again as
+under the server. The report gives per-step latency percentiles, reruns per second, CPU (cores
+busy and CPU ms per rerun) and the RSS each live session adds. AppTest always reruns the whole
+script, so latencies are an upper bound for fragment reruns in the browser. The saturation point
+is the first level where throughput grows by less than --min-gain, or where p95 latency passes --slo-ms.
+"""
+import argparse
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from fitness_export import export_plan_csv  # noqa: E402
+
+SCRIPT = ROOT / "fitness_streamlit.py"
+STEPS = ("page load", "profile", "nutrition plan", "workout plan", "export")
+
+
+def rss_mb():
+    """Current resident set size in MB (peak RSS where /proc is not available)"""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def _widget(elements, label):
+    return next(w for w in elements if w.label == label)
+
+
+class Session:
+    """One simulated user: an AppTest of the app plus the profile it enters"""
+
+    def __init__(self, seed, timeout):
+        from streamlit.testing.v1 import AppTest
+        self.at = AppTest.from_file(str(SCRIPT), default_timeout=timeout)
+        rng = np.random.default_rng(seed)
+        self.profile = {"Age": int(rng.integers(18, 70)), "Weight (kg)": round(float(rng.uniform(50, 110)), 1),
+                        "Height (cm)": round(float(rng.uniform(150, 195)), 1)}
+        self.goal = int(rng.integers(3))
+        self.experience = ["beginner", "intermediate", "advanced"][int(rng.integers(3))]
+
+    def _step(self, timings, name, fn):
+        start = time.perf_counter()
+        fn()
+        timings.append((name, time.perf_counter() - start))
+        if self.at.exception:
+            raise RuntimeError(f"{name}: {self.at.exception[0].message}")
+
+    def flow(self):
+        """One visit; returns [(step, seconds)]"""
+        at, timings = self.at, []
+        self._step(timings, "page load", at.run)
+
+        def fill_profile():
+            for label, value in self.profile.items():
+                _widget(at.number_input, label).set_value(value)
+            goal = _widget(at.selectbox, "Fitness Goal")
+            goal.set_value(goal.options[self.goal])
+            _widget(at.selectbox, "Experience Level").set_value(self.experience)
+            at.run()
+        self._step(timings, "profile", fill_profile)
+        self._step(timings, "nutrition plan", lambda: _widget(at.button, "NUTRITION PLAN").click().run())
+        self._step(timings, "workout plan", lambda: _widget(at.button, "WORKOUT PLAN").click().run())
+        self._step(timings, "export", lambda: export_plan_csv(at.session_state.targets, at.session_state.meal_plan))
+        return timings
+
+
+def run_level(n, flows, timeout, seed):
+    """Run n sessions concurrently; keeps the sessions alive until memory has been read"""
+    sessions = [Session(seed + i, timeout) for i in range(n)]
+    barrier = threading.Barrier(n)
+
+    def user(session):
+        barrier.wait()
+        return [t for _ in range(flows) for t in session.flow()]
+
+    rss0, cpu0, wall0 = rss_mb(), time.process_time(), time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        timings = [t for ts in pool.map(user, sessions) for t in ts]
+    wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+    rss_per_session = (rss_mb() - rss0) / n
+    reruns = sum(1 for name, _ in timings if name != "export")
+    all_ms = np.array([s for _, s in timings]) * 1000
+    return {
+        "sessions": n, "wall_s": wall, "reruns_per_s": reruns / wall, "cores": cpu / wall,
+        "cpu_ms_per_rerun": cpu * 1000 / reruns, "rss_mb_per_session": rss_per_session,
+        "p50_ms": float(np.percentile(all_ms, 50)), "p95_ms": float(np.percentile(all_ms, 95)),
+        "p99_ms": float(np.percentile(all_ms, 99)),
+        "steps": {step: np.array([s for name, s in timings if name == step]) * 1000 for step in STEPS},
+    }
+
+
+def saturation(levels, min_gain, slo_ms):
+    """(level, reason) where adding sessions stopped paying off, or None"""
+    for prev, cur in zip(levels, levels[1:]):
+        if cur["p95_ms"] > slo_ms:
+            return prev, f"p95 {cur['p95_ms']:.0f} ms over the {slo_ms:.0f} ms SLO at {cur['sessions']} sessions"
+        if cur["reruns_per_s"] < prev["reruns_per_s"] * (1 + min_gain):
+            return prev, f"throughput grew under {min_gain:.0%} from {prev['sessions']} to {cur['sessions']} sessions"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--flows", type=int, default=2, help="visits per session at each level")
+    parser.add_argument("--slo-ms", type=float, default=1000.0, help="p95 latency budget per step")
+    parser.add_argument("--min-gain", type=float, default=0.1, help="throughput growth that still counts as scaling")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds allowed per rerun")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # keep the load test's plan history out of the working directory
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["NOFIT_HISTORY_DB"] = str(Path(tmp.name) / "history.db")
+    os.chdir(ROOT)
+    import logging
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    # warm up imports, the theme lookup and the food index outside the measurements
+    Session(args.seed, args.timeout).flow()
+
+    levels = []
+    print(f"{'sessions':>8} {'reruns/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'cores':>6} "
+          f"{'CPU ms/rerun':>13} {'RSS MB/session':>15}")
+    for n in args.sessions:
+        r = run_level(n, args.flows, args.timeout, args.seed + 1000 * n)
+        levels.append(r)
+        print(f"{n:8d} {r['reruns_per_s']:9.1f} {r['p50_ms']:8.0f} {r['p95_ms']:8.0f} {r['p99_ms']:8.0f} "
+              f"{r['cores']:6.2f} {r['cpu_ms_per_rerun']:13.1f} {r['rss_mb_per_session']:15.2f}", flush=True)
+
+    print(f"\nper step at {levels[-1]['sessions']} sessions (ms)")
+    print(f"{'step':16} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for step, ms in levels[-1]["steps"].items():
+        print(f"{step:16} {statistics.median(ms):8.0f} {np.percentile(ms, 95):8.0f} {np.percentile(ms, 99):8.0f}")
+
+    found = saturation(levels, args.min_gain, args.slo_ms)
+    if found is None:
+        print(f"\nno saturation up to {levels[-1]['sessions']} sessions")
+    else:
+        level, reason = found
+        print(f"\nsaturates at about {level['sessions']} sessions ({level['reruns_per_s']:.1f} reruns/s): {reason}")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Plan history latency: save() cost on the caller and two-year history queries.
+
+    python benchmarks/bench_plan_history.py --users 200        # 730 daily plans per user
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from fitness_core import calculate_tdee_and_targets, generate_meal_plan  # noqa: E402
+from plan_history import PlanHistory  # noqa: E402
+
+DAY = 86400.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    profile = {"sex": "Male", "weight_kg": 80.0, "height_cm": 180.0, "age": 30,
+               "activity_level": "Moderate (3-5 days/week)", "goal": "Maintain weight"}
+    targets = calculate_tdee_and_targets(**profile)
+    plan = generate_meal_plan(targets["TargetCalories"], targets["Protein_g"], targets["Carbs_g"], targets["Fat_g"])
+    rows = plan.rows()
+    start = time.time() - args.days * DAY
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = PlanHistory(Path(tmp) / "history.db")
+        t0 = time.perf_counter()
+        for day in range(args.days):
+            for user in range(args.users):
+                store.save(f"user{user}", profile, targets, rows, created_at=start + day * DAY)
+        queued = time.perf_counter() - t0
+        store.flush()
+        total = args.days * args.users
+        print(f"{total:,} saves: {queued / total * 1e6:.1f} us each on the caller, "
+              f"{total / (time.perf_counter() - t0):,.0f} rows/s written")
+
+        for label, columns in [("all columns", None), ("progress chart", ("created_at", "weight_kg", "target_calories"))]:
+            rng = np.random.default_rng(0)
+            times = []
+            for user in rng.integers(0, args.users, args.queries):
+                t0 = time.perf_counter()
+                df = (store.history(f"user{user}", since=start) if columns is None
+                      else store.history(f"user{user}", since=start, columns=columns))
+                times.append(time.perf_counter() - t0)
+            assert len(df) == args.days
+            ms = np.array(times) * 1000
+            print(f"{args.days}-day history, {label}: p50 {np.percentile(ms, 50):.2f} ms  "
+                  f"p99 {np.percentile(ms, 99):.2f} ms")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Per-session plan memory: compact MealPlan against the old DataFrame of food dicts.
+
+    python benchmarks/bench_plan_memory.py --sessions 2000
+
+Builds one day plan and one week plan per simulated session and keeps them alive, as session state
+does. Memory is measured with tracemalloc and reported as bytes retained per session. The
+"food dicts" rows hold the same plans in the previous format, a DataFrame (or row dicts for the
+week) with an Items list of full food dicts per meal.
+"""
+import argparse
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from fitness_core import calculate_tdee_and_targets, generate_meal_plan  # noqa: E402
+from meal_plan import MealPlan  # noqa: E402
+from weekly_plan import WeeklyPlan  # noqa: E402
+
+
+def retained(build, n):
+    """Bytes per object kept alive by n calls of build"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build(i) for i in range(n)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=2000)
+    args = parser.parse_args()
+
+    targets = calculate_tdee_and_targets("Male", 80, 180, 30, "Moderate (3-5 days/week)", "Maintain weight")
+    plan = generate_meal_plan(targets["TargetCalories"], targets["Protein_g"], targets["Carbs_g"], targets["Fat_g"],
+                              solver="optimize")
+    week = WeeklyPlan(targets)
+
+    cases = [
+        ("day plan, food dicts", lambda i: plan.to_frame()),
+        ("day plan, MealPlan", lambda i: generate_meal_plan(
+            targets["TargetCalories"], targets["Protein_g"], targets["Carbs_g"], targets["Fat_g"])),
+        ("week plan, food dicts", lambda i: [d.rows() for d in week.days]),
+        ("week plan, MealPlan per day", lambda i: [
+            MealPlan(d.foods, d.meals, d.offsets.copy(), d.food_ids.copy(), d.servings.copy()) for d in week.days]),
+    ]
+    print(f"{'representation':28} {'bytes/session':>14}")
+    for name, build in cases:
+        print(f"{name:28} {retained(build, args.sessions):14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
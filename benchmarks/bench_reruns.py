@@ -0,0 +1,148 @@
+"""Rerun wall time and websocket payload per interaction with the running Streamlit app.
+
+    python benchmarks/bench_reruns.py [--repeat 5] [--port 8599]
+
+Starts fitness_streamlit.py on a local port and talks to it over its websocket the way the
+browser does. For each interaction it sends a rerun carrying the widget trigger (scoped to the
+widget's fragment, if it has one). It then times the interval until the run finishes and sums
+the bytes of every message the server sent back. A download button that ignores clicks costs no
+rerun at all; its file is fetched over HTTP. Needs `pip install websockets`.
+"""
+import argparse
+import asyncio
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DONE = (0, 3)   # FINISHED_SUCCESSFULLY, FINISHED_FRAGMENT_RUN_SUCCESSFULLY
+
+
+class StreamlitClient:
+    """One browser session: current widget values and where each widget was last drawn"""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.widgets = {}       # label -> (widget id, fragment id, clicking it skips the rerun)
+        self.values = {}        # widget id -> persistent WidgetState
+
+    async def run(self, trigger=None, value=None):
+        """Rerun with widget `trigger` clicked (or set to value); (seconds, bytes received, fragment id or None)"""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        fragment_id = ""
+        states = dict(self.values)
+        if trigger is not None:
+            widget_id, fragment_id, ignored = self.widgets[trigger]
+            if ignored:
+                return 0.0, 0, None
+            state = WidgetState(id=widget_id)
+            if value is None:
+                state.trigger_value = True
+            else:
+                setattr(state, "bool_value" if isinstance(value, bool) else "string_value", value)
+                self.values[widget_id] = states[widget_id] = state
+            states[widget_id] = state
+        msg = BackMsg()
+        msg.rerun_script.widget_states.widgets.extend(states.values())
+        msg.rerun_script.fragment_id = fragment_id
+        start = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        received = 0
+        while True:
+            data = await self.ws.recv()
+            received += len(data)
+            fwd = ForwardMsg()
+            fwd.ParseFromString(data)
+            kind = fwd.WhichOneof("type")
+            if kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                element = fwd.delta.new_element
+                widget = getattr(element, element.WhichOneof("type"))
+                if getattr(widget, "id", "") and getattr(widget, "label", ""):
+                    self.widgets[widget.label] = (widget.id, fwd.delta.fragment_id, getattr(widget, "ignore_rerun", False))
+            elif kind == "script_finished" and fwd.script_finished in DONE:
+                return time.perf_counter() - start, received, msg.rerun_script.fragment_id
+
+
+async def session(url):
+    import websockets
+    ws = await websockets.connect(url, subprotocols=["streamlit"], max_size=None)
+    client = StreamlitClient(ws)
+    return client, await client.run()
+
+
+INTERACTIONS = [
+    # (name, widget label, value, follow-up click on a widget that interaction revealed)
+    ("page load", None, None, None),
+    ("nutrition plan", "NUTRITION PLAN", None, None),
+    ("workout plan", "WORKOUT PLAN", None, None),
+    ("export to csv", "EXPORT TO CSV", None, "Download Plan"),
+    ("lightweight charts", "Lightweight charts", True, None),
+    ("plan my week", "PLAN MY WEEK", None, None),
+    ("regenerate day", "REGENERATE DAY", None, None),
+    ("food search", "Search foods", "chicken", None),
+]
+
+
+async def measure(url, repeat):
+    results = {name: [] for name, *_ in INTERACTIONS}
+    for _ in range(repeat):
+        client, first = await session(url)
+        results["page load"].append(first)
+        for name, label, value, follow_up in INTERACTIONS[1:]:
+            if label not in client.widgets:
+                continue
+            seconds, size, fragment = await client.run(label, value)
+            if follow_up in client.widgets:
+                more = await client.run(follow_up)
+                seconds, size = seconds + more[0], size + more[1]
+            results[name].append((seconds, size, fragment))
+        await client.ws.close()
+    return results
+
+
+def serve(port):
+    proc = subprocess.Popen([sys.executable, "-m", "streamlit", "run", "fitness_streamlit.py",
+                             "--server.headless", "true", "--server.port", str(port),
+                             "--server.enableXsrfProtection", "false", "--browser.gatherUsageStats", "false"],
+                            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1)
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("streamlit did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8599)
+    args = parser.parse_args()
+
+    proc = serve(args.port)
+    try:
+        results = asyncio.run(measure(f"ws://127.0.0.1:{args.port}/_stcore/stream", args.repeat))
+    finally:
+        proc.terminate()
+        proc.wait()
+    print(f"{'interaction':20} {'scope':9} {'median ms':>10} {'payload bytes':>14}")
+    for name, runs in results.items():
+        if not runs:
+            print(f"{name:20} {'-':9} {'not shown':>10}")
+            continue
+        scope = "none" if runs[-1][2] is None else "fragment" if runs[-1][2] else "full"
+        print(f"{name:20} {scope:9} {statistics.median(r[0] for r in runs) * 1000:10.1f} "
+              f"{int(statistics.median(r[1] for r in runs)):14,}")
+
+
+if __name__ == "__main__":
+    main()
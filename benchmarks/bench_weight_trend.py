@@ -0,0 +1,76 @@
+"""Adaptive TDEE cost: one incremental weigh-in update against recomputing a whole log, and chart downsampling.
+
+    python benchmarks/bench_weight_trend.py [--years 10] [--skip 0.3]
+
+The log is synthetic: a daily weigh-in with scale noise on top of slow gain and loss cycles, with
+a share of days skipped at random. update() is timed per weigh-in. estimate() and trend_frame() are timed
+on the whole log, which is what a page would redo on every weigh-in without the stored state.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from weight_trend import KCAL_PER_KG, downsample, estimate, start, trend_frame, update  # noqa: E402
+
+
+def best_of(fn, repeat):
+    fn()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def synthetic_log(years, skip, seed=0):
+    """(days, weights, intakes) of a weigh-in log with a true TDEE of 2600 kcal.
+
+    Weight cycles 6 kg either side of 85 kg every two years; intake is what that change costs, plus noise.
+    """
+    rng = np.random.default_rng(seed)
+    days = np.arange(years * 365) + 738000
+    days = days[(rng.random(len(days)) >= skip) | (days == days[0])]
+    phase = 2 * np.pi * (days - days[0]) / 730
+    true = 85 + 6 * np.sin(phase)
+    intakes = 2600 + KCAL_PER_KG * 6 * np.cos(phase) * 2 * np.pi / 730 + rng.normal(0, 150, len(days))
+    return days, true + rng.normal(0, 0.6, len(days)), intakes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--skip", type=float, default=0.3, help="share of days without a weigh-in")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    days, weights, intakes = synthetic_log(args.years, args.skip)
+    print(f"{len(days):,} weigh-ins over {args.years} years")
+
+    def incremental():
+        state = start(days[0], weights[0], 2500)
+        for d, w, i in zip(days[1:].tolist(), weights[1:].tolist(), intakes[1:].tolist()):
+            state = update(state, d, w, i)
+        return state
+
+    state = incremental()
+    log = estimate(days, weights, intakes, prior_tdee=2500)
+    assert np.isclose(log["tdee_kcal"].iloc[-1], state.tdee_kcal)
+    print(f"final trend {state.trend_kg:.1f} kg, estimated TDEE {state.tdee_kcal:.0f} kcal (true 2600)")
+
+    per_update = best_of(incremental, args.repeat) / (len(days) - 1)
+    full = best_of(lambda: estimate(days, weights, intakes, prior_tdee=2500), args.repeat)
+    frame = trend_frame(log)
+    print(f"\n{'update() per weigh-in':32} {per_update * 1e6:9.2f} us")
+    print(f"{'estimate() over the whole log':32} {full * 1000:9.2f} ms")
+    print(f"{'trend_frame()':32} {best_of(lambda: trend_frame(log), args.repeat) * 1000:9.2f} ms")
+    print(f"{'downsample() to 400 points':32} {best_of(lambda: downsample(frame), args.repeat) * 1000:9.2f} ms"
+          f"   ({len(frame):,} -> {len(downsample(frame))} rows)")
+
+
+if __name__ == "__main__":
+    main()
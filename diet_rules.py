@@ -0,0 +1,188 @@
+"""Declarative diet suggestion rules, compiled into vectorized predicates over many plans at once.
+
+A rule is a tip plus the conditions under which it applies (all must hold; none means always):
+- {"target": "TargetCalories", "gt": 0, "lt": 1600}: bounds on a daily target (gt/ge/lt/le)
+- {"food": "peanut butter", "meal": "Snack"}: a food in a meal (absent with "present": False)
+- {"share": "Fat_g", "gt": 0.35}: a macro's share of the plan's calories (4/4/9 kcal per gram)
+
+Foods match case-insensitively as substrings of item names. Meals match as case-insensitive
+prefixes, and an omitted meal means any meal. Unknown condition keys are rejected when the table is
+compiled, so a typo cannot turn into a condition that always holds. A RuleSet compiles the table once. Evaluating
+it flattens every plan into one item table and answers all rules for all plans with array
+operations, so coaching reports can run hundreds of rules over thousands of plans in one call.
+"""
+import numpy as np
+import pandas as pd
+
+from meal_plan import MealPlan
+
+TARGET_COLS = ("TargetCalories", "Protein_g", "Carbs_g", "Fat_g", "BMR", "TDEE")
+MACRO_COLS = ("Calories", "Protein_g", "Carbs_g", "Fat_g")
+KCAL_PER_G = {"Protein_g": 4, "Carbs_g": 4, "Fat_g": 9}
+BOUNDS = ("gt", "ge", "lt", "le")
+FOOD_KEYS = ("food", "meal", "present")
+
+DIET_RULES = [
+    {"id": "low_calories", "when": [{"target": "TargetCalories", "gt": 0, "lt": 1600}],
+     "tip": "Target calories are low — prioritize protein and nutrient-dense foods."},
+    {"id": "spread_protein", "when": [{"target": "Protein_g", "lt": 1}],
+     "tip": "Distribute protein across meals (20-30g per meal)."},
+    {"id": "peanut_butter_snack", "when": [{"food": "Peanut Butter", "meal": "Snack"}],
+     "tip": "Swap some peanut-butter snacks for Greek yogurt + berries."},
+    {"id": "low_protein_share", "when": [{"share": "Protein_g", "lt": 0.15}],
+     "tip": "Protein is under 15% of planned calories — add a lean protein source to a main meal."},
+    {"id": "high_fat_share", "when": [{"share": "Fat_g", "gt": 0.40}],
+     "tip": "Fat is over 40% of planned calories — go easier on oils, nuts and nut butters."},
+    {"id": "vegetables", "tip": "Include colored vegetables for vitamins and fiber."},
+    {"id": "hydration", "tip": "Stay hydrated (2-3 L/day depending on activity)."},
+    {"id": "dietitian", "tip": "For medical conditions, consult a dietitian."},
+]
+
+
+def _bounds(cond):
+    """(lo, hi, lo inclusive, hi inclusive) for a condition's gt/ge/lt/le keys"""
+    unknown = set(cond) - {"target", "share", *BOUNDS}
+    if unknown:
+        raise ValueError(f"unknown condition keys: {', '.join(sorted(unknown))}")
+    lo, lo_inc = (cond["ge"], True) if "ge" in cond else (cond.get("gt", -np.inf), False)
+    hi, hi_inc = (cond["le"], True) if "le" in cond else (cond.get("lt", np.inf), False)
+    return float(lo), float(hi), lo_inc, hi_inc
+
+
+class _RangeChecks:
+    """Many `lo < column[j] < hi` checks evaluated together against a (plans, columns) matrix"""
+
+    def __init__(self, columns, conds, key):
+        self.col = np.array([columns.index(c[key]) for c in conds], dtype=np.int64)
+        lo, hi, lo_inc, hi_inc = (np.array(v) for v in zip(*map(_bounds, conds))) if conds else [np.zeros(0)] * 4
+        self.lo, self.hi, self.lo_inc, self.hi_inc = lo, hi, lo_inc.astype(bool), hi_inc.astype(bool)
+
+    def __call__(self, values):
+        v = values[:, self.col]
+        with np.errstate(invalid="ignore"):
+            return (((v > self.lo) | (self.lo_inc & (v == self.lo))) &
+                    ((v < self.hi) | (self.hi_inc & (v == self.hi))))
+
+
+def _flatten(plans):
+    """One row per meal and one row per item across all plans: (meal arrays, item arrays)"""
+    meal_plan, meal_names, macros, counts, names = [], [], [], [], []
+    for p, plan in enumerate(plans):
+        if plan is None or len(plan) == 0:
+            continue
+        if isinstance(plan, MealPlan):
+            meals, rows = list(plan.meals), plan.totals()
+            meal_plan += [p] * len(meals)
+            meal_names += meals
+            macros.append(rows)
+            counts += np.diff(plan.offsets).tolist()
+            names += [plan.foods.name[i] for i in plan.food_ids.tolist()]
+            continue
+        if isinstance(plan, pd.DataFrame):
+            # one object array for the whole frame; per-column selection costs more than the rules
+            col = {c: i for i, c in enumerate(plan.columns)}
+            data = plan.to_numpy(dtype=object)
+            meals, items = data[:, col["Meal"]].tolist(), data[:, col["Items"]].tolist()
+            rows = np.array([data[:, col[c]] if c in col else np.full(len(data), np.nan) for c in MACRO_COLS],
+                            dtype=np.float64).T
+        else:
+            meals, items = [r["Meal"] for r in plan], [r.get("Items") or () for r in plan]
+            rows = np.array([[r.get(c, np.nan) for c in MACRO_COLS] for r in plan], dtype=np.float64)
+        meal_plan += [p] * len(meals)
+        meal_names += meals
+        macros.append(rows)
+        for its in items:
+            if not isinstance(its, (list, tuple, np.ndarray)):
+                raise TypeError(f"meal Items must be a list, not {type(its).__name__}")
+            counts.append(len(its))
+            names += [it["name"] if isinstance(it, dict) else str(it) for it in its]
+    macros = np.concatenate(macros) if macros else np.zeros((0, len(MACRO_COLS)))
+    return np.array(meal_plan, dtype=np.int64), meal_names, macros, np.array(counts, dtype=np.int64), names
+
+
+class RuleSet:
+    """A rule table compiled once; evaluate it against any number of (targets, plan) pairs"""
+
+    def __init__(self, rules=DIET_RULES):
+        self.rules = list(rules)
+        self.ids = [r.get("id", str(i)) for i, r in enumerate(self.rules)]
+        self.tips = np.array([r["tip"] for r in self.rules], dtype=object)
+        conds = [(i, c) for i, r in enumerate(self.rules) for c in r.get("when", ())]
+        kinds = {"target": [], "share": [], "food": []}
+        for i, c in conds:
+            kind = next((k for k in kinds if k in c), None)
+            if kind is None:
+                raise ValueError(f"rule {self.ids[i]!r}: condition needs one of target, share, food")
+            if kind == "share" and c["share"] not in KCAL_PER_G:
+                raise ValueError(f"rule {self.ids[i]!r}: share must be one of {', '.join(KCAL_PER_G)}")
+            if kind == "target" and c["target"] not in TARGET_COLS:
+                raise ValueError(f"rule {self.ids[i]!r}: target must be one of {', '.join(TARGET_COLS)}")
+            unknown = set(c) - set(FOOD_KEYS) if kind == "food" else set()
+            if unknown:
+                raise ValueError(f"rule {self.ids[i]!r}: unknown condition keys: {', '.join(sorted(unknown))}")
+            kinds[kind].append((i, c))
+        # condition columns are ordered target, share, food; membership maps each to its rule
+        order = kinds["target"] + kinds["share"] + kinds["food"]
+        self.membership = np.zeros((len(order), len(self.rules)), dtype=np.int32)
+        self.membership[np.arange(len(order)), [i for i, _ in order]] = 1
+        self.needed = self.membership.sum(axis=0)
+        self._targets = _RangeChecks(TARGET_COLS, [c for _, c in kinds["target"]], "target")
+        self._shares = _RangeChecks(tuple(KCAL_PER_G), [c for _, c in kinds["share"]], "share")
+        foods = [c for _, c in kinds["food"]]
+        self._food_patterns = [str(c["food"]).lower() for c in foods]
+        self._meal_patterns = [str(c.get("meal", "")).lower() for c in foods]
+        self._food_present = np.array([bool(c.get("present", True)) for c in foods], dtype=bool)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def fired(self, targets, plans):
+        """Boolean (plans, rules) matrix: which rules apply to each (targets, plan) pair"""
+        n = len(targets)
+        if len(plans) != n:
+            raise ValueError("targets and plans must have the same length")
+        held = np.concatenate([self._target_checks(targets), self._plan_checks(plans, n)], axis=1)
+        return (held.astype(np.int32) @ self.membership) == self.needed
+
+    def suggestions(self, targets, plans):
+        """Tips per plan, in rule table order"""
+        fired = self.fired(targets, plans)
+        return [self.tips[row].tolist() for row in fired]
+
+    ## predicates
+    def _target_checks(self, targets):
+        values = np.array([[(t or {}).get(c, 0) or 0 for c in TARGET_COLS] for t in targets],
+                          dtype=np.float64).reshape(len(targets), len(TARGET_COLS))
+        held = self._targets(values)
+        # an empty targets dict satisfies no target condition
+        held[[not t for t in targets]] = False
+        return held
+
+    def _plan_checks(self, plans, n):
+        meal_plan, meal_names, macros, item_counts, names = _flatten(plans)
+        # per-plan totals -> macro shares of calories
+        totals = np.zeros((n, len(MACRO_COLS)))
+        np.add.at(totals, meal_plan, np.nan_to_num(macros))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shares = np.stack([totals[:, MACRO_COLS.index(c)] * k / totals[:, 0] for c, k in KCAL_PER_G.items()],
+                              axis=1).reshape(n, len(KCAL_PER_G))
+        share_held = self._shares(shares)
+
+        f = len(self._food_patterns)
+        present = np.zeros((n, f), dtype=bool)
+        if f and names:
+            # match each distinct name and meal once, then look matches up per item
+            name_codes, name_vocab = pd.factorize(np.array(names, dtype=object))
+            meal_codes, meal_vocab = pd.factorize(np.array(meal_names, dtype=object))
+            lower_names = [str(v).lower() for v in name_vocab]
+            lower_meals = [str(v).lower() for v in meal_vocab]
+            food_match = np.array([[p in v for p in self._food_patterns] for v in lower_names], dtype=bool)
+            meal_match = np.array([[v.startswith(p) for p in self._meal_patterns] for v in lower_meals], dtype=bool)
+            item_meal = np.repeat(meal_codes, item_counts)
+            item_plan = np.repeat(meal_plan, item_counts)
+            hit = food_match[name_codes] & meal_match[item_meal]
+            np.logical_or.at(present, item_plan, hit)
+        return np.concatenate([share_held, present == self._food_present], axis=1)
+
+
+DEFAULT_RULESET = RuleSet()
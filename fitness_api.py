@@ -0,0 +1,329 @@
+"""HTTP API over the planning core, as a plain ASGI application.
+
+    python fitness_api.py --port 8000 --workers 4          # needs `pip install uvicorn`
+
+Endpoints (JSON in, JSON out):
+
+    POST /targets        {sex, weight_kg, height_cm, age, activity_level, goal}
+    POST /meal-plan      a profile, or {TargetCalories, Protein_g, Carbs_g, Fat_g}; optional meals, solver, time_budget
+    POST /workout-plan   {level, goal}
+    POST /suggestions    {targets, meal_plan}
+    GET  /health, GET /stats
+
+A POST body may also be a list of such objects, answered with a list in the same order; an item
+that fails validation comes back as {"error": ...} in its place. Planning runs in a process pool
+so the event loop only parses, caches and routes. Responses are cached per normalized request.
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import math
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from fitness_core import (
+    ACTIVITY_FACTORS, FOOD_STORE_PATH, GOAL_ADJUSTMENT, WORKOUT_TEMPLATES, ai_diet_suggestions,
+    calculate_tdee_and_targets, generate_workout_plan, load_food_fingerprint, meal_plan_rows,
+)
+from plan_cache import PlanCache, normalize_profile
+
+MAX_BATCH = 1000
+MAX_BODY = 4 * 1024 * 1024
+MAX_TIME_BUDGET = 1.0
+PROFILE_FIELDS = ("sex", "weight_kg", "height_cm", "age", "activity_level", "goal")
+TARGET_FIELDS = ("TargetCalories", "Protein_g", "Carbs_g", "Fat_g")
+DEFAULT_MEALS = ("Breakfast", "Lunch", "Dinner", "Snack")
+# inclusive ranges: the profile ones are the app's number_inputs, the target ones cover every plan they can yield
+LIMITS = {
+    "weight_kg": (30, 200), "height_cm": (100, 250), "age": (10, 100),
+    "TargetCalories": (200, 8000), "Protein_g": (0, 500), "Carbs_g": (0, 1200), "Fat_g": (0, 300),
+    "time_budget": (0, MAX_TIME_BUDGET),
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+## request handling, run in the worker pool
+def _require(payload, fields):
+    if not isinstance(payload, dict):
+        raise ValueError("expected a JSON object")
+    missing = [f for f in fields if f not in payload]
+    if missing:
+        raise ValueError(f"missing fields: {', '.join(missing)}")
+
+
+def _choice(payload, field, choices):
+    # checked as a string first: a list or object is not hashable and would raise TypeError on lookup
+    if not isinstance(payload[field], str) or payload[field] not in choices:
+        raise ValueError(f"{field} must be one of: {', '.join(choices)}")
+
+
+def _number(payload, field, default=None):
+    value = payload.get(field, default)
+    try:
+        if isinstance(value, bool):
+            raise TypeError
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be a number") from None
+    lo, hi = LIMITS[field]
+    # NaN fails both comparisons, so isfinite has to be checked on its own
+    if not math.isfinite(value) or not lo <= value <= hi:
+        raise ValueError(f"{field} must be between {lo:g} and {hi:g}")
+    return value
+
+
+def _profile(payload):
+    _require(payload, PROFILE_FIELDS)
+    _choice(payload, "activity_level", ACTIVITY_FACTORS)
+    _choice(payload, "goal", GOAL_ADJUSTMENT)
+    numbers = {f: _number(payload, f) for f in ("weight_kg", "height_cm", "age")}
+    return normalize_profile(**{**{f: payload[f] for f in PROFILE_FIELDS}, **numbers})
+
+
+def targets(payload):
+    return calculate_tdee_and_targets(**_profile(payload))
+
+
+def meal_plan(payload):
+    _require(payload, ())
+    if all(f in payload for f in TARGET_FIELDS):
+        t = {f: payload[f] for f in TARGET_FIELDS}
+        calories, protein, carbs, fat = (_number(payload, f) for f in TARGET_FIELDS)
+    else:
+        t = targets(payload)
+        calories, protein, carbs, fat = (float(t[f]) for f in TARGET_FIELDS)
+    meals = payload.get("meals", DEFAULT_MEALS)
+    if not isinstance(meals, (list, tuple)) or not all(isinstance(m, str) for m in meals):
+        raise ValueError("meals must be a list of meal names")
+    solver = payload.get("solver", "optimize")
+    if solver not in ("greedy", "optimize"):
+        raise ValueError("solver must be 'greedy' or 'optimize'")
+    restrictions = payload.get("restrictions", ())
+    if not isinstance(restrictions, (list, tuple)) or not all(isinstance(r, str) for r in restrictions):
+        raise ValueError("restrictions must be a list of dietary restriction names")
+    time_budget = _number(payload, "time_budget", 0.2)
+    rows = meal_plan_rows(calories, protein, carbs, fat, meals=tuple(meals), solver=solver, time_budget=time_budget,
+                          restrictions=tuple(restrictions))
+    return {"targets": t, "meal_plan": rows}
+
+
+def workout_plan(payload):
+    _require(payload, ("level", "goal"))
+    _choice(payload, "level", WORKOUT_TEMPLATES)
+    return [{"day": day, "exercises": exercises} for day, exercises in generate_workout_plan(payload["level"],
+                                                                                            str(payload["goal"]))]
+
+
+def suggestions(payload):
+    _require(payload, ("targets",))
+    rows = payload.get("meal_plan")
+    try:
+        return ai_diet_suggestions(payload["targets"] or {}, pd.DataFrame(rows) if rows else None)
+    except (AttributeError, KeyError, TypeError):
+        raise ValueError("meal_plan must be a list of rows with Meal and Items (food objects with a name)") from None
+
+
+ROUTES = {
+    "/targets": targets,
+    "/meal-plan": meal_plan,
+    "/workout-plan": workout_plan,
+    "/suggestions": suggestions,
+}
+
+
+def handle_many(path, payloads):
+    """Results for a list of payloads, with {"error": ...} in place of invalid ones"""
+    handler = ROUTES[path]
+    out = []
+    for payload in payloads:
+        try:
+            out.append(handler(payload))
+        except ValueError as exc:
+            out.append({"error": str(exc)})
+        except (TypeError, KeyError) as exc:
+            # a field of a type the validation above missed; still this item's error, not the batch's
+            out.append({"error": f"invalid request: {type(exc).__name__}: {exc}"})
+    return out
+
+
+def _cache_key(path, payload):
+    if path in ("/targets", "/meal-plan") and isinstance(payload, dict) and all(f in payload for f in PROFILE_FIELDS):
+        try:
+            payload = {**payload, **_profile(payload)}
+        except ValueError:
+            pass
+    return path, json.dumps(payload, sort_keys=True, default=str)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+## ASGI application
+class FitnessAPI:
+    """ASGI app; workers=0 plans on the default thread pool instead of a process pool (for tests)"""
+
+    def __init__(self, workers=None, cache=None):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.cache = cache if cache is not None else PlanCache(maxsize=16384, ttl=6 * 3600)
+        self.executor = None
+        self.requests = 0
+
+    def start(self):
+        self.cache.bind(load_food_fingerprint(FOOD_STORE_PATH))
+        if self.workers and self.executor is None:
+            self.executor = concurrent.futures.ProcessPoolExecutor(self.workers)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        self.requests += 1
+        try:
+            status, result = 200, await self._dispatch(scope, receive)
+        except HTTPError as exc:
+            status, result = exc.status, {"error": str(exc)}
+        except Exception as exc:
+            status, result = 500, {"error": f"{type(exc).__name__}: {exc}"}
+        try:
+            body = json.dumps(result, default=_json_default, allow_nan=False).encode("utf-8")
+        except ValueError as exc:
+            # NaN and Infinity are not JSON; never send them as if they were
+            status, body = 500, json.dumps({"error": f"unserializable result: {exc}"}).encode("utf-8")
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _dispatch(self, scope, receive):
+        path, method = scope["path"].rstrip("/") or "/", scope["method"]
+        if path == "/health":
+            return {"status": "ok"}
+        if path == "/stats":
+            return {"requests": self.requests, "workers": self.workers, "cache": self.cache.stats()}
+        if path not in ROUTES:
+            raise HTTPError(404, f"no such endpoint: {path}")
+        if method != "POST":
+            raise HTTPError(405, f"{path} only accepts POST")
+        try:
+            payload = json.loads(await _read_body(receive) or b"null")
+        except ValueError:
+            raise HTTPError(400, "request body is not valid JSON") from None
+        batched = isinstance(payload, list)
+        payloads = payload if batched else [payload]
+        if len(payloads) > MAX_BATCH:
+            raise HTTPError(413, f"at most {MAX_BATCH} items per request")
+        results = await self._plan(path, payloads)
+        if not batched and isinstance(results[0], dict) and set(results[0]) == {"error"}:
+            raise HTTPError(400, results[0]["error"])
+        return results if batched else results[0]
+
+    async def _plan(self, path, payloads):
+        """Cached results for payloads; misses are planned in the pool, split across the workers"""
+        if self.workers and self.executor is None:
+            self.start()
+        self.cache.bind(load_food_fingerprint(FOOD_STORE_PATH))
+        generation = self.cache.generation
+        keys = [_cache_key(path, p) for p in payloads]
+        missing = object()
+        results = [self.cache.get(k, missing) for k in keys]
+        todo = {}
+        for i, (key, result) in enumerate(zip(keys, results)):
+            if result is missing:
+                todo.setdefault(key, []).append(i)
+        if todo:
+            todo_keys = list(todo)
+            todo_payloads = [payloads[todo[k][0]] for k in todo_keys]
+            step = max(1, -(-len(todo_payloads) // max(self.workers, 1)))
+            loop = asyncio.get_running_loop()
+            parts = await asyncio.gather(*(loop.run_in_executor(self.executor, handle_many, path,
+                                                                todo_payloads[i:i + step])
+                                           for i in range(0, len(todo_payloads), step)))
+            for key, result in zip(todo_keys, (r for part in parts for r in part)):
+                if not (isinstance(result, dict) and set(result) == {"error"}):
+                    self.cache.put(key, result, generation)
+                for i in todo[key]:
+                    results[i] = result
+        return results
+
+
+async def _read_body(receive):
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY:
+            raise HTTPError(413, "request body too large")
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def call(app, method, path, body=None):
+    """Send one request through app in-process; returns (status, decoded JSON)"""
+    raw = b"" if body is None else json.dumps(body).encode("utf-8")
+    sent, response = False, {}
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": raw, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        else:
+            response["body"] = response.get("body", b"") + message.get("body", b"")
+
+    scope = {"type": "http", "method": method, "path": path, "headers": [], "query_string": b""}
+    await app(scope, receive, send)
+    return response["status"], json.loads(response["body"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None, help="planning processes (default: CPU count)")
+    args = parser.parse_args(argv)
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("serving the API requires `pip install uvicorn`") from None
+    uvicorn.run(FitnessAPI(workers=args.workers), host=args.host, port=args.port, lifespan="on")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
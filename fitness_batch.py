@@ -0,0 +1,217 @@
+"""Batch plan generation for bulk onboarding.
+
+    python fitness_batch.py profiles.csv plans.jsonl --workers 8
+
+Profiles are read from CSV or JSON Lines with the columns sex, weight_kg, height_cm, age,
+activity_level and goal. The optional columns are experience (workout level, default beginner),
+user_id and restrictions (dietary restriction names such as "Vegan;Nut-free", or a list in JSON
+Lines). A row with an unknown restriction name is written as a record with an "error" field instead
+of a plan, so one bad row never stops the job. With --suggestions each record also gets its diet
+tips, evaluated for a whole chunk at once. Work is fanned out to a process pool in chunks. Results are written as JSON Lines
+in input order as each chunk finishes. A checkpoint next to the output records progress, so an
+interrupted job continues where it stopped when rerun with the same arguments.
+"""
+import argparse
+import collections
+import concurrent.futures
+import functools
+import itertools
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from diet_rules import DEFAULT_RULESET
+from fitness_core import calculate_tdee_and_targets_batch, generate_meal_plan, generate_workout_plan
+from food_tags import restriction_mask
+
+PROFILE_COLS = ["sex", "weight_kg", "height_cm", "age", "activity_level", "goal"]
+
+
+def read_profiles(path, chunksize, skip=0):
+    """Yield DataFrames of at most chunksize profiles, skipping the first skip profiles.
+
+    skip counts records as the chunks count them, so blank lines never shift a resumed job.
+    """
+    path = Path(path)
+    if path.suffix in (".jsonl", ".ndjson"):
+        with open(path, encoding="utf-8") as fh:
+            lines = itertools.islice((line for line in fh if line.strip()), skip, None)
+            while True:
+                batch = list(itertools.islice(lines, chunksize))
+                if not batch:
+                    return
+                yield pd.DataFrame([json.loads(line) for line in batch])
+    else:
+        # read_csv drops blank lines itself, so skip whole data rows from its chunks rather than raw lines
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            if skip >= len(chunk):
+                skip -= len(chunk)
+                continue
+            yield chunk.iloc[skip:]
+            skip = 0
+
+
+def _restrictions(value):
+    """Sorted tuple of restriction names from a "a;b" cell, a list or a missing value; ValueError on unknown names"""
+    if isinstance(value, (list, tuple)):
+        names = value
+    elif value is None or pd.isna(value):
+        names = ()
+    else:
+        names = str(value).replace(",", ";").split(";")
+    names = tuple(sorted({str(n).strip() for n in names if str(n).strip()}))
+    restriction_mask(names)
+    return names
+
+
+@functools.lru_cache(maxsize=4096)
+def _meal_plan(targets, solver, time_budget, restrictions=()):
+    """Meal plan rows for a targets tuple; identical targets within a worker are planned once"""
+    calories, protein, carbs, fat = targets
+    plan = generate_meal_plan(calories, protein, carbs, fat, solver=solver, time_budget=time_budget,
+                              restrictions=restrictions)
+    return [{
+        "Meal": meal,
+        "Items": labels,
+        "Calories": int(t[0]),
+        "Protein_g": t[1],
+        "Carbs_g": t[2],
+        "Fat_g": t[3],
+    } for meal, labels, t in zip(plan.meals, plan.item_labels(), plan.totals().tolist())]
+
+
+@functools.lru_cache(maxsize=64)
+def _workout_plan(level, goal):
+    return [{"day": day, "exercises": exercises} for day, exercises in generate_workout_plan(level, goal)]
+
+
+def plan_chunk(start, profiles, solver="greedy", time_budget=0.2, suggestions=False):
+    """JSON lines for one chunk of profiles (a DataFrame), numbered from start"""
+    targets = calculate_tdee_and_targets_batch(profiles)
+    experience = profiles["experience"] if "experience" in profiles else itertools.repeat("beginner")
+    user_ids = profiles["user_id"] if "user_id" in profiles else itertools.repeat(None)
+    restrictions = profiles["restrictions"] if "restrictions" in profiles else itertools.repeat(None)
+    records = []
+    for row, t, goal, level, user_id, diet in zip(itertools.count(start), targets.to_dict("records"),
+                                                  profiles["goal"], experience, user_ids, restrictions):
+        record = {"row": row, "user_id": None if pd.isna(user_id) else user_id}
+        try:
+            diet = _restrictions(diet)
+        except ValueError as exc:
+            records.append({**record, "error": str(exc)})
+            continue
+        t = {k: int(v) for k, v in t.items()}
+        records.append({**record, "targets": t,
+                        "meal_plan": _meal_plan((t["TargetCalories"], t["Protein_g"], t["Carbs_g"], t["Fat_g"]),
+                                                solver, time_budget, diet),
+                        "workout_plan": _workout_plan(str(level), str(goal))})
+    planned = [r for r in records if "error" not in r]
+    if suggestions and planned:
+        tips = DEFAULT_RULESET.suggestions([r["targets"] for r in planned], [r["meal_plan"] for r in planned])
+        for record, t in zip(planned, tips):
+            record["suggestions"] = t
+    lines = [json.dumps(record, default=str) for record in records]
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def _load_checkpoint(path, source):
+    try:
+        ckpt = json.loads(Path(path).read_text())
+    except FileNotFoundError:
+        return None
+    if ckpt.get("input") != str(Path(source).resolve()):
+        raise SystemExit(f"checkpoint {path} belongs to {ckpt.get('input')}; use --restart to overwrite")
+    return ckpt
+
+
+def _save_checkpoint(path, source, rows_done, output_bytes):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as fh:
+        json.dump({"input": str(Path(source).resolve()), "rows_done": rows_done, "output_bytes": output_bytes}, fh)
+    os.replace(tmp, path)
+
+
+def run_batch(source, output, workers=None, chunksize=2000, solver="greedy", time_budget=0.2,
+              restart=False, progress=sys.stderr, suggestions=False):
+    """Plan every profile in source into output (JSON Lines), resuming from the checkpoint if present.
+
+    At most two chunks per worker are in flight, so memory stays flat however large the input is.
+    Returns the total number of rows written.
+    """
+    checkpoint = f"{output}.ckpt"
+    ckpt = None if restart else _load_checkpoint(checkpoint, source)
+    rows_done = ckpt["rows_done"] if ckpt else 0
+    out = open(output, "r+b" if ckpt else "wb")
+    out.truncate(ckpt["output_bytes"] if ckpt else 0)
+    out.seek(0, os.SEEK_END)
+    if ckpt and progress:
+        print(f"resuming after {rows_done} rows", file=progress)
+
+    workers = workers or os.cpu_count() or 1
+    pool = concurrent.futures.ProcessPoolExecutor(workers) if workers > 1 else None
+    pending = collections.deque()
+    started, resumed_from = time.perf_counter(), rows_done
+
+    def flush_one():
+        nonlocal rows_done
+        n, future = pending.popleft()
+        out.write((future.result() if pool else future).encode("utf-8"))
+        out.flush()
+        rows_done += n
+        _save_checkpoint(checkpoint, source, rows_done, out.tell())
+        if progress:
+            rate = (rows_done - resumed_from) / max(time.perf_counter() - started, 1e-9)
+            print(f"{rows_done} rows done ({rate:,.0f} rows/s)", file=progress)
+
+    try:
+        start = rows_done
+        for chunk in read_profiles(source, chunksize, skip=rows_done):
+            missing = [c for c in PROFILE_COLS if c not in chunk]
+            if missing:
+                raise ValueError(f"{source} is missing profile columns: {', '.join(missing)}")
+            job = (pool.submit(plan_chunk, start, chunk, solver, time_budget, suggestions) if pool
+                   else plan_chunk(start, chunk, solver, time_budget, suggestions))
+            pending.append((len(chunk), job))
+            start += len(chunk)
+            while len(pending) >= 2 * workers:
+                flush_one()
+        while pending:
+            flush_one()
+    finally:
+        for _, job in pending:
+            if pool:
+                job.cancel()
+        if pool:
+            pool.shutdown(cancel_futures=True)
+        out.close()
+    return rows_done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="profiles as .csv or .jsonl")
+    parser.add_argument("output", help="plans as .jsonl; <output>.ckpt holds the resume checkpoint")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=2000)
+    parser.add_argument("--solver", choices=["greedy", "optimize"], default="greedy")
+    parser.add_argument("--time-budget", type=float, default=0.2, help="optimize solver seconds per plan")
+    parser.add_argument("--suggestions", action="store_true", help="add diet tips to every record")
+    parser.add_argument("--restart", action="store_true", help="ignore any checkpoint and start over")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(argv)
+    try:
+        total = run_batch(args.input, args.output, args.workers, args.chunksize, args.solver, args.time_budget,
+                          args.restart, None if args.quiet else sys.stderr, args.suggestions)
+    except KeyboardInterrupt:
+        print("interrupted; rerun the same command to resume", file=sys.stderr)
+        return 130
+    print(f"wrote {total} plans to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
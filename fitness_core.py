@@ -0,0 +1,365 @@
+"""Planning core: targets, meal and workout plans and diet suggestions, with no UI side effects.
+
+Importable by workers, batch jobs and tests without Streamlit or Plotly.
+"""
+import functools
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from diet_rules import DEFAULT_RULESET
+from food_store import build_food_index, food_index_fingerprint, load_food_store
+from food_tags import allowed_foods
+from meal_plan import MealPlan
+
+## creating a static food dataframe
+## built-in fallback when no USDA food store is configured
+FOOD_DB = [
+    {"name": "Oats (1 cup cooked)", "cal": 150, "protein": 5, "carbs": 27, "fat": 3, "serving": "1 cup"},
+    {"name": "Egg (large)", "cal": 78, "protein": 6, "carbs": 0.6, "fat": 5, "serving": "1 egg"},
+    {"name": "Greek Yogurt (200g)", "cal": 120, "protein": 20, "carbs": 6, "fat": 0, "serving": "200 g"},
+    {"name": "Chicken Breast (100g)", "cal": 165, "protein": 31, "carbs": 0, "fat": 3.6, "serving": "100 g"},
+    {"name": "Brown Rice (1 cup cooked)", "cal": 215, "protein": 5, "carbs": 45, "fat": 1.8, "serving": "1 cup"},
+    {"name": "Broccoli (1 cup)", "cal": 55, "protein": 3.7, "carbs": 11.2, "fat": 0.6, "serving": "1 cup"},
+    {"name": "Salmon (100g)", "cal": 208, "protein": 20, "carbs": 0, "fat": 13, "serving": "100 g"},
+    {"name": "Almonds (28g)", "cal": 164, "protein": 6, "carbs": 6, "fat": 14, "serving": "28 g"},
+    {"name": "Apple (medium)", "cal": 95, "protein": 0.5, "carbs": 25, "fat": 0.3, "serving": "1 medium"},
+    {"name": "Peanut Butter (2 tbsp)", "cal": 188, "protein": 8, "carbs": 7, "fat": 16, "serving": "2 tbsp"},
+    {"name": "Whole Wheat Bread (1 slice)", "cal": 70, "protein": 3.6, "carbs": 12, "fat": 1, "serving": "1 slice"},
+    {"name": "Banana (medium)", "cal": 105, "protein": 1.3, "carbs": 27, "fat": 0.3, "serving": "1 medium"},
+    {"name": "Tofu (100g)", "cal": 76, "protein": 8, "carbs": 1.9, "fat": 4.8, "serving": "100 g"},
+    {"name": "Olive Oil (1 tbsp)", "cal": 119, "protein": 0, "carbs": 0, "fat": 13.5, "serving": "1 tbsp"},
+    {"name": "Quinoa (1 cup cooked)", "cal": 222, "protein": 8, "carbs": 39, "fat": 3.6, "serving": "1 cup"},
+]
+# dietary tags of the built-in foods, as food_tags.FOOD_TAGS names; foods not listed have none
+FOOD_DB_TAGS = {
+    "Oats (1 cup cooked)": ["gluten"], "Egg (large)": ["egg"], "Greek Yogurt (200g)": ["dairy"],
+    "Chicken Breast (100g)": ["poultry"], "Salmon (100g)": ["fish"], "Almonds (28g)": ["tree_nuts"],
+    "Peanut Butter (2 tbsp)": ["peanuts"], "Whole Wheat Bread (1 slice)": ["gluten"], "Tofu (100g)": ["soy"],
+}
+FOOD_DF = pd.DataFrame(FOOD_DB).assign(tags=[FOOD_DB_TAGS.get(f["name"], []) for f in FOOD_DB])
+# point NOFIT_FOOD_STORE at a store built by `python food_store.py <fdc dump> <dir>` to use USDA data
+FOOD_STORE_PATH = os.environ.get("NOFIT_FOOD_STORE")
+
+
+# these live in an imported module, so one food table + search index is shared by the whole process
+@functools.lru_cache(maxsize=None)
+def load_food_index(path=None):
+    return load_food_store(path) if path else build_food_index(FOOD_DF)
+
+
+@functools.lru_cache(maxsize=None)
+def load_food_search(path=None):
+    from food_search import FoodSearchIndex
+    return FoodSearchIndex.from_food_index(load_food_index(path))
+
+
+@functools.lru_cache(maxsize=None)
+def load_food_swaps(path=None):
+    from food_swap import FoodSwapIndex
+    return FoodSwapIndex(load_food_index(path))
+
+
+@functools.lru_cache(maxsize=None)
+def load_food_fingerprint(path=None):
+    return food_index_fingerprint(load_food_index(path))
+
+
+def __getattr__(name):
+    # FOOD_INDEX is loaded on first use so importing the core never touches the food store
+    if name == "FOOD_INDEX":
+        return load_food_index(FOOD_STORE_PATH)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+## activity and goals
+ACTIVITY_FACTORS = {
+    "Sedentary (little or no exercise)": 1.2,
+    "Light (1-3 days/week)": 1.375,
+    "Moderate (3-5 days/week)": 1.55,
+    "Active (6-7 days/week)": 1.725,
+    "Very active (hard exercise & physical work)": 1.9
+}
+GOAL_ADJUSTMENT = {
+    "Lose weight (cut 20%)": 0.80,
+    "Maintain weight": 1.00,
+    "Gain weight (bulk 15%)": 1.15
+}
+
+
+## main logic
+def calculate_bmr(sex: str, weight_kg: float, height_cm: float, age: int) -> float:
+    if str(sex).lower().startswith('m'):
+        return 10 * weight_kg + 6.25 * height_cm - 5 * age + 5
+    return 10 * weight_kg + 6.25 * height_cm - 5 * age - 161
+
+
+def protein_per_kg(goal):
+    return 2.0 if "Lose" in goal else 1.8 if "Gain" in goal else 1.6
+
+
+def calculate_tdee_and_targets(sex, weight_kg, height_cm, age, activity_level, goal):
+    bmr = calculate_bmr(sex, weight_kg, height_cm, age)
+    activity_factor = ACTIVITY_FACTORS.get(activity_level, 1.375)
+    tdee = bmr * activity_factor
+    target_calories = tdee * GOAL_ADJUSTMENT.get(goal, 1.0)
+    protein_g = round(protein_per_kg(goal) * weight_kg)
+    fat_cals = 0.25 * target_calories
+    fat_g = round(fat_cals / 9)
+    protein_cals = protein_g * 4
+    remaining_cals = max(0, target_calories - (protein_cals + fat_cals))
+    carbs_g = round(remaining_cals / 4)
+    return {
+        "BMR": round(bmr),
+        "TDEE": round(tdee),
+        "TargetCalories": round(target_calories),
+        "Protein_g": int(protein_g),
+        "Carbs_g": int(carbs_g),
+        "Fat_g": int(fat_g)
+    }
+
+
+def _encode(values, *lookups):
+    """Factorize a categorical column once and map each distinct value through every lookup"""
+    if not isinstance(values, (pd.Series, np.ndarray)):
+        values = np.asarray(values, dtype=object)
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return [np.fromiter((lookup(u) for u in uniques), dtype=np.float64, count=len(uniques))[codes]
+            for lookup in lookups]
+
+
+def calculate_tdee_and_targets_batch(profiles):
+    """Vectorized calculate_tdee_and_targets over a DataFrame (or dict of arrays) of profiles.
+
+    Expects the columns sex, weight_kg, height_cm, age, activity_level and goal and
+    returns one row of targets per profile with the same columns as the scalar version.
+    """
+    weight = np.asarray(profiles["weight_kg"], dtype=np.float64)
+    height = np.asarray(profiles["height_cm"], dtype=np.float64)
+    age = np.asarray(profiles["age"], dtype=np.float64)
+    sex_offset, = _encode(profiles["sex"], lambda s: 5.0 if str(s).lower().startswith('m') else -161.0)
+    activity_factor, = _encode(profiles["activity_level"], lambda a: ACTIVITY_FACTORS.get(a, 1.375))
+    goal_factor, goal_protein = _encode(
+        profiles["goal"], lambda g: GOAL_ADJUSTMENT.get(g, 1.0), lambda g: protein_per_kg(str(g)))
+
+    bmr = 10 * weight + 6.25 * height - 5 * age + sex_offset
+    tdee = bmr * activity_factor
+    target_calories = tdee * goal_factor
+    protein_g = np.round(goal_protein * weight)
+    fat_cals = 0.25 * target_calories
+    fat_g = np.round(fat_cals / 9)
+    remaining_cals = np.maximum(0, target_calories - (protein_g * 4 + fat_cals))
+    carbs_g = np.round(remaining_cals / 4)
+    return pd.DataFrame({
+        "BMR": np.round(bmr).astype(np.int64),
+        "TDEE": np.round(tdee).astype(np.int64),
+        "TargetCalories": np.round(target_calories).astype(np.int64),
+        "Protein_g": protein_g.astype(np.int64),
+        "Carbs_g": carbs_g.astype(np.int64),
+        "Fat_g": fat_g.astype(np.int64)
+    }, index=getattr(profiles, "index", None))
+
+
+MEAL_SPLITS = {"Breakfast":0.25, "Lunch":0.35, "Dinner":0.30, "Snack":0.10}
+# relative weight of calories vs protein/carbs/fat in the solver objective
+SOLVER_WEIGHTS = np.array([2.0, 1.0, 1.0, 1.0])
+
+
+def generate_meal_plan(target_calories, protein_g, carbs_g, fat_g, meals=("Breakfast","Lunch","Dinner","Snack"),
+                       solver="greedy", time_budget=0.2, tolerance=0.05, max_items=6, max_servings=3, seed=0,
+                       foods=None, restrictions=()):
+    """MealPlan of food ids and servings into the food table; names and totals come from its views.
+
+    restrictions are food_tags.RESTRICTIONS names (e.g. "Vegan", "Nut-free"); no food they forbid is used.
+    """
+    foods = load_food_index(FOOD_STORE_PATH) if foods is None else foods
+    available = [m for m in meals if m]
+    allowed = allowed_foods(foods.tags, restrictions)
+    if solver == "optimize":
+        food_ids, servings = _optimize_meal_plan(target_calories, protein_g, carbs_g, fat_g, available,
+                                                 time_budget, tolerance, max_items, max_servings, seed, foods,
+                                                 allowed)
+        return MealPlan.from_meals(foods, available, food_ids, servings)
+    if solver != "greedy":
+        raise ValueError(f"unknown meal plan solver: {solver!r}")
+    splits = MEAL_SPLITS
+    total_split = sum(splits[m] for m in available if m in splits)
+    fallback = foods.by_cal_desc if allowed is None else foods.by_cal_desc[allowed[foods.by_cal_desc]]
+    food_ids = []
+    for meal in available:
+        split = splits.get(meal, 0.15)
+        meal_target = target_calories * (split / total_split)
+        order = foods.by_cal if meal == "Snack" else foods.by_pdensity
+        if allowed is not None:
+            order = order[allowed[order]]
+        # take foods in order until the running calorie total reaches 95% of the meal target
+        threshold = meal_target * 0.95
+        cum = np.cumsum(foods.nutrients[order, 0])
+        k = 0 if threshold <= 0 else min(int(np.searchsorted(cum, threshold, side="left")) + 1, len(order))
+        take = order[:k]
+        if (cum[k - 1] if k else 0.0) < threshold and len(fallback):
+            take = np.append(take, fallback[0])
+        food_ids.append(take)
+    return MealPlan.from_meals(foods, available, food_ids)
+
+
+def meal_plan_rows(target_calories, protein_g, carbs_g, fat_g, meals=("Breakfast","Lunch","Dinner","Snack"),
+                   solver="greedy", time_budget=0.2, tolerance=0.05, max_items=6, max_servings=3, seed=0,
+                   foods=None, restrictions=()):
+    """generate_meal_plan as a list of row dicts with food dicts in Items (for batch jobs and the API)"""
+    return generate_meal_plan(target_calories, protein_g, carbs_g, fat_g, meals, solver, time_budget, tolerance,
+                              max_items, max_servings, seed, foods, restrictions).rows()
+
+
+def _descend(A, sq, x, r, max_items, max_servings):
+    """Steepest descent on ||r||^2 over add / remove / swap single-serving moves"""
+    while True:
+        ar = A @ r
+        sel = np.flatnonzero(x)
+        add = 2 * ar + sq
+        add[x >= max_servings] = np.inf
+        if len(sel) >= max_items:
+            add[x == 0] = np.inf
+        rem = sq[sel] - 2 * ar[sel]
+        # swap one serving of a selected food j for one serving of food i
+        swap = rem[:, None] + (2 * ar + sq)[None, :] - 2 * (A[sel] @ A.T)
+        swap[:, x >= max_servings] = np.inf
+        swap[np.arange(len(sel)), sel] = np.inf
+        if len(sel) >= max_items:
+            # a new food may only come in if the swapped-out food leaves the meal entirely
+            swap[(x[sel] > 1)[:, None] & (x == 0)[None, :]] = np.inf
+        best_add = int(np.argmin(add))
+        best_rem = int(np.argmin(rem)) if len(sel) else -1
+        best_swap = np.unravel_index(int(np.argmin(swap)), swap.shape) if swap.size else None
+        moves = [(add[best_add], best_add, -1)]
+        if best_rem >= 0:
+            moves.append((rem[best_rem], -1, sel[best_rem]))
+        if best_swap is not None:
+            moves.append((swap[best_swap], best_swap[1], sel[best_swap[0]]))
+        delta, i, j = min(moves, key=lambda m: m[0])
+        if not delta < -1e-12:
+            return x, r
+        if i >= 0:
+            x[i] += 1; r = r + A[i]
+        if j >= 0:
+            x[j] -= 1; r = r - A[j]
+
+
+def _solve_meal(nutrients, target, deadline, tolerance, max_items, max_servings, rng):
+    """Integer servings per food minimising weighted relative macro error for one meal"""
+    scale = SOLVER_WEIGHTS / np.maximum(target, 1.0)
+    A = nutrients * scale
+    sq = (A * A).sum(axis=1)
+    limit = tolerance * SOLVER_WEIGHTS
+    x, r = _descend(A, sq, np.zeros(len(A), dtype=np.int64), -target * scale, max_items, max_servings)
+    best_x, best_r = x.copy(), r
+    while time.perf_counter() < deadline and not np.all(np.abs(best_r) <= limit):
+        # perturb the incumbent: drop a random serving and force in a random food, then descend again
+        x, r = best_x.copy(), best_r
+        sel = np.flatnonzero(x)
+        if len(sel):
+            j = rng.choice(sel); x[j] -= 1; r = r - A[j]
+        i = int(rng.integers(len(A)))
+        if x[i] < max_servings and (x[i] > 0 or np.count_nonzero(x) < max_items):
+            x[i] += 1; r = r + A[i]
+        x, r = _descend(A, sq, x, r, max_items, max_servings)
+        if r @ r < best_r @ best_r:
+            best_x, best_r = x.copy(), r
+    return best_x
+
+
+def _optimize_meal_plan(target_calories, protein_g, carbs_g, fat_g, meals, time_budget, tolerance,
+                        max_items, max_servings, seed, foods, allowed=None):
+    """(food ids, servings) per meal, hitting the calorie and macro targets of every meal within tolerance where possible.
+
+    Each meal is solved independently as a bounded integer program over servings with a vectorized
+    local search; the best plan found within time_budget seconds is returned.
+    """
+    total_split = sum(MEAL_SPLITS.get(m, 0.15) for m in meals)
+    daily = np.array([target_calories, protein_g, carbs_g, fat_g], dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    food_ids, servings = [], []
+    for n, meal in enumerate(meals, start=1):
+        target = daily * (MEAL_SPLITS.get(meal, 0.15) / total_split)
+        deadline = start + time_budget * n / len(meals)
+        ids, x = _plan_meal(target, foods, deadline, tolerance, max_items, max_servings, rng, allowed=allowed)
+        food_ids.append(ids)
+        servings.append(x)
+    return food_ids, servings
+
+
+def _plan_meal(target, foods, deadline, tolerance, max_items, max_servings, rng, exclude=None, allowed=None):
+    """(food ids, servings) for one meal solved against target, using only allowed foods and never those in exclude"""
+    nutrients = foods.nutrients
+    if exclude is not None and len(exclude):
+        allowed = np.ones(len(nutrients), dtype=bool) if allowed is None else allowed.copy()
+        allowed[np.asarray(exclude, dtype=np.int64)] = False
+    rows = None if allowed is None else np.flatnonzero(allowed)
+    if rows is not None:
+        nutrients = nutrients[rows]
+    x = _solve_meal(nutrients, target, deadline, tolerance, max_items, max_servings, rng) if len(nutrients) else \
+        np.zeros(0, dtype=np.int64)
+    chosen = np.flatnonzero(x)
+    food_ids = chosen if rows is None else rows[chosen]
+    return food_ids, x[chosen]
+
+
+def plan_meal(target, foods=None, exclude=None, time_budget=0.05, tolerance=0.05, max_items=6, max_servings=3,
+              seed=0, restrictions=()):
+    """(food ids, servings) for one meal solved for a [calories, protein, carbs, fat] target"""
+    foods = load_food_index(FOOD_STORE_PATH) if foods is None else foods
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    return _plan_meal(np.asarray(target, dtype=np.float64), foods, time.perf_counter() + time_budget, tolerance,
+                      max_items, max_servings, rng, exclude, allowed_foods(foods.tags, restrictions))
+
+
+WORKOUT_TEMPLATES = {
+    "beginner": [
+        ("Day 1 - Full Body", ["Squats 3x8", "Push-ups 3x8", "Dumbbell Rows 3x8", "Plank 30s"]),
+        ("Day 2 - Walk", ["30 min brisk walk"]),
+        ("Day 3 - Full Body", ["Lunges 3x10", "Overhead Press 3x8"]),
+        ("Day 4 - Recovery", ["Yoga / Mobility 20-30 min"]),
+        ("Day 5 - Full Body", ["Goblet Squat 3x10", "Incline Push-ups 3x10"]),
+        ("Day 6 - Cardio", ["20-30 min intervals"]),
+        ("Day 7 - Rest", ["Rest"])
+    ],
+    "intermediate": [
+        ("Day 1 - Upper Push", ["Bench Press 4x6-8", "Incline DB 3x8"]),
+        ("Day 2 - Lower", ["Back Squat 4x6-8", "Deadlift 3x5"]),
+        ("Day 3 - Pull/Core", ["Pull-ups 4x6", "Barbell Row 4x6"]),
+        ("Day 4 - Recovery", ["Mobility"]),
+        ("Day 5 - Push Hypertrophy", ["DB Press 4x10"]),
+        ("Day 6 - Lower Hypertrophy", ["Lunges 3x12"]),
+        ("Day 7 - Rest", ["Light walk"])
+    ],
+    "advanced": [
+        ("Day 1 - Power", ["Power Cleans 5x3", "Box Jumps 4x5"]),
+        ("Day 2 - Conditioning", ["HIIT 20 min"]),
+        ("Day 3 - Strength", ["Deadlift 5x5", "Front Squat 4x6"]),
+        ("Day 4 - Mobility", ["Yoga/Mobility 30 min"]),
+        ("Day 5 - Speed/Agility", ["Sprints 8x60m"]),
+        ("Day 6 - Mixed Strength", ["Bench 5x5", "Rows 4x6"]),
+        ("Day 7 - Active Recovery", ["Light swim / walk"])
+    ]
+}
+
+
+def generate_workout_plan(level, goal):
+    template = WORKOUT_TEMPLATES.get(level, WORKOUT_TEMPLATES["beginner"])
+    adapted = []
+    for day, exs in template:
+        ex = list(exs)
+        if "Lose" in goal and not any(kw in e.lower() for e in ex for kw in ["cardio", "walk"]):
+            ex.append("10-15 min cardio finisher")
+        if "Gain" in goal:
+            ex.append("Progressive overload: increase weight over weeks")
+        adapted.append((day, ex))
+    return adapted
+
+
+def ai_diet_suggestions(targets, last_plan_df):
+    """Tips for one set of targets and its meal plan; see diet_rules for the rule table and batch evaluation"""
+    return DEFAULT_RULESET.suggestions([targets], [last_plan_df])[0]
@@ -0,0 +1,223 @@
+"""Streaming plan export to CSV, gzip CSV, JSON Lines and Parquet.
+
+    python fitness_export.py plans.jsonl cohort.parquet      # convert fitness_batch output
+
+Exporters take an iterable of plans, dicts with "targets" and "meal_plan" and an optional
+"plan_id". The meal plan can be a MealPlan from generate_meal_plan, a DataFrame or a list of row
+dicts (fitness_batch records). Output is produced batch by batch as a generator of bytes, so a whole
+cohort can be exported without holding it in memory.
+"""
+import argparse
+import datetime
+import io
+import itertools
+import json
+import sys
+import zlib
+from io import StringIO
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from meal_plan import MealPlan
+
+MEAL_COLS = ["Meal", "Items", "Calories", "Protein_g", "Carbs_g", "Fat_g"]
+FORMATS = {".csv": "csv", ".gz": "csv.gz", ".jsonl": "jsonl", ".ndjson": "jsonl", ".parquet": "parquet"}
+
+
+def _header(targets=None, generated=None):
+    """Comment header kept from the original CSV export"""
+    generated = generated or datetime.datetime.now()
+    lines = ["# Chud AI - Personalized Nutrition Plan", f"# Generated: {generated.strftime('%Y-%m-%d %H:%M')}"]
+    lines += [f"# {k}: {v}" for k, v in (targets or {}).items()]
+    return "\n".join(lines) + "\n\n"
+
+
+def _columns(meal_plan):
+    """Meal plan as {column: list}, from a MealPlan, a DataFrame or a list of row dicts"""
+    if isinstance(meal_plan, MealPlan):
+        # labels straight from the food table; no food dicts in between
+        totals = meal_plan.totals().T
+        return {"Meal": list(meal_plan.meals), "Items": meal_plan.item_labels(),
+                "Calories": totals[0].astype(np.int64), "Protein_g": totals[1], "Carbs_g": totals[2], "Fat_g": totals[3]}
+    if isinstance(meal_plan, pd.DataFrame):
+        return dict(zip(meal_plan.columns, meal_plan.to_numpy(dtype=object).T))
+    return {col: [r[col] for r in meal_plan] for col in MEAL_COLS}
+
+
+def meal_rows_frame(plans):
+    """One flat DataFrame of meal rows for a batch of plans, with item strings built column-wise"""
+    counts = [len(p["meal_plan"]) for p in plans]
+    columns = [_columns(p["meal_plan"]) for p in plans]
+    meals = pd.DataFrame({col: list(itertools.chain.from_iterable(c[col] for c in columns)) for col in MEAL_COLS},
+                         columns=MEAL_COLS)
+    plan_ids = [p.get("plan_id", i) for i, p in enumerate(plans)]
+    meals.insert(0, "plan_id", np.repeat(np.array(plan_ids, dtype=object), counts))
+    if not len(meals):
+        return meals
+    # item dicts become "name (serving)"; strings (fitness_batch records) pass through as they are
+    items = meals["Items"].explode().astype(object)
+    labels = items.fillna("").to_numpy(dtype=object, copy=True)
+    is_dict = items.map(type).to_numpy() == dict
+    if is_dict.any():
+        foods = items[is_dict]
+        labels[is_dict] = (foods.str.get("name") + " (" + foods.str.get("serving") + ")").to_numpy(dtype=object)
+    owner = items.index.to_numpy()
+    same_next = np.r_[owner[1:] == owner[:-1], False]
+    labels[same_next] += "; "
+    meals["Items"] = np.add.reduceat(labels, np.flatnonzero(np.r_[True, ~same_next[:-1]]))
+    return meals
+
+
+def _targets_frame(plans, index):
+    """Per-meal-row copy of each plan's targets, as Target_<key> columns"""
+    targets = pd.DataFrame([p["targets"] for p in plans]).add_prefix("Target_")
+    return targets.iloc[index].reset_index(drop=True)
+
+
+def _batches(plans, batch_size):
+    plans = iter(plans)
+    while batch := list(itertools.islice(plans, batch_size)):
+        yield batch
+
+
+def _cohort_frames(plans, batch_size):
+    for batch in _batches(plans, batch_size):
+        meals = meal_rows_frame(batch)
+        owner = np.repeat(np.arange(len(batch)), [len(p["meal_plan"]) for p in batch])
+        yield pd.concat([meals.reset_index(drop=True), _targets_frame(batch, owner)], axis=1)
+
+
+def iter_csv(plans, batch_size=1000, generated=None):
+    """CSV text chunks for many plans; targets become Target_* columns on every meal row"""
+    yield _header(generated=generated)
+    header = True
+    for frame in _cohort_frames(plans, batch_size):
+        buf = StringIO()
+        frame.to_csv(buf, index=False, header=header)
+        header = False
+        yield buf.getvalue()
+
+
+def iter_jsonl(plans, batch_size=1000, generated=None):
+    """JSON Lines chunks, one object per plan with its targets and meal rows"""
+    generated = (generated or datetime.datetime.now()).isoformat(timespec="seconds")
+    for batch in _batches(plans, batch_size):
+        records = meal_rows_frame(batch)[MEAL_COLS].to_dict("records")
+        bounds = np.cumsum([0] + [len(p["meal_plan"]) for p in batch])
+        lines = [json.dumps({"plan_id": p.get("plan_id", i), "generated": generated, "targets": p["targets"],
+                             "meals": records[bounds[i]:bounds[i + 1]]}, default=str)
+                 for i, p in enumerate(batch)]
+        yield "\n".join(lines) + "\n"
+
+
+def iter_export(plans, fmt="csv", batch_size=1000, generated=None):
+    """Generator of bytes for plans in fmt: csv, csv.gz, jsonl or parquet"""
+    if fmt == "csv":
+        for chunk in iter_csv(plans, batch_size, generated):
+            yield chunk.encode("utf-8")
+    elif fmt == "csv.gz":
+        gz = zlib.compressobj(6, zlib.DEFLATED, 31)     # wbits=31 writes a gzip container
+        for chunk in iter_csv(plans, batch_size, generated):
+            yield gz.compress(chunk.encode("utf-8"))
+        yield gz.flush()
+    elif fmt == "jsonl":
+        for chunk in iter_jsonl(plans, batch_size, generated):
+            yield chunk.encode("utf-8")
+    elif fmt == "parquet":
+        yield from _iter_parquet(plans, batch_size, generated)
+    else:
+        raise ValueError(f"unknown export format: {fmt!r}")
+
+
+class _ByteSink(io.RawIOBase):
+    """Write-only file that hands its bytes over on drain() but keeps counting for tell()"""
+
+    def __init__(self):
+        self._parts, self._pos = [], 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self):
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def _iter_parquet(plans, batch_size, generated):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export requires `pip install pyarrow`") from None
+    sink, writer = _ByteSink(), None
+    meta = {b"generator": b"Chud AI - Personalized Nutrition Plan",
+            b"generated": (generated or datetime.datetime.now()).isoformat(timespec="seconds").encode()}
+    for frame in _cohort_frames(plans, batch_size):
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema.with_metadata({**(table.schema.metadata or {}), **meta}))
+        # one row group per batch; its bytes are yielded as soon as it is written
+        writer.write_table(table.cast(writer.schema))
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+
+def export_plan_csv(targets, meal_plan, generated=None):
+    """Single-plan CSV in the original layout: comment header with the targets, then the meal rows"""
+    if meal_plan is None or len(meal_plan) == 0:
+        return ""
+    buf = StringIO()
+    buf.write(_header(targets, generated))
+    meal_rows_frame([{"targets": targets, "meal_plan": meal_plan}])[MEAL_COLS].to_csv(buf, index=False)
+    return buf.getvalue()
+
+
+def write_export(plans, path, fmt=None, batch_size=1000):
+    """Stream plans to path, picking the format from the suffix when fmt is not given"""
+    path = Path(path)
+    fmt = fmt or FORMATS.get(path.suffix)
+    if fmt is None:
+        raise ValueError(f"cannot infer export format from {path.name}; pass fmt")
+    with open(path, "wb") as fh:
+        for chunk in iter_export(plans, fmt, batch_size):
+            fh.write(chunk)
+
+
+def read_batch_plans(path):
+    """Plans from a fitness_batch JSON Lines output, one at a time; records with an "error" are skipped"""
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                record = json.loads(line)
+                if "error" in record:
+                    continue
+                # fitness_batch writes "user_id": null for profiles without one
+                plan_id = record.get("row") if record.get("user_id") is None else record["user_id"]
+                yield {"plan_id": plan_id, "targets": record["targets"], "meal_plan": record["meal_plan"]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="fitness_batch output (.jsonl)")
+    parser.add_argument("output", help="destination; format from suffix (.csv, .csv.gz, .jsonl, .parquet)")
+    parser.add_argument("--format", choices=["csv", "csv.gz", "jsonl", "parquet"])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+    write_export(read_batch_plans(args.input), args.output, args.format, args.batch_size)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
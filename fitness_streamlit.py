@@ -1,10 +1,25 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
-import numpy as np
 import datetime
-import plotly.graph_objects as go
-import plotly.express as px
-from io import StringIO
+import functools
+import os
+import sys
+from fitness_core import (
+    ACTIVITY_FACTORS, FOOD_STORE_PATH, GOAL_ADJUSTMENT, calculate_tdee_and_targets, generate_meal_plan,
+    generate_workout_plan, load_food_fingerprint, load_food_index, load_food_search, load_food_swaps,
+)
+from fitness_export import export_plan_csv
+from food_tags import RESTRICTIONS
+from plan_cache import PlanCache, normalize_profile
+from plan_charts import chart_cache, nutrition_charts
+from plan_graph import nutrition_graph
+from plan_history import HISTORY_DB_PATH, PlanHistory
+from plan_metrics import ENABLED as METRICS_ENABLED, METRICS, serve as serve_metrics, span, timed
+from theme_assets import stylesheet as theme_stylesheet_name
+from weekly_plan import WeeklyPlan
+from weight_trend import downsample, trend_frame
+from workout_program import build_program
 
 # page config
 st.set_page_config(
@@ -14,556 +29,167 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-## styling is from pure ai
-st.markdown("""
-<style>
-    /* Import Google Fonts */
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
-    
-    /* Main theme colors - Black and Green */
-    :root {
-        --primary-color: #00ff88;
-        --accent-color: #00cc6a;
-        --success-color: #00ff88;
-        --warning-color: #ffd700;
-        --bg-dark: #0a0a0a;
-        --bg-secondary: #1a1a1a;
-        --bg-card: #141414;
-        --text-primary: #ffffff;
-        --text-secondary: #a0a0a0;
-        --border-color: #2a2a2a;
-    }
-    
-    /* Global styling */
-    .stApp {
-        background-color: var(--bg-dark);
-        font-family: 'Inter', sans-serif;
-    }
-    
-    /* Remove default Streamlit padding/margin */
-    .main .block-container {
-        padding-top: 1rem;
-        padding-bottom: 2rem;
-        padding-left: 1rem;
-        padding-right: 1rem;
-        max-width: 100%;
-    }
-    
-    /* Header styling */
-    .main-header {
-        font-size: clamp(2rem, 5vw, 3rem);
-        font-weight: 700;
-        color: var(--primary-color);
-        text-align: center;
-        margin-top: 0;
-        margin-bottom: 0.5rem;
-        letter-spacing: -1px;
-        text-transform: uppercase;
-        padding-top: 0;
-    }
-    
-    .sub-header {
-        font-size: clamp(0.9rem, 2vw, 1.1rem);
-        color: var(--text-secondary);
-        text-align: center;
-        margin-bottom: 2rem;
-        font-weight: 300;
-    }
-    
-    /* Metric cards */
-    .metric-card {
-        background: linear-gradient(135deg, var(--bg-card) 0%, var(--bg-secondary) 100%);
-        padding: 1.5rem;
-        border-radius: 8px;
-        border: 1px solid var(--border-color);
-        color: white;
-        box-shadow: 0 4px 12px rgba(0, 255, 136, 0.1);
-        margin-bottom: 1rem;
-    }
-    
-    .metric-label {
-        font-size: 0.9rem;
-        color: var(--text-secondary);
-        margin-bottom: 0.5rem;
-        text-transform: uppercase;
-        letter-spacing: 1px;
-    }
-    
-    .metric-value {
-        font-size: 2rem;
-        font-weight: 700;
-        color: var(--primary-color);
-    }
-    
-    /* Section headers */
-    .section-header {
-        font-size: clamp(1.2rem, 3vw, 1.5rem);
-        font-weight: 600;
-        color: var(--primary-color);
-        margin-top: 2rem;
-        margin-bottom: 1rem;
-        border-bottom: 2px solid var(--primary-color);
-        padding-bottom: 0.5rem;
-        text-transform: uppercase;
-        letter-spacing: 1px;
-    }
-    
-    /* Info boxes */
-    .info-box {
-        background-color: var(--bg-card);
-        border-left: 4px solid var(--primary-color);
-        padding: 1rem;
-        border-radius: 4px;
-        margin: 1rem 0;
-        color: var(--text-primary);
-    }
-    
-    /* Workout day styling */
-    .workout-day {
-        background-color: var(--bg-card);
-        padding: 1.5rem;
-        border-radius: 8px;
-        border: 1px solid var(--border-color);
-        border-left: 4px solid var(--primary-color);
-        margin-bottom: 1rem;
-        transition: all 0.3s ease;
-        width: 100%;
-        box-sizing: border-box;
-    }
-    
-    .workout-day:hover {
-        border-left-width: 6px;
-        box-shadow: 0 4px 12px rgba(0, 255, 136, 0.15);
-    }
-    
-    .workout-title {
-        font-weight: 600;
-        color: var(--primary-color);
-        font-size: clamp(1rem, 2vw, 1.1rem);
-        margin-bottom: 0.5rem;
-        text-transform: uppercase;
-        letter-spacing: 0.5px;
-    }
-    
-    /* Sidebar styling */
-    [data-testid="stSidebar"] {
-        background-color: var(--bg-secondary);
-        border-right: 1px solid var(--border-color);
-    }
-    
-    [data-testid="stSidebar"] .stMarkdown {
-        color: var(--text-primary);
-    }
-    
-    /* Sidebar column alignment */
-    [data-testid="stSidebar"] [data-testid="column"] {
-        padding: 0.25rem !important;
-    }
-    
-    [data-testid="stSidebar"] [data-testid="column"]:first-child {
-        padding-left: 0 !important;
-        padding-right: 0.25rem !important;
-    }
-    
-    [data-testid="stSidebar"] [data-testid="column"]:last-child {
-        padding-right: 0 !important;
-        padding-left: 0.25rem !important;
-    }
-    
-    /* Button styling */
-    .stButton > button {
-        background: linear-gradient(135deg, var(--primary-color), var(--accent-color));
-        color: #000;
-        border: none;
-        border-radius: 6px;
-        font-weight: 600;
-        text-transform: uppercase;
-        letter-spacing: 1px;
-        transition: all 0.3s ease;
-        width: 100%;
-        padding: 0.75rem 1rem;
-        font-size: clamp(0.8rem, 2vw, 0.9rem);
-    }
-    
-    .stButton > button:hover {
-        box-shadow: 0 4px 16px rgba(0, 255, 136, 0.4);
-        transform: translateY(-2px);
-    }
-    
-    /* Input styling */
-    .stTextInput input, .stNumberInput input, .stSelectbox select {
-        background-color: var(--bg-card);
-        color: var(--text-primary);
-        border: 1px solid var(--border-color);
-        border-radius: 6px;
-        font-size: clamp(0.85rem, 2vw, 1rem);
-    }
-    
-    /* Dataframe styling */
-    .stDataFrame {
-        background-color: var(--bg-card);
-        width: 100%;
-    }
-    
-    .stDataFrame [data-testid="stDataFrameResizable"] {
-        width: 100%;
-    }
-    
-    /* Metric styling */
-    [data-testid="stMetric"] {
-        background-color: var(--bg-card);
-        padding: 1rem;
-        border-radius: 8px;
-        border: 1px solid var(--border-color);
-        width: 100%;
-    }
-    
-    [data-testid="stMetricLabel"] {
-        color: var(--text-secondary);
-        font-size: clamp(0.75rem, 2vw, 0.9rem);
-        text-transform: uppercase;
-        letter-spacing: 1px;
-    }
-    
-    [data-testid="stMetricValue"] {
-        color: var(--primary-color);
-        font-weight: 700;
-        font-size: clamp(1.2rem, 3vw, 1.5rem);
-    }
-    
-    /* Column responsiveness */
-    [data-testid="column"] {
-        width: 100% !important;
-        flex: 1 1 auto !important;
-        min-width: 0 !important;
-        padding: 0.5rem !important;
-    }
-    
-    /* Ensure columns stay aligned */
-    [data-testid="column"] > div {
-        width: 100%;
-    }
-    
-    /* Fix column gaps */
-    div[data-testid="column"]:first-child {
-        padding-left: 0 !important;
-    }
-    
-    div[data-testid="column"]:last-child {
-        padding-right: 0 !important;
-    }
-    
-    /* Info box responsiveness */
-    .stAlert {
-        width: 100%;
-        font-size: clamp(0.85rem, 2vw, 1rem);
-    }
-    
-    /* Ensure charts are responsive */
-    .js-plotly-plot {
-        width: 100% !important;
-    }
-    
-    .plotly {
-        width: 100% !important;
-    }
-    
-    /* Hide Streamlit branding but keep the main menu visible so users can reopen the sidebar via the hamburger menu */
-    /* Note: we intentionally do NOT hide #MainMenu — hiding it prevents reopening a closed sidebar */
-    footer {visibility: hidden;}
-    header {visibility: hidden;}
-    
-    /* Remove top padding from main app */
-    .main > div:first-child {
-        padding-top: 0 !important;
-    }
-    
-    /* Responsive padding */
-    .block-container {
-        padding-top: 0rem !important;
-        padding-bottom: 2rem;
-        max-width: 1400px;
-        margin: 0 auto;
-    }
-    
-    /* Mobile responsiveness */
-    @media (max-width: 768px) {
-        .main-header {
-            font-size: 2rem;
-            margin-top: 0.5rem;
-        }
-        
-        .sub-header {
-            font-size: 0.9rem;
-        }
-        
-        .workout-day {
-            padding: 1rem;
-        }
-        
-        [data-testid="stMetric"] {
-            padding: 0.75rem;
-        }
-        
-        .section-header {
-            font-size: 1.2rem;
-        }
-        
-        /* Stack columns on mobile */
-        [data-testid="column"] {
-            min-width: 100% !important;
-            margin-bottom: 1rem;
-        }
-    }
-    
-    @media (max-width: 480px) {
-        .main-header {
-            font-size: 1.5rem;
-        }
-        
-        .block-container {
-            padding-left: 0.5rem;
-            padding-right: 0.5rem;
-        }
-        
-        .workout-day {
-            padding: 0.75rem;
-        }
-        
-        [data-testid="stMetricValue"] {
-            font-size: 1.2rem;
-        }
-    }
-    
-    /* Custom scrollbar */
-    ::-webkit-scrollbar {
-        width: 8px;
-        height: 8px;
-    }
-    
-    ::-webkit-scrollbar-track {
-        background: var(--bg-dark);
-    }
-    
-    ::-webkit-scrollbar-thumb {
-        background: var(--primary-color);
-        border-radius: 4px;
-    }
-    
-    ::-webkit-scrollbar-thumb:hover {
-        background: var(--accent-color);
-    }
-</style>
-""", unsafe_allow_html=True)
-
-## creating a static food dataframe
-## todo/- swap this out later for USDA data API
-FOOD_DB = [
-    {"name": "Oats (1 cup cooked)", "cal": 150, "protein": 5, "carbs": 27, "fat": 3, "serving": "1 cup"},
-    {"name": "Egg (large)", "cal": 78, "protein": 6, "carbs": 0.6, "fat": 5, "serving": "1 egg"},
-    {"name": "Greek Yogurt (200g)", "cal": 120, "protein": 20, "carbs": 6, "fat": 0, "serving": "200 g"},
-    {"name": "Chicken Breast (100g)", "cal": 165, "protein": 31, "carbs": 0, "fat": 3.6, "serving": "100 g"},
-    {"name": "Brown Rice (1 cup cooked)", "cal": 215, "protein": 5, "carbs": 45, "fat": 1.8, "serving": "1 cup"},
-    {"name": "Broccoli (1 cup)", "cal": 55, "protein": 3.7, "carbs": 11.2, "fat": 0.6, "serving": "1 cup"},
-    {"name": "Salmon (100g)", "cal": 208, "protein": 20, "carbs": 0, "fat": 13, "serving": "100 g"},
-    {"name": "Almonds (28g)", "cal": 164, "protein": 6, "carbs": 6, "fat": 14, "serving": "28 g"},
-    {"name": "Apple (medium)", "cal": 95, "protein": 0.5, "carbs": 25, "fat": 0.3, "serving": "1 medium"},
-    {"name": "Peanut Butter (2 tbsp)", "cal": 188, "protein": 8, "carbs": 7, "fat": 16, "serving": "2 tbsp"},
-    {"name": "Whole Wheat Bread (1 slice)", "cal": 70, "protein": 3.6, "carbs": 12, "fat": 1, "serving": "1 slice"},
-    {"name": "Banana (medium)", "cal": 105, "protein": 1.3, "carbs": 27, "fat": 0.3, "serving": "1 medium"},
-    {"name": "Tofu (100g)", "cal": 76, "protein": 8, "carbs": 1.9, "fat": 4.8, "serving": "100 g"},
-    {"name": "Olive Oil (1 tbsp)", "cal": 119, "protein": 0, "carbs": 0, "fat": 13.5, "serving": "1 tbsp"},
-    {"name": "Quinoa (1 cup cooked)", "cal": 222, "protein": 8, "carbs": 39, "fat": 3.6, "serving": "1 cup"},
-]
-FOOD_DF = pd.DataFrame(FOOD_DB)
-
-
-## activity and goals
-ACTIVITY_FACTORS = {
-    "Sedentary (little or no exercise)": 1.2,
-    "Light (1-3 days/week)": 1.375,
-    "Moderate (3-5 days/week)": 1.55,
-    "Active (6-7 days/week)": 1.725,
-    "Very active (hard exercise & physical work)": 1.9
-}
-GOAL_ADJUSTMENT = {
-    "Lose weight (cut 20%)": 0.80,
-    "Maintain weight": 1.00,
-    "Gain weight (bulk 15%)": 1.15
-}
-
-
-## main logic
-def calculate_bmr(sex: str, weight_kg: float, height_cm: float, age: int) -> float:
-    if str(sex).lower().startswith('m'):
-        return 10 * weight_kg + 6.25 * height_cm - 5 * age + 5
-    return 10 * weight_kg + 6.25 * height_cm - 5 * age - 161
-
-
-def calculate_tdee_and_targets(sex, weight_kg, height_cm, age, activity_level, goal):
-    bmr = calculate_bmr(sex, weight_kg, height_cm, age)
-    activity_factor = ACTIVITY_FACTORS.get(activity_level, 1.375)
-    tdee = bmr * activity_factor
-    target_calories = tdee * GOAL_ADJUSTMENT.get(goal, 1.0)
-    protein_g = round(2.0 * weight_kg) if "Lose" in goal else round(1.8 * weight_kg) if "Gain" in goal else round(1.6 * weight_kg)
-    fat_cals = 0.25 * target_calories
-    fat_g = round(fat_cals / 9)
-    protein_cals = protein_g * 4
-    remaining_cals = max(0, target_calories - (protein_cals + fat_cals))
-    carbs_g = round(remaining_cals / 4)
-    return {
-        "BMR": round(bmr),
-        "TDEE": round(tdee),
-        "TargetCalories": round(target_calories),
-        "Protein_g": int(protein_g),
-        "Carbs_g": int(carbs_g),
-        "Fat_g": int(fat_g)
-    }
+## styling is from pure ai; the source lives in assets/theme.css
+@st.cache_resource(show_spinner=False)
+def theme_stylesheet():
+    """File name of the prebuilt theme (python theme_assets.py), looked up once per server process"""
+    name = theme_stylesheet_name()
+    if name is None:
+        print("static/theme.*.css is missing; run `python theme_assets.py`. Using the default theme.", file=sys.stderr)
+    return name
+
+
+@timed("css_injection")
+def inject_theme():
+    """Link the static theme stylesheet into the page head, once per browser session"""
+    if st.session_state.get("theme_linked") or theme_stylesheet() is None:
+        return
+    href = f"app/static/{theme_stylesheet()}"
+    st.html(f"""<script>
+if (!document.getElementById("nofit-theme")) {{
+    const link = Object.assign(document.createElement("link"), {{id: "nofit-theme", rel: "stylesheet", href: "{href}"}});
+    document.head.appendChild(link);
+}}
+</script>""", unsafe_allow_javascript=True)
+    st.session_state.theme_linked = True
+
+
+@st.cache_resource(show_spinner=False)
+def get_plan_cache():
+    """Meal plans shared by every session, keyed on the targets and meals"""
+    return PlanCache(maxsize=4096, ttl=6 * 3600)
+
+
+@st.cache_resource(show_spinner=False)
+def get_plan_history():
+    """Plan history store shared by every session; saves are written in the background"""
+    return PlanHistory(HISTORY_DB_PATH)
+
+
+def save_to_history(*args, **kwargs):
+    """Queue a plan for the history; a failing history store never blocks the plan itself"""
+    try:
+        get_plan_history().save(*args, **kwargs)
+    except Exception as exc:
+        st.warning(f"This plan could not be saved to your history: {exc}")
+
+
+@st.cache_resource(show_spinner=False)
+def get_chart_cache():
+    """Built charts shared by every session, keyed on a hash of the values they plot"""
+    return chart_cache()
+
+
+@st.cache_resource(show_spinner=False)
+def metrics_server():
+    """Prometheus /metrics endpoint for this process, started by the first session"""
+    return serve_metrics()
+
+
+def fragment(fn):
+    """st.fragment timed as its own stage; reruns scoped to it are counted as fragment reruns"""
+    timed_fn = timed()(fn)
+    if not METRICS_ENABLED:
+        return st.fragment(timed_fn)
+
+    @functools.wraps(fn)
+    def counted(*args, **kwargs):
+        ctx = get_script_run_ctx()
+        if ctx is not None and ctx.fragment_ids_this_run:
+            METRICS.inc("reruns", scope="fragment")
+        return timed_fn(*args, **kwargs)
+    return st.fragment(counted)
+
+
+def render_chart(chart):
+    if st.session_state.chart_backend == "vega":
+        st.vega_lite_chart(chart, use_container_width=True, theme=None)
+    else:
+        st.plotly_chart(chart, use_container_width=True)
 
 
-def generate_meal_plan(target_calories, protein_g, carbs_g, fat_g, meals=("Breakfast","Lunch","Dinner","Snack")):
-    splits = {"Breakfast":0.25, "Lunch":0.35, "Dinner":0.30, "Snack":0.10}
-    available = [m for m in meals if m]
-    total_split = sum(splits[m] for m in available if m in splits)
-    rows = []
-    foods = FOOD_DF.copy()
-    for meal in available:
-        split = splits.get(meal, 0.15)
-        meal_target = target_calories * (split / total_split)
-        items = []; cal = prot = carb = fat = 0.0
-        cand = foods.sort_values(by="cal") if meal == "Snack" else foods.assign(pdensity=foods["protein"]/(foods["cal"]+1e-6)).sort_values(by="pdensity", ascending=False)
-        i = 0
-        while cal < meal_target * 0.95 and i < len(cand):
-            f = cand.iloc[i].to_dict()
-            items.append(f)
-            cal += f["cal"]; prot += f["protein"]; carb += f["carbs"]; fat += f["fat"]
-            i += 1
-        if cal < meal_target * 0.95:
-            big = foods.sort_values(by="cal", ascending=False).iloc[0].to_dict()
-            items.append(big); cal += big["cal"]; prot += big["protein"]; carb += big["carbs"]; fat += big["fat"]
-        rows.append({"Meal": meal, "Items": items, "Calories": round(cal), "Protein_g": round(prot, 1), "Carbs_g": round(carb, 1), "Fat_g": round(fat, 1)})
-    return pd.DataFrame(rows)
-
-
-WORKOUT_TEMPLATES = {
-    "beginner": [
-        ("Day 1 - Full Body", ["Squats 3x8", "Push-ups 3x8", "Dumbbell Rows 3x8", "Plank 30s"]),
-        ("Day 2 - Walk", ["30 min brisk walk"]),
-        ("Day 3 - Full Body", ["Lunges 3x10", "Overhead Press 3x8"]),
-        ("Day 4 - Recovery", ["Yoga / Mobility 20-30 min"]),
-        ("Day 5 - Full Body", ["Goblet Squat 3x10", "Incline Push-ups 3x10"]),
-        ("Day 6 - Cardio", ["20-30 min intervals"]),
-        ("Day 7 - Rest", ["Rest"])
-    ],
-    "intermediate": [
-        ("Day 1 - Upper Push", ["Bench Press 4x6-8", "Incline DB 3x8"]),
-        ("Day 2 - Lower", ["Back Squat 4x6-8", "Deadlift 3x5"]),
-        ("Day 3 - Pull/Core", ["Pull-ups 4x6", "Barbell Row 4x6"]),
-        ("Day 4 - Recovery", ["Mobility"]),
-        ("Day 5 - Push Hypertrophy", ["DB Press 4x10"]),
-        ("Day 6 - Lower Hypertrophy", ["Lunges 3x12"]),
-        ("Day 7 - Rest", ["Light walk"])
-    ],
-    "advanced": [
-        ("Day 1 - Power", ["Power Cleans 5x3", "Box Jumps 4x5"]),
-        ("Day 2 - Conditioning", ["HIIT 20 min"]),
-        ("Day 3 - Strength", ["Deadlift 5x5", "Front Squat 4x6"]),
-        ("Day 4 - Mobility", ["Yoga/Mobility 30 min"]),
-        ("Day 5 - Speed/Agility", ["Sprints 8x60m"]),
-        ("Day 6 - Mixed Strength", ["Bench 5x5", "Rows 4x6"]),
-        ("Day 7 - Active Recovery", ["Light swim / walk"])
-    ]
-}
-
-
-def generate_workout_plan(level, goal):
-    template = WORKOUT_TEMPLATES.get(level, WORKOUT_TEMPLATES["beginner"])
-    adapted = []
-    for day, exs in template:
-        ex = list(exs)
-        if "Lose" in goal and not any(kw in e.lower() for e in ex for kw in ["cardio", "walk"]):
-            ex.append("10-15 min cardio finisher")
-        if "Gain" in goal:
-            ex.append("Progressive overload: increase weight over weeks")
-        adapted.append((day, ex))
-    return adapted
-
-
-def ai_diet_suggestions(targets, last_plan_df):
-    tips = []
-    tcal = targets.get("TargetCalories")
-    if tcal and tcal < 1600:
-        tips.append("Target calories are low — prioritize protein and nutrient-dense foods.")
-    if targets and targets.get("Protein_g", 0) < 1:
-        tips.append("Distribute protein across meals (20-30g per meal).")
-    if last_plan_df is not None:
-        for _, r in last_plan_df.iterrows():
-            if any("Peanut Butter" in it["name"] and r["Meal"].lower().startswith("sn") for it in r["Items"]):
-                tips.append("Swap some peanut-butter snacks for Greek yogurt + berries.")
-                break
-    tips.extend([
-        "Include colored vegetables for vitamins and fiber.",
-        "Stay hydrated (2-3 L/day depending on activity).",
-        "For medical conditions, consult a dietitian."
-    ])
-    return tips
+FOOD_INDEX = load_food_index(FOOD_STORE_PATH)
 
 
 # initilizing the session state
 if 'plan_generated' not in st.session_state:
     st.session_state.plan_generated = False
-if 'meal_plan_df' not in st.session_state:
-    st.session_state.meal_plan_df = None
+if 'meal_plan' not in st.session_state:
+    st.session_state.meal_plan = None
 if 'targets' not in st.session_state:
     st.session_state.targets = None
 if 'workout_plan' not in st.session_state:
     st.session_state.workout_plan = None
+if 'week_plan' not in st.session_state:
+    st.session_state.week_plan = None
+if 'chart_backend' not in st.session_state:
+    st.session_state.chart_backend = os.environ.get("NOFIT_CHARTS", "plotly")
+
+
+def cached_meal_plan(targets, meals, restrictions):
+    """Meal plan for a set of targets, from the cross-session plan cache when another session already made it"""
+    cache = get_plan_cache()
+    cache.bind(load_food_fingerprint(FOOD_STORE_PATH))
+    key = (*targets.values(), tuple(meals), restrictions)
+    return cache.get_or_compute(key, lambda: timed("generate_meal_plan")(generate_meal_plan)(
+        targets["TargetCalories"],
+        targets["Protein_g"],
+        targets["Carbs_g"],
+        targets["Fat_g"],
+        meals=meals,
+        solver="optimize",
+        restrictions=restrictions
+    ))
+
+
+def get_plan_graph():
+    """This session's dependency graph; stages recompute only when their own inputs change"""
+    if 'plan_graph' not in st.session_state:
+        st.session_state.plan_graph = nutrition_graph(meal_planner=cached_meal_plan)
+    return st.session_state.plan_graph
+
+
+@timed()
+def build_nutrition_plan(sex, weight, height, age, activity_level, goal, meals=("Breakfast","Lunch","Dinner","Snack"),
+                         restrictions=()):
+    """Targets and meal plan for a profile, reusing every stage whose inputs did not change"""
+    inputs = {**normalize_profile(sex, weight, height, age, activity_level, goal), "meals": tuple(meals),
+              "restrictions": tuple(sorted(restrictions))}
+    st.session_state.plan_inputs = inputs
+    values = get_plan_graph().compute(inputs, "targets", "meal_plan")
+    return values["targets"], values["meal_plan"]
 
 
 #functions to export
-def prepare_export_data():
-    """Prepare data for CSV export"""
-    if not st.session_state.meal_plan_df.empty:
-        meal_plan_df = st.session_state.meal_plan_df
-        targets = st.session_state.targets
-        
-        # Create export DataFrame
-        export_rows = []
-        for _, r in meal_plan_df.iterrows():
-            items_str = "; ".join(f"{it['name']} ({it['serving']})" for it in r["Items"])
-            export_rows.append({
-                "Meal": r["Meal"],
-                "Items": items_str,
-                "Calories": r["Calories"],
-                "Protein_g": r["Protein_g"],
-                "Carbs_g": r["Carbs_g"],
-                "Fat_g": r["Fat_g"]
-            })
-        
-        export_df = pd.DataFrame(export_rows)
-        
-        # Create CSV with headers
-        output = StringIO()
-        output.write("# Chud AI - Personalized Nutrition Plan\n")
-        output.write(f"# Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}\n")
-        for k, v in targets.items():
-            output.write(f"# {k}: {v}\n")
-        output.write("\n")
-        export_df.to_csv(output, index=False)
-        
-        return output.getvalue()
-    
-    return ""
+@fragment
+def export_section():
+    """CSV download; the file is built only when clicked and the click does not rerun the app"""
+    st.download_button(
+        label="EXPORT TO CSV",
+        data=functools.partial(export_plan_csv, st.session_state.targets, st.session_state.meal_plan),
+        file_name=f"chudai_plan_{datetime.datetime.now().strftime('%Y%m%d')}.csv",
+        mime="text/csv",
+        on_click="ignore",
+        use_container_width=True
+    )
 
 
 ## main portion
 def main():
+    inject_theme()
+    if METRICS_ENABLED:
+        metrics_server()
+        if 'metrics_session' not in st.session_state:
+            st.session_state.metrics_session = True
+            METRICS.inc("sessions")
+        METRICS.inc("reruns", scope="full")
+
     # Header
     st.markdown('<div class="main-header">CHUD AI</div>', unsafe_allow_html=True)
     st.markdown('<div class="sub-header">Professional Fitness & Nutrition Platform</div>', unsafe_allow_html=True)
     
     # Sidebar - User Profile
-    with st.sidebar:
+    with st.sidebar, span("sidebar"):
         st.markdown("### USER PROFILE")
         
         name = st.text_input("Name", value="Ayan", key="name")
@@ -579,50 +205,38 @@ def main():
         experience = st.selectbox("Experience Level", ["beginner", "intermediate", "advanced"])
         activity_level = st.selectbox("Activity Level", list(ACTIVITY_FACTORS.keys()), index=2)
         goal = st.selectbox("Fitness Goal", list(GOAL_ADJUSTMENT.keys()), index=1)
+        restrictions = st.multiselect("Dietary Restrictions", list(RESTRICTIONS), key="restrictions",
+                                      placeholder="None")
+        profile = {"sex": sex, "weight_kg": weight, "height_cm": height, "age": age,
+                   "activity_level": activity_level, "goal": goal}
         
         st.markdown("---")
         
         # Action Buttons
-        col1, col2 = st.columns(2)
-        with col1:
-            if st.button("NUTRITION PLAN", use_container_width=True):
-                with st.spinner("Calculating your personalized plan..."):
-                    targets = calculate_tdee_and_targets(sex, weight, height, age, activity_level, goal)
-                    meal_plan_df = generate_meal_plan(
-                        targets["TargetCalories"], 
-                        targets["Protein_g"], 
-                        targets["Carbs_g"], 
-                        targets["Fat_g"]
-                    )
-                    st.session_state.targets = targets
-                    st.session_state.meal_plan_df = meal_plan_df
-                    st.session_state.plan_generated = True
-                    st.success("Plan generated successfully!")
-                    st.rerun()
-        
-        with col2:
-            if st.button("WORKOUT PLAN", use_container_width=True):
-                with st.spinner("Creating your workout plan..."):
-                    workout = generate_workout_plan(experience, goal)
-                    st.session_state.workout_plan = workout
-                    st.success("Workout plan ready!")
-                    st.rerun()
-        
+        if st.button("NUTRITION PLAN", use_container_width=True):
+            with st.spinner("Calculating your personalized plan..."):
+                targets, meal_plan = build_nutrition_plan(sex, weight, height, age, activity_level, goal,
+                                                          restrictions=restrictions)
+                st.session_state.targets = targets
+                st.session_state.meal_plan = meal_plan
+                st.session_state.plan_generated = True
+                save_to_history(name, profile, targets, meal_plan)
+                st.success("Plan generated successfully!")
+
         # Export Button
         if st.session_state.plan_generated:
-            if st.button("EXPORT TO CSV", use_container_width=True):
-                export_data = prepare_export_data()
-                st.download_button(
-                    label="Download Plan",
-                    data=export_data,
-                    file_name=f"chudai_plan_{datetime.datetime.now().strftime('%Y%m%d')}.csv",
-                    mime="text/csv",
-                    use_container_width=True
-                )
-        
+            export_section()
+
         st.markdown("---")
         st.markdown("**Version 2.0** • Professional Guidelines")
+        cache_stats = get_plan_cache().stats()
+        st.caption(f"Plan cache: {cache_stats['hits']} hits • {cache_stats['misses']} misses • {cache_stats['size']} plans")
+        computed = {name: s["computed"] for name, s in get_plan_graph().stats().items() if s["computed"]}
+        if computed:
+            st.caption("Recomputed this session: " + " • ".join(f"{name} {n}" for name, n in computed.items()))
         st.caption("Consult healthcare professionals for medical advice")
+        if METRICS_ENABLED and st.query_params.get("debug") == "1":
+            display_debug_panel()
     
     # Main Content Area
     if st.session_state.plan_generated and st.session_state.targets:
@@ -630,15 +244,26 @@ def main():
     else:
         display_welcome_message()
     
+    # Weekly Meal Plan
+    if st.session_state.plan_generated and st.session_state.targets:
+        display_weekly_plan()
+
     # Workout Section
-    if st.session_state.workout_plan:
-        display_workout_plan()
+    display_workout_plan(name, profile, experience, goal)
     
     # AI Suggestions
     if st.session_state.plan_generated:
         display_ai_suggestions()
 
+    # Progress Tracking
+    display_progress(name)
+    display_weight_log(name, profile)
+
+    # Food Search
+    display_food_search()
+
 
+@timed()
 def display_welcome_message():
     """Display welcome message when no plan is generated"""
     st.markdown("---")
@@ -685,10 +310,11 @@ def display_welcome_message():
         """)
 
 
+@fragment
 def display_nutrition_plan():
     """Display the nutrition plan with metrics and charts"""
     targets = st.session_state.targets
-    meal_plan_df = st.session_state.meal_plan_df
+    meal_plan = st.session_state.meal_plan
     
     # Quick Stats Row
     st.markdown('<div class="section-header">NUTRITION TARGETS</div>', unsafe_allow_html=True)
@@ -720,85 +346,23 @@ def display_nutrition_plan():
     
     # Charts Section
     st.markdown('<div class="section-header">DATA VISUALIZATION</div>', unsafe_allow_html=True)
+    light = st.toggle("Lightweight charts", value=st.session_state.chart_backend == "vega",
+                      help="Smaller chart payloads for slow connections")
+    st.session_state.chart_backend = "vega" if light else "plotly"
     
+    fig_macro, fig_meal = nutrition_charts(targets, meal_plan, st.session_state.chart_backend, get_chart_cache())
     col1, col2 = st.columns(2)
-    
     with col1:
-        # Macronutrient Pie Chart
-        macro_data = {
-            'Macronutrient': ['Protein', 'Carbs', 'Fat'],
-            'Calories': [
-                targets['Protein_g'] * 4,
-                targets['Carbs_g'] * 4,
-                targets['Fat_g'] * 9
-            ]
-        }
-        
-        fig_macro = go.Figure(data=[go.Pie(
-            labels=macro_data['Macronutrient'],
-            values=macro_data['Calories'],
-            hole=0.4,
-            marker=dict(colors=['#00ff88', '#00cc6a', '#00ff66']),
-            textinfo='label+percent',
-            textfont=dict(size=14, color='#ffffff')
-        )])
-        
-        fig_macro.update_layout(
-            title="Macronutrient Distribution",
-            title_font=dict(color='#00ff88', size=16, family='Inter'),
-            showlegend=True,
-            height=400,
-            margin=dict(t=50, b=20, l=20, r=20),
-            paper_bgcolor='#0a0a0a',
-            plot_bgcolor='#0a0a0a',
-            font=dict(color='#ffffff')
-        )
-        
-        st.plotly_chart(fig_macro, use_container_width=True)
-    
+        render_chart(fig_macro)
     with col2:
-        # Calories per Meal Bar Chart
-        fig_meal = go.Figure(data=[go.Bar(
-            x=meal_plan_df['Meal'],
-            y=meal_plan_df['Calories'],
-            marker=dict(
-                color=['#00ff88', '#00cc6a', '#00ff66', '#00dd77'],
-                line=dict(color='#00ff88', width=2)
-            ),
-            text=meal_plan_df['Calories'],
-            textposition='outside',
-            textfont=dict(size=12, color='#ffffff')
-        )])
-        
-        fig_meal.update_layout(
-            title="Calories per Meal",
-            title_font=dict(color='#00ff88', size=16, family='Inter'),
-            xaxis_title="Meal",
-            yaxis_title="Calories",
-            height=400,
-            margin=dict(t=50, b=50, l=50, r=20),
-            showlegend=False,
-            paper_bgcolor='#0a0a0a',
-            plot_bgcolor='#0a0a0a',
-            font=dict(color='#ffffff'),
-            xaxis=dict(gridcolor='#2a2a2a'),
-            yaxis=dict(gridcolor='#2a2a2a')
-        )
-        
-        st.plotly_chart(fig_meal, use_container_width=True)
+        render_chart(fig_meal)
     
     # Detailed Meal Plan
     st.markdown('<div class="section-header">MEAL PLAN DETAILS</div>', unsafe_allow_html=True)
     
-    # Create a display DataFrame with items as strings
-    display_df = meal_plan_df.copy()
-    display_df['Food Items'] = display_df['Items'].apply(
-        lambda items: '; '.join([f"{it['name']} ({it['serving']})" for it in items])
-    )
-    display_df = display_df[['Meal', 'Food Items', 'Calories', 'Protein_g', 'Carbs_g', 'Fat_g']]
-    
+    # Food names and servings are looked up from the shared food table only here
     st.dataframe(
-        display_df,
+        meal_plan.display_frame(),
         use_container_width=True,
         hide_index=True,
         column_config={
@@ -810,14 +374,121 @@ def display_nutrition_plan():
             "Fat_g": st.column_config.NumberColumn("Fat", format="%.1f g"),
         }
     )
+    display_food_swap(meal_plan)
 
 
-def display_workout_plan():
-    """Display the workout plan"""
+def display_food_swap(meal_plan):
+    """Closest alternatives to one food of the plan by macro profile; swapping keeps the meal's macros"""
+    with st.expander("SWAP A FOOD"):
+        col1, col2 = st.columns(2)
+        with col1:
+            m = st.selectbox("Meal", range(len(meal_plan)), format_func=lambda i: meal_plan.meals[i], key="swap_meal")
+        labels = meal_plan.item_labels()[m]
+        with col2:
+            pos = st.selectbox("Food", range(len(labels)), format_func=lambda i: labels[i], key="swap_food")
+        if pos is None:
+            st.info("This meal has no foods to swap.")
+            return
+        ids, servings = meal_plan.meal(m)
+        options = load_food_swaps(FOOD_STORE_PATH).alternatives(
+            int(ids[pos]), int(servings[pos]), k=5, meal_totals=meal_plan.nutrients()[m], exclude=ids,
+            restrictions=st.session_state.plan_inputs["restrictions"])
+        if not options:
+            st.info("No alternatives found.")
+            return
+        alternatives = pd.DataFrame([{**FOOD_INDEX.item(i, k), "change": 100 * change} for i, k, change in options])
+        st.dataframe(
+            alternatives[['name', 'serving', 'cal', 'protein', 'carbs', 'fat', 'change']],
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "name": st.column_config.TextColumn("Food", width="large"),
+                "serving": st.column_config.TextColumn("Serving"),
+                "cal": st.column_config.NumberColumn("Calories", format="%d kcal"),
+                "protein": st.column_config.NumberColumn("Protein", format="%.1f g"),
+                "carbs": st.column_config.NumberColumn("Carbs", format="%.1f g"),
+                "fat": st.column_config.NumberColumn("Fat", format="%.1f g"),
+                "change": st.column_config.NumberColumn("Meal macro change", format="%.0f%%"),
+            }
+        )
+        choice = st.selectbox("Replace with", range(len(options)), format_func=lambda i: alternatives["name"][i],
+                              key="swap_choice")
+        if st.button("SWAP", key="swap_apply"):
+            food_id, count, _ = options[choice]
+            st.session_state.meal_plan = meal_plan.swap(m, pos, food_id, count)
+            # the sidebar export and the charts read the plan too, so rerun the whole page
+            st.rerun()
+
+
+@fragment
+def display_weekly_plan():
+    """Seven-day meal plan with food variety; locked meals survive a day's regeneration"""
+    st.markdown('<div class="section-header">WEEKLY MEAL PLAN</div>', unsafe_allow_html=True)
+    targets = st.session_state.targets
+    restrictions = st.session_state.plan_inputs["restrictions"]
+    week = st.session_state.week_plan
+    if week is not None and (week.targets != targets or week.restrictions != restrictions):
+        week = st.session_state.week_plan = None
+    if week is None:
+        if st.button("PLAN MY WEEK"):
+            with st.spinner("Planning seven days..."), span("weekly_plan"):
+                week = st.session_state.week_plan = WeeklyPlan(targets, restrictions=restrictions)
+        if week is None:
+            return
+
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        day = st.selectbox("Day", range(len(week)), format_func=lambda d: f"Day {d + 1}", key="week_day")
+    with col2:
+        locked = st.multiselect("Keep these meals", week.meals, key=f"week_locked_{day}",
+                                default=[m for m in week.meals if (day, m) in week.locked])
+    week.unlock(day)
+    for meal in locked:
+        week.lock(day, meal)
+    if st.button("REGENERATE DAY", disabled=len(locked) == len(week.meals)):
+        with span("weekly_plan_regenerate"):
+            week.regenerate(day)
+
+    day_df = week.day_plan(day).display_frame()
+    st.dataframe(day_df, use_container_width=True, hide_index=True)
+    total = day_df[['Calories', 'Protein_g', 'Carbs_g', 'Fat_g']].sum()
+    st.caption(f"Day total: {total['Calories']:.0f} / {targets['TargetCalories']} kcal • "
+               f"P {total['Protein_g']:.0f} / {targets['Protein_g']} g • C {total['Carbs_g']:.0f} / {targets['Carbs_g']} g • "
+               f"F {total['Fat_g']:.0f} / {targets['Fat_g']} g • {week.recomputed['days']} day replans so far")
+    display_week_warnings(week)
+
+
+def display_week_warnings(week):
+    """Say which daily targets and variety limits the food table could not meet"""
+    why = "with your dietary restrictions" if week.restrictions else "in the food table"
+    misses = week.misses()
+    if len(misses):
+        worst = misses.max()
+        days = f"Day{'s' if len(misses) > 1 else ''} {', '.join(str(d) for d in misses.index)}"
+        st.warning(f"{len(misses)} of {len(week)} days miss a daily target by more than {week.tolerance:.0%} "
+                   f"({days}; {worst.idxmax().split('_')[0].lower()} by up to {worst.max():.0%}). "
+                   f"There are not enough suitable foods {why}.")
+    overused = week.overused()
+    if len(overused):
+        foods = overused.index.get_level_values("Food").unique()
+        st.warning(f"{', '.join(foods[:3])}{f' and {len(foods) - 3} more' if len(foods) > 3 else ''} appear on more "
+                   f"than {week.max_food_days} days a week. There are too few foods {why} to vary the week further.")
+
+
+@fragment
+def display_workout_plan(name, profile, experience, goal):
+    """Workout plan section; generating a plan reruns only this section"""
     st.markdown("---")
     st.markdown('<div class="section-header">WEEKLY WORKOUT PLAN</div>', unsafe_allow_html=True)
-    
+
+    if st.button("WORKOUT PLAN"):
+        with st.spinner("Creating your workout plan..."), span("generate_workout_plan"):
+            workout = generate_workout_plan(experience, goal)
+            st.session_state.workout_plan = workout
+            save_to_history(name, profile, st.session_state.targets, workout, kind="workout")
     workout = st.session_state.workout_plan
+    if not workout:
+        return
     
     # Workout suggestions based on day type
     workout_tips = {
@@ -866,6 +537,17 @@ def display_workout_plan():
                 </div>
             </div>
             """, unsafe_allow_html=True)
+
+    with st.expander("PERIODIZED PROGRAM"):
+        weeks = st.slider("Program length (weeks)", 8, 16, 12)
+        program = build_program(experience, goal, weeks)
+        table = program.to_frame(profile["weight_kg"])
+        st.line_chart(table.groupby("week")["tonnage_kg"].sum(), height=200)
+        week = st.number_input("Week", 1, weeks, 1)
+        columns = ["session", "exercise", "sets", "reps", "unit", "load_kg"]
+        st.dataframe(table.loc[(table["week"] == week) & (table["kind"] != "note"), columns],
+                     hide_index=True, use_container_width=True)
+        st.caption("Loads are estimated from bodyweight; the last week and every 4th week before it are deloads.")
     
     # General Workout Tips
     st.markdown("---")
@@ -898,15 +580,16 @@ def display_workout_plan():
         """)
 
 
+@fragment
 def display_ai_suggestions():
     """Display AI-powered diet suggestions"""
     st.markdown("---")
     st.markdown('<div class="section-header">AI INSIGHTS & RECOMMENDATIONS</div>', unsafe_allow_html=True)
     
-    targets = st.session_state.targets
-    meal_plan_df = st.session_state.meal_plan_df
-    
-    suggestions = ai_diet_suggestions(targets, meal_plan_df)
+    with span("ai_diet_suggestions"):
+        # the session's plan, which differs from the graph's own once a food has been swapped
+        suggestions = get_plan_graph().compute(st.session_state.plan_inputs, "suggestions",
+                                               overrides={"meal_plan": st.session_state.meal_plan})["suggestions"]
     
     for suggestion in suggestions:
         st.markdown(f"""
@@ -916,6 +599,113 @@ def display_ai_suggestions():
         """, unsafe_allow_html=True)
 
 
+@timed()
+def display_progress(user_id):
+    """Weight and calorie targets over the last two years of saved plans"""
+    since = datetime.datetime.now() - datetime.timedelta(days=730)
+    history = get_plan_history().history(user_id, since=since, kind="nutrition",
+                                         columns=("created_at", "weight_kg", "target_calories"))
+    if len(history) < 2:
+        return
+    st.markdown("---")
+    st.markdown('<div class="section-header">PROGRESS TRACKING</div>', unsafe_allow_html=True)
+    history = history.set_index("created_at")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.line_chart(history["weight_kg"], y_label="Weight (kg)")
+    with col2:
+        st.line_chart(history["target_calories"], y_label="Target calories")
+
+
+@fragment
+def display_weight_log(user_id, profile):
+    """Weigh-ins with their trend and a TDEE estimate learned from weight change against intake"""
+    st.markdown("---")
+    st.markdown('<div class="section-header">WEIGHT LOG</div>', unsafe_allow_html=True)
+    formula = calculate_tdee_and_targets(**normalize_profile(**profile))
+    planned = (st.session_state.targets or formula)["TargetCalories"]
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        weight = st.number_input("Today's weight (kg)", min_value=30.0, max_value=200.0,
+                                 value=float(profile["weight_kg"]), step=0.1, key="log_weight")
+    with col2:
+        intake = st.number_input("Daily intake (kcal)", min_value=800, max_value=6000, value=int(planned), step=50,
+                                 key="log_intake",
+                                 help="Average since your last weigh-in; defaults to your plan's target")
+    with col3:
+        st.write("")
+        if st.button("LOG WEIGHT", use_container_width=True):
+            get_plan_history().log_weight(user_id, weight, intake, formula["TDEE"])
+
+    log = get_plan_history().weights(user_id)
+    if not len(log):
+        st.caption("Log your weight every day or two. After a few weeks the TDEE estimate reflects your real "
+                   "expenditure instead of the formula.")
+        return
+    daily = trend_frame(log)
+    last = log.iloc[-1]
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        weekly = daily["kg_per_week"].iloc[-1]
+        st.metric("TREND", f"{last['trend_kg']:.1f} kg", None if pd.isna(weekly) else f"{weekly:+.2f} kg/week",
+                  delta_color="off")
+    with col2:
+        st.metric("ESTIMATED TDEE", f"{last['tdee_kcal']:.0f} kcal",
+                  f"{last['tdee_kcal'] - formula['TDEE']:+.0f} vs formula", delta_color="off")
+    with col3:
+        st.metric("FORMULA TDEE", f"{formula['TDEE']} kcal", help="Mifflin-St Jeor times your activity factor")
+    # years of daily rows are averaged into a few hundred points before they are sent to the browser
+    daily = downsample(daily)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.line_chart(daily[["weight_kg", "avg_7d_kg", "trend_kg"]], y_label="Weight (kg)")
+    with col2:
+        st.line_chart(daily["tdee_kcal"], y_label="Estimated TDEE (kcal)")
+
+
+@fragment
+def display_food_search():
+    """Search the food table by name or serving, keeping to the sidebar's dietary restrictions"""
+    st.markdown("---")
+    st.markdown('<div class="section-header">FOOD SEARCH</div>', unsafe_allow_html=True)
+
+    query = st.text_input("Search foods", placeholder="e.g. chicken breast, greek yog", key="food_query",
+                          label_visibility="collapsed")
+    if not query:
+        return
+    restrictions = st.session_state.get("restrictions", ())
+    matches = load_food_search(FOOD_STORE_PATH).search(query, limit=20, restrictions=restrictions)
+    if not len(matches):
+        st.info("No matching foods found.")
+        return
+    results_df = pd.DataFrame([FOOD_INDEX.item(i) for i in matches])
+    st.dataframe(
+        results_df[['name', 'serving', 'cal', 'protein', 'carbs', 'fat']],
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "name": st.column_config.TextColumn("Food", width="large"),
+            "serving": st.column_config.TextColumn("Serving"),
+            "cal": st.column_config.NumberColumn("Calories", format="%d kcal"),
+            "protein": st.column_config.NumberColumn("Protein", format="%.1f g"),
+            "carbs": st.column_config.NumberColumn("Carbs", format="%.1f g"),
+            "fat": st.column_config.NumberColumn("Fat", format="%.1f g"),
+        }
+    )
+
+
+def display_debug_panel():
+    """Stage timings of this session's previous full rerun (shown with ?debug=1 when metrics are on)"""
+    with st.expander("Debug: last rerun"):
+        spans = st.session_state.get("metrics_trace") or []
+        if spans:
+            st.dataframe(pd.DataFrame(spans, columns=["Stage", "Seconds"]).style.format({"Seconds": "{:.4f}"}),
+                         hide_index=True, use_container_width=True)
+        st.caption(f"Metrics on http://127.0.0.1:{metrics_server().server_port}/metrics")
+
+
 ## for app running
 if __name__ == "__main__":
-    main()
+    with METRICS.trace() as spans, span("rerun"):
+        main()
+    st.session_state.metrics_trace = spans
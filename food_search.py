@@ -0,0 +1,240 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from food_tags import restriction_mask
+
+_TOKEN_RE = re.compile(r"\w+")
+_MAX_CHAR = "\U0010ffff"
+
+
+def _tokens(text):
+    return _TOKEN_RE.findall(str(text).casefold())
+
+
+def _trigrams(token):
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _csr(keys, values, size):
+    """(key, value) pairs sorted by key -> (ptr, values) with ptr[k]:ptr[k + 1] spanning key k"""
+    ptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=size), out=ptr[1:])
+    return ptr, values
+
+
+class FoodSearchIndex:
+    """Prefix + trigram index over food names and serving descriptions for search-as-you-type.
+
+    Every query word is a prefix, and a food matches when each word prefixes one of its words.
+    Words that match nothing fall back to the closest vocabulary words by trigram similarity,
+    so small typos still find results. Ranking prefers foods whose name starts with the first
+    query word, then shorter names. Build once per food table and share it across sessions.
+
+    With dietary tags, search can drop foods that break any restrictions (food_tags.RESTRICTIONS)
+    with one bitwise test on their tag words.
+    """
+
+    # prefixes with more postings than BIG_PREFIX get a precomputed packed bitmask of their foods
+    # plus their HEAD best-ranked foods, so common words never need a posting union at query time
+    BIG_PREFIX = 8192
+    HEAD = 1024
+    # packed allowed-food bitmasks kept per distinct restriction mask
+    MAX_RESTRICTION_MASKS = 64
+
+    def __init__(self, names, servings=None, tags=None):
+        names = [str(n) for n in names]
+        servings = [""] * len(names) if servings is None else [str(s) for s in servings]
+        n = len(names)
+        # rank order: shorter (more generic) names first; postings are stored in rank space
+        self.food_of_rank = np.lexsort((np.array(names, dtype=object), np.fromiter(map(len, names), np.int64, n)))
+        serving_tokens = {s: _tokens(s) for s in set(servings)}
+        name_tokens = [_tokens(names[i]) for i in self.food_of_rank]
+        docs = [t + serving_tokens[servings[i]] for t, i in zip(name_tokens, self.food_of_rank)]
+        lens = np.fromiter(map(len, docs), np.int64, n)
+        codes, uniques = pd.factorize(np.array([t for d in docs for t in d], dtype=object))
+        order = np.argsort(uniques.astype(str))
+        vocab = uniques.astype(str)[order]
+        # one spare character so prefix + _MAX_CHAR keys never force a widening copy in searchsorted
+        self.vocab = vocab.astype(f"<U{vocab.dtype.itemsize // 4 + 1}")
+        remap = np.empty_like(order)
+        remap[order] = np.arange(len(order))
+        tok = remap[codes] if len(codes) else np.zeros(0, np.int64)
+        doc = np.repeat(np.arange(n), lens)
+        V = max(len(self.vocab), 1)
+
+        self.first_token = np.full(n, -1, dtype=np.int64)
+        has_name = np.fromiter(map(len, name_tokens), np.int64, n) > 0
+        self.first_token[has_name] = tok[(np.cumsum(lens) - lens)[has_name]]
+
+        pairs = np.sort(tok * n + doc)
+        pairs = pairs[np.r_[True, pairs[1:] != pairs[:-1]]] if len(pairs) else pairs
+        self.post_ptr, self.postings = _csr(pairs // max(n, 1), pairs % max(n, 1), len(self.vocab))
+        pairs = np.sort(doc * V + tok)
+        pairs = pairs[np.r_[True, pairs[1:] != pairs[:-1]]] if len(pairs) else pairs
+        self.doc_ptr, self.doc_tokens = _csr(pairs // V, pairs % V, n)
+
+        # typo tolerance only for words; numbers and codes must match as typed
+        fuzzy_ids = [i for i, t in enumerate(self.vocab) if t.isalpha()]
+        grams = [sorted(_trigrams(self.vocab[i])) for i in fuzzy_ids]
+        gram_codes, gram_uniques = pd.factorize(np.array([g for gs in grams for g in gs], dtype=object))
+        self.gram_ids = {g: i for i, g in enumerate(gram_uniques)}
+        self.gram_counts = np.zeros(len(self.vocab), dtype=np.int64)
+        self.gram_counts[fuzzy_ids] = [len(gs) for gs in grams]
+        owners = np.repeat(np.asarray(fuzzy_ids, dtype=np.int64), self.gram_counts[fuzzy_ids])
+        by_gram = np.argsort(gram_codes, kind="stable")
+        self.gram_ptr, self.gram_vocab = _csr(gram_codes, owners[by_gram], len(gram_uniques))
+
+        self.heads, self.masks = self._precompute_big_prefixes()
+        self.tags = None if tags is None else np.asarray(tags, dtype=np.uint64)[self.food_of_rank]
+        self._allowed_masks = {}
+        for arr in (self.food_of_rank, self.vocab, self.first_token, self.post_ptr, self.postings,
+                    self.doc_ptr, self.doc_tokens, self.gram_counts, self.gram_ptr, self.gram_vocab):
+            arr.flags.writeable = False
+
+    @classmethod
+    def from_food_index(cls, index):
+        return cls(index.name, index.serving, index.tags)
+
+    def __len__(self):
+        return len(self.food_of_rank)
+
+    def _range(self, prefix):
+        """[lo, hi) of the vocabulary words starting with prefix"""
+        if len(prefix) >= self.vocab.dtype.itemsize // 4:
+            return 0, 0
+        keys = np.array([prefix, prefix + _MAX_CHAR], dtype=self.vocab.dtype)
+        lo, hi = np.searchsorted(self.vocab, keys, side="left")
+        return int(lo), int(hi)
+
+    def _precompute_big_prefixes(self):
+        """Head and packed food bitmask for every prefix too common to union at query time"""
+        heads, masks = {}, {}
+        todo = [""]
+        while todo:
+            prefix = todo.pop()
+            lo, hi = self._range(prefix)
+            if prefix:
+                if self.post_ptr[hi] - self.post_ptr[lo] <= self.BIG_PREFIX:
+                    continue
+                mask = np.zeros(len(self), dtype=bool)
+                mask[self.postings[self.post_ptr[lo]:self.post_ptr[hi]]] = True
+                heads[prefix] = np.flatnonzero(mask)[:self.HEAD]
+                masks[prefix] = np.packbits(mask)
+            # one child per distinct next character, found by jumping over each child's range
+            i = lo + (lo < hi and self.vocab[lo] == prefix)
+            while i < hi:
+                child = self.vocab[i][:len(prefix) + 1]
+                todo.append(child)
+                i = self._range(child)[1]
+        return heads, masks
+
+    def _similar_tokens(self, token, limit=8, min_similarity=0.2):
+        """Vocabulary ids closest to token by trigram Jaccard similarity"""
+        query = _trigrams(token)
+        gids = [self.gram_ids[g] for g in query if g in self.gram_ids]
+        if not gids:
+            return np.zeros(0, np.int64)
+        hits = np.sort(np.concatenate([self.gram_vocab[self.gram_ptr[g]:self.gram_ptr[g + 1]] for g in gids]))
+        starts = np.flatnonzero(np.r_[True, hits[1:] != hits[:-1]])
+        cand, shared = hits[starts], np.diff(np.r_[starts, len(hits)])
+        sim = shared / (len(query) + self.gram_counts[cand] - shared)
+        keep = sim >= min_similarity
+        cand, sim = cand[keep], sim[keep]
+        return np.sort(cand[np.argsort(-sim, kind="stable")[:limit]])
+
+    def _matcher(self, word, fuzzy):
+        """Sorted vocabulary ids matched by one query word: its prefix range, or fuzzy neighbours"""
+        lo, hi = self._range(word)
+        if lo < hi or not fuzzy:
+            return np.arange(lo, hi)
+        return self._similar_tokens(word)
+
+    def _word_mask(self, word, ids):
+        """Packed food bitmask for a common query word (or a typo of common words), else None"""
+        if word in self.masks:
+            return self.masks[word]
+        words = self.vocab[ids]
+        if len(ids) > 1 and all(w in self.masks for w in words) and not words[0].startswith(word):
+            return np.bitwise_or.reduce([self.masks[w] for w in words])
+        return None
+
+    def _union(self, ids):
+        """Sorted rank ids of every food containing any of the vocabulary ids"""
+        if len(ids) and ids[-1] - ids[0] + 1 == len(ids):
+            parts = [self.postings[self.post_ptr[ids[0]]:self.post_ptr[ids[-1] + 1]]]
+        else:
+            parts = [self.postings[self.post_ptr[i]:self.post_ptr[i + 1]] for i in ids]
+        if len(parts) == 1 and (len(ids) == 1 or not len(parts[0])):
+            return parts[0]
+        hits = np.concatenate(parts)
+        if len(hits) * 16 < len(self):
+            hits = np.sort(hits)
+            return hits[np.r_[True, hits[1:] != hits[:-1]]]
+        mask = np.zeros(len(self), dtype=bool)
+        mask[hits] = True
+        return np.flatnonzero(mask)
+
+    def _has_any(self, cand, ids):
+        """For each candidate food, whether one of its tokens is among the sorted vocabulary ids"""
+        starts, lens = self.doc_ptr[cand], self.doc_ptr[cand + 1] - self.doc_ptr[cand]
+        owner = np.repeat(np.arange(len(cand)), lens)
+        toks = self.doc_tokens[np.arange(lens.sum()) - np.repeat(np.cumsum(lens) - lens, lens) + np.repeat(starts, lens)]
+        if ids[-1] - ids[0] + 1 == len(ids):
+            hit = (toks >= ids[0]) & (toks <= ids[-1])
+        else:
+            hit = np.isin(toks, ids)
+        return np.bincount(owner[hit], minlength=len(cand)) > 0
+
+    def _allowed_mask(self, forbidden):
+        """Packed bitmask (rank space) of the foods carrying none of the forbidden tag bits"""
+        mask = self._allowed_masks.get(forbidden)
+        if mask is None:
+            if len(self._allowed_masks) >= self.MAX_RESTRICTION_MASKS:
+                self._allowed_masks.clear()
+            mask = self._allowed_masks[forbidden] = np.packbits((self.tags & forbidden) == 0)
+        return mask
+
+    def search(self, query, limit=10, fuzzy=True, restrictions=()):
+        """Indices into the food table of up to limit foods matching query and restrictions, best first"""
+        forbidden = restriction_mask(restrictions)
+        if forbidden and self.tags is None:
+            raise ValueError("this search index was built without food tags")
+        words = _tokens(query)
+        if not words or not len(self):
+            return np.zeros(0, dtype=np.int64)
+        matchers = [self._matcher(w, fuzzy) for w in words]
+        if any(not len(m) for m in matchers):
+            return np.zeros(0, dtype=np.int64)
+        masks = [self._word_mask(w, m) for w, m in zip(words, matchers)]
+        if all(mask is not None for mask in masks):
+            if forbidden:
+                masks.append(self._allowed_mask(forbidden))
+            if len(masks) == 1 and words[0] in self.heads:
+                cand = self.heads[words[0]]
+            else:
+                # only the first HEAD matches in rank order are ranked, as for a single common word
+                both = np.bitwise_and.reduce(masks) if len(masks) > 1 else masks[0]
+                nz = np.flatnonzero(both)[:self.HEAD]
+                bits = np.unpackbits(both[nz]).reshape(-1, 8)
+                cand = (nz[:, None] * 8 + np.arange(8))[bits == 1][:self.HEAD]
+        else:
+            # drive from the rarest word, test common words by bitmask and the rest by forward index
+            sizes = [int((self.post_ptr[m + 1] - self.post_ptr[m]).sum()) for m in matchers]
+            driver = int(np.argmin(sizes))
+            cand = self._union(matchers[driver])
+            if forbidden:
+                cand = cand[(self.tags[cand] & forbidden) == 0]
+            for i, (m, mask) in enumerate(zip(matchers, masks)):
+                if i == driver or not len(cand):
+                    continue
+                if mask is not None:
+                    cand = cand[(mask[cand >> 3] >> (7 - (cand & 7))) & 1 == 1]
+                else:
+                    cand = cand[self._has_any(cand, m)]
+
+        starts_with = np.isin(self.first_token[cand], matchers[0])
+        best = cand[np.lexsort((cand, ~starts_with))[:limit]]
+        return self.food_of_rank[best]
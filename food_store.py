@@ -0,0 +1,344 @@
+import argparse
+import hashlib
+import json
+import re
+import sys
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from food_tags import FOOD_TAGS, encode_tags, infer_tags, remap_tags
+
+NUTRIENT_COLS = ["cal", "protein", "carbs", "fat"]
+
+## FoodData Central nutrient ids (amounts are per 100 g)
+FDC_ENERGY_IDS = (1008, 2047, 2048)     # kcal, Atwater general, Atwater specific
+FDC_NUTRIENT_IDS = {1003: 1, 1005: 2, 1004: 3}     # protein, carbs, fat -> column in NUTRIENT_COLS
+STORE_VERSION = 2     # 2 adds tags.npy; version 1 stores are tagged from food names on load
+
+
+class StringColumn:
+    """Read-only column of strings stored as one UTF-8 blob plus an offsets array, decoded on access"""
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, (int, np.integer)):
+            if i < 0:
+                i += len(self)
+            return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+        return np.array([self[int(j)] for j in np.arange(len(self))[i]], dtype=object)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_numpy(self):
+        return np.array(list(self), dtype=object)
+
+
+class FoodIndex(NamedTuple):
+    """Read-only columnar view of the food table shared by every planner and session"""
+    name: np.ndarray           # str per food (object array or StringColumn)
+    serving: np.ndarray
+    nutrients: np.ndarray      # (n, 4) float64, columns as NUTRIENT_COLS
+    by_cal: np.ndarray         # permutation, ascending calories
+    by_cal_desc: np.ndarray    # permutation, descending calories
+    by_pdensity: np.ndarray    # permutation, descending protein per calorie
+    tags: np.ndarray           # uint64 dietary tag bitmask per food, bits as food_tags.FOOD_TAGS
+
+    def __len__(self):
+        return len(self.name)
+
+    def item(self, i, servings=1):
+        """Food dict (name, cal, protein, carbs, fat, serving) for row i, scaled by servings"""
+        f = {"name": self.name[i]}
+        f.update(zip(NUTRIENT_COLS, (self.nutrients[i] * servings).tolist()))
+        f["serving"] = self.serving[i] if servings == 1 else f"{servings} x {self.serving[i]}"
+        return f
+
+
+def _sort_permutations(nutrients):
+    by_cal = np.argsort(nutrients[:, 0], kind="stable")
+    by_cal_desc = np.argsort(-nutrients[:, 0], kind="stable")
+    by_pdensity = np.argsort(-(nutrients[:, 1] / (nutrients[:, 0] + 1e-6)), kind="stable")
+    return by_cal, by_cal_desc, by_pdensity
+
+
+def build_food_index(food_df):
+    """Build the immutable FoodIndex for a food DataFrame once; all arrays are contiguous and read-only.
+
+    Dietary tags come from a "tags" column of tag-name lists, or are inferred from the names.
+    """
+    nutrients = np.ascontiguousarray(food_df[NUTRIENT_COLS].to_numpy(dtype=np.float64))
+    tags = encode_tags(food_df["tags"].tolist()) if "tags" in food_df else infer_tags(food_df["name"])
+    index = FoodIndex(
+        food_df["name"].to_numpy(dtype=object),
+        food_df["serving"].to_numpy(dtype=object),
+        nutrients,
+        *_sort_permutations(nutrients),
+        tags,
+    )
+    for arr in index:
+        arr.flags.writeable = False
+    return index
+
+
+def food_index_fingerprint(index):
+    """Content hash of a food table; changes whenever any name, serving or nutrient value changes"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(memoryview(np.ascontiguousarray(index.nutrients)).cast("B"))
+    h.update(memoryview(np.ascontiguousarray(index.tags)).cast("B"))
+    for column in (index.name, index.serving):
+        if isinstance(column, StringColumn):
+            h.update(memoryview(np.ascontiguousarray(column.offsets)).cast("B"))
+            h.update(memoryview(np.ascontiguousarray(column.blob)))
+        else:
+            h.update("\0".join(map(str, column)).encode("utf-8"))
+        h.update(b"\1")
+    return h.hexdigest()
+
+
+## on-disk store: one directory of .npy arrays + UTF-8 blobs, memory-mapped on load
+def _write_strings(dest, name, strings):
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    with open(dest / f"{name}.bin", "wb") as fh:
+        pos = 0
+        for i, s in enumerate(strings, start=1):
+            b = s.encode("utf-8")
+            fh.write(b)
+            pos += len(b)
+            offsets[i] = pos
+    np.save(dest / f"{name}_offsets.npy", offsets)
+
+
+def _read_strings(path, name):
+    offsets = np.load(path / f"{name}_offsets.npy", mmap_mode="r")
+    blob_path = path / f"{name}.bin"
+    blob = np.memmap(blob_path, dtype=np.uint8, mode="r") if blob_path.stat().st_size else np.zeros(0, np.uint8)
+    return StringColumn(offsets, blob)
+
+
+def save_food_store(dest, names, servings, nutrients, fdc_id=None, tags=None):
+    """Write a food table as a memory-mappable store directory, including its sort permutations.
+
+    tags are uint64 tag words per food; by default they are inferred from the names.
+    """
+    dest = Path(dest)
+    dest.mkdir(parents=True, exist_ok=True)
+    nutrients = np.ascontiguousarray(nutrients, dtype=np.float64)
+    _write_strings(dest, "name", names)
+    _write_strings(dest, "serving", servings)
+    np.save(dest / "nutrients.npy", nutrients)
+    for key, perm in zip(("by_cal", "by_cal_desc", "by_pdensity"), _sort_permutations(nutrients)):
+        np.save(dest / f"{key}.npy", perm.astype(np.int32 if len(perm) < 2**31 else np.int64))
+    np.save(dest / "tags.npy", np.asarray(infer_tags(names) if tags is None else tags, dtype=np.uint64))
+    if fdc_id is not None:
+        np.save(dest / "fdc_id.npy", np.asarray(fdc_id, dtype=np.int64))
+    # meta.json is written last so a half-written store is never loaded
+    (dest / "meta.json").write_text(json.dumps({"version": STORE_VERSION, "count": len(nutrients),
+                                                "columns": NUTRIENT_COLS, "tags": list(FOOD_TAGS)}))
+    return len(nutrients)
+
+
+def load_food_store(path):
+    """Memory-map a store written by save_food_store as a FoodIndex; nothing is parsed or copied"""
+    path = Path(path)
+    meta = json.loads((path / "meta.json").read_text())
+    if meta.get("version") not in (1, STORE_VERSION):
+        raise ValueError(f"unsupported food store version {meta.get('version')!r} in {path}")
+    names = _read_strings(path, "name")
+    if meta["version"] == 1:
+        tags = infer_tags(names)
+    else:
+        tags = remap_tags(np.load(path / "tags.npy", mmap_mode="r"), meta["tags"])
+    return FoodIndex(
+        names,
+        _read_strings(path, "serving"),
+        *(np.load(path / f"{key}.npy", mmap_mode="r")
+          for key in ("nutrients", "by_cal", "by_cal_desc", "by_pdensity")),
+        tags,
+    )
+
+
+## FoodData Central ingestion
+def _fill_energy(per100, energy):
+    """Pick the first reported energy value, falling back to 4/4/9 kcal per gram of macros"""
+    kcal = np.full(len(per100), np.nan)
+    for col in range(energy.shape[1]):
+        kcal = np.where(np.isnan(kcal), energy[:, col], kcal)
+    macros = np.nan_to_num(per100[:, 1:])
+    per100[:, 0] = np.where(np.isnan(kcal), macros @ np.array([4.0, 4.0, 9.0]), kcal)
+    per100[:, 1:] = macros
+    return per100
+
+
+def _serving(grams, description):
+    if np.isnan(grams) or grams <= 0:
+        return 100.0, "100 g"
+    return float(grams), description or f"{grams:g} g"
+
+
+def _read_fdc_csv(src, chunksize):
+    """Stream a FoodData Central CSV directory (food.csv, food_nutrient.csv, optional portions)"""
+    ids, names = [], []
+    for chunk in pd.read_csv(src / "food.csv", usecols=["fdc_id", "description"], chunksize=chunksize,
+                             dtype={"fdc_id": np.int64, "description": str}, keep_default_na=False):
+        ids.append(chunk["fdc_id"].to_numpy())
+        names.extend(chunk["description"].tolist())
+    fdc_id = np.concatenate(ids) if ids else np.zeros(0, np.int64)
+    n = len(fdc_id)
+    order = np.argsort(fdc_id, kind="stable")
+    sorted_ids = fdc_id[order]
+
+    def rows_of(col):
+        pos = np.minimum(np.searchsorted(sorted_ids, col), max(n - 1, 0))
+        found = (sorted_ids[pos] == col) if n else np.zeros(len(col), bool)
+        return order[pos[found]], found
+
+    per100 = np.full((n, 4), np.nan)
+    energy = np.full((n, len(FDC_ENERGY_IDS)), np.nan)
+    wanted = list(FDC_NUTRIENT_IDS) + list(FDC_ENERGY_IDS)
+    for chunk in pd.read_csv(src / "food_nutrient.csv", usecols=["fdc_id", "nutrient_id", "amount"],
+                             chunksize=chunksize, dtype={"fdc_id": np.int64, "nutrient_id": np.int64}):
+        chunk = chunk[chunk["nutrient_id"].isin(wanted)]
+        rows, found = rows_of(chunk["fdc_id"].to_numpy())
+        nid = chunk["nutrient_id"].to_numpy()[found]
+        amount = pd.to_numeric(chunk["amount"], errors="coerce").to_numpy()[found]
+        for fid, col in FDC_NUTRIENT_IDS.items():
+            m = nid == fid
+            per100[rows[m], col] = amount[m]
+        for col, fid in enumerate(FDC_ENERGY_IDS):
+            m = nid == fid
+            energy[rows[m], col] = amount[m]
+
+    grams = np.full(n, np.nan)
+    servings = [None] * n
+    portion_csv, branded_csv = src / "food_portion.csv", src / "branded_food.csv"
+    if portion_csv.exists():
+        for chunk in pd.read_csv(portion_csv, chunksize=chunksize, dtype=str, keep_default_na=False):
+            rows, found = rows_of(pd.to_numeric(chunk["fdc_id"]).to_numpy())
+            chunk = chunk[found]
+            gw = pd.to_numeric(chunk["gram_weight"], errors="coerce").to_numpy()
+            blank = pd.Series("", index=chunk.index)
+            desc = (chunk.get("amount", blank) + " " + chunk.get("modifier", blank)).str.strip()
+            desc = desc.where(desc != "", chunk.get("portion_description", blank))
+            for r, g, d in zip(rows, gw, desc):
+                if np.isnan(grams[r]) and g > 0:     # first portion listed wins
+                    grams[r], servings[r] = g, d
+    if branded_csv.exists():
+        for chunk in pd.read_csv(branded_csv, chunksize=chunksize, dtype=str, keep_default_na=False):
+            rows, found = rows_of(pd.to_numeric(chunk["fdc_id"]).to_numpy())
+            chunk = chunk[found]
+            size = pd.to_numeric(chunk["serving_size"], errors="coerce").to_numpy()
+            unit = chunk["serving_size_unit"].str.lower().isin(["g", "grm", "ml", "mlt"]).to_numpy()
+            text = chunk.get("household_serving_fulltext", pd.Series("", index=chunk.index)).tolist()
+            for r, g, ok, d in zip(rows, size, unit, text):
+                if ok and np.isnan(grams[r]) and g > 0:
+                    grams[r], servings[r] = g, d
+    return fdc_id, names, grams, servings, _fill_energy(per100, energy)
+
+
+def _iter_fdc_json(path):
+    """Yield food objects from a FoodData Central JSON dump (needs ijson) or a JSON Lines file"""
+    if path.suffix in (".jsonl", ".ndjson"):
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    try:
+        import ijson
+    except ImportError:
+        raise ImportError("streaming a FoodData Central .json dump requires `pip install ijson` "
+                          "(or convert it to JSON Lines)") from None
+    with open(path, "rb") as fh:
+        # dumps are {"FoundationFoods": [...]} / {"BrandedFoods": [...]} etc.; stream the first array
+        key = re.search(rb'\{\s*"(\w+)"', fh.read(4096))
+        if not key:
+            raise ValueError(f"{path} does not look like a FoodData Central JSON dump")
+        fh.seek(0)
+        yield from ijson.items(fh, f"{key.group(1).decode()}.item")
+
+
+def _read_fdc_json(src, chunksize):
+    """Stream a FoodData Central JSON dump or JSON Lines file, converting to arrays every chunksize foods"""
+    ids, names, servings, grams, per100 = [], [], [], [], []
+    chunk = ([], [], [], [])                  # fdc ids, grams, nutrient rows, energy rows of the current chunk
+
+    def flush():
+        c_ids, c_grams, c_rows, c_kcal = chunk
+        ids.append(np.array(c_ids, dtype=np.int64))
+        grams.append(np.array(c_grams, dtype=np.float64))
+        per100.append(_fill_energy(np.array(c_rows, dtype=np.float64).reshape(-1, 4),
+                                   np.array(c_kcal, dtype=np.float64).reshape(-1, len(FDC_ENERGY_IDS))))
+        for part in chunk:
+            part.clear()
+
+    for food in _iter_fdc_json(src):
+        row, kcal = [np.nan] * 4, [np.nan] * len(FDC_ENERGY_IDS)
+        for fn in food.get("foodNutrients", ()):
+            nid = (fn.get("nutrient") or {}).get("id", fn.get("nutrientId"))
+            amount = fn.get("amount", fn.get("value"))
+            if amount is None:
+                continue
+            if nid in FDC_NUTRIENT_IDS:
+                row[FDC_NUTRIENT_IDS[nid]] = float(amount)
+            elif nid in FDC_ENERGY_IDS:
+                kcal[FDC_ENERGY_IDS.index(nid)] = float(amount)
+        g, desc = np.nan, None
+        for portion in food.get("foodPortions", ()):
+            if (portion.get("gramWeight") or 0) > 0:
+                g = float(portion["gramWeight"])
+                desc = " ".join(str(p) for p in (portion.get("amount"), portion.get("modifier")
+                                                  or (portion.get("measureUnit") or {}).get("name")) if p)
+                break
+        if np.isnan(g) and str(food.get("servingSizeUnit", "")).lower() in ("g", "grm", "ml", "mlt"):
+            g, desc = float(food.get("servingSize") or np.nan), food.get("householdServingFullText")
+        for part, value in zip(chunk, (int(food.get("fdcId", -1)), g, row, kcal)):
+            part.append(value)
+        names.append(str(food.get("description", "")))
+        servings.append(desc)
+        if len(chunk[0]) >= chunksize:
+            flush()
+    if chunk[0] or not ids:
+        flush()
+    return np.concatenate(ids), names, np.concatenate(grams), servings, np.concatenate(per100)
+
+
+def ingest_fdc(src, dest, chunksize=200_000):
+    """Convert a FoodData Central dump (CSV directory, .json or .jsonl) into a food store at dest.
+
+    Nutrients are normalized from per-100 g to one serving (first listed portion, the branded
+    serving size, or 100 g). Dietary tags are inferred from the food descriptions. Returns the
+    number of foods written.
+    """
+    src = Path(src)
+    reader = _read_fdc_csv if src.is_dir() else _read_fdc_json
+    fdc_id, names, grams, descriptions, per100 = reader(src, chunksize)
+    grams, servings = zip(*(_serving(g, d) for g, d in zip(grams, descriptions))) if len(names) else ((), ())
+    nutrients = per100 * (np.asarray(grams, dtype=np.float64) / 100.0)[:, None]
+    keep = np.isfinite(nutrients).all(axis=1) & (nutrients[:, 0] > 0)
+    return save_food_store(dest, [n for n, k in zip(names, keep) if k], [s for s, k in zip(servings, keep) if k],
+                           nutrients[keep], fdc_id[keep])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a memory-mapped food store from a USDA FoodData Central dump")
+    parser.add_argument("src", help="FDC CSV directory, .json dump or .jsonl file")
+    parser.add_argument("dest", help="output store directory (point NOFIT_FOOD_STORE at it)")
+    parser.add_argument("--chunksize", type=int, default=200_000)
+    args = parser.parse_args(argv)
+    count = ingest_fdc(args.src, args.dest, args.chunksize)
+    print(f"wrote {count} foods to {args.dest}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Dietary tags of foods as packed bitmasks, and restriction filters over them.
+
+Every food carries one uint64 word with a bit set for each ingredient class it contains (FOOD_TAGS).
+A restriction such as vegan or nut-free is the set of bits it forbids, so any combination of
+restrictions is one OR of their masks. Filtering a food table is then a single
+`(tags & forbidden) == 0` over the tag column, one word per food whatever the number of tags.
+"""
+import numpy as np
+import pandas as pd
+
+# bit i of a food's tag word means it contains FOOD_TAGS[i]; append new tags, never reorder (stores record the order)
+FOOD_TAGS = ("meat", "pork", "poultry", "fish", "shellfish", "dairy", "egg", "tree_nuts", "peanuts", "gluten",
+             "soy", "sesame", "honey")
+TAG_BITS = {tag: np.uint64(1) << np.uint64(i) for i, tag in enumerate(FOOD_TAGS)}
+assert len(FOOD_TAGS) <= 64, "tags are packed into one uint64 word per food"
+
+# restriction -> tags a food must not have
+RESTRICTIONS = {
+    "Vegetarian": ("meat", "pork", "poultry", "fish", "shellfish"),
+    "Vegan": ("meat", "pork", "poultry", "fish", "shellfish", "dairy", "egg", "honey"),
+    "Pescatarian": ("meat", "pork", "poultry"),
+    "Pork-free": ("pork",),
+    "Nut-free": ("tree_nuts", "peanuts"),
+    "Peanut-free": ("peanuts",),
+    "Dairy-free": ("dairy",),
+    "Egg-free": ("egg",),
+    "Gluten-free": ("gluten",),
+    "Soy-free": ("soy",),
+    "Shellfish-free": ("shellfish",),
+    "Sesame-free": ("sesame",),
+}
+
+## name keywords for tagging foods that come without tags (FoodData Central descriptions)
+_MEAT_FREE = r"\b(?:meatless|vegan|vegetarian|veggie|plant[- ]based|imitation|meat[- ]free|substitute|analog)\b"
+TAG_PATTERNS = {
+    # tag -> (name contains, phrases removed before matching, labels that cancel the tag)
+    "meat": (r"\b(?:beef|veal|lamb|mutton|venison|bison|goat|rabbit|pork|ham|bacon|sausages?|salami|pepperoni|"
+             r"prosciutto|pancetta|chorizo|jerky|meatballs?|meat|steak|hot ?dogs?|frankfurters?|bologna|liver|"
+             r"gelatin|lard)\b", r"\bgoat(?:'s)? (?:cheese|milk)\b", _MEAT_FREE),
+    "pork": (r"\b(?:pork|ham|bacon|prosciutto|pancetta|chorizo|pepperoni|salami|lard)\b", None, _MEAT_FREE),
+    "poultry": (r"\b(?:chicken|turkey|duck|goose|quail|pheasant|hen|poultry)\b", None, _MEAT_FREE),
+    "fish": (r"\b(?:fish|salmon|tuna|cod|trout|sardines?|anchov(?:y|ies)|mackerel|halibut|tilapia|herring|haddock|"
+             r"pollock|catfish|bass|snapper|swordfish|mahi|flounder|sole|perch|pike|carp|caviar|roe|surimi)\b",
+             None, _MEAT_FREE),
+    "shellfish": (r"\b(?:shrimps?|prawns?|crabs?|lobsters?|crayfish|crawfish|clams?|mussels?|oysters?|scallops?|"
+                  r"squid|calamari|octopus)\b", None, _MEAT_FREE),
+    "dairy": (r"\b(?:milk|cheeses?|cheddar|mozzarella|parmesan|ricotta|yogh?urt|butter|buttermilk|cream|whey|"
+              r"casein|ghee|kefir|custard|pudding)\b",
+              r"\b(?:peanut|almond|cashew|nut|cocoa|coconut|soy|soya|oat|rice|hemp|seed|apple)\s+"
+              r"(?:butter|milk|cream|cheese|yogh?urt)\b|\bcream of tartar\b",
+              r"\b(?:non[- ]?dairy|dairy[- ]free|vegan)\b"),
+    "egg": (r"\b(?:eggs?|mayonnaise|mayo|meringue|omelets?|omelettes?|quiche|custard)\b", None,
+            r"\b(?:egg[- ]free|eggless|vegan)\b"),
+    "tree_nuts": (r"\b(?:almonds?|walnuts?|cashews?|pecans?|pistachios?|hazelnuts?|filberts?|macadamias?|"
+                  r"brazil nuts?|pine nuts?|nuts|praline|marzipan|nutella)\b", None, r"\bnut[- ]free\b"),
+    "peanuts": (r"\b(?:peanuts?|groundnuts?)\b", None, r"\b(?:peanut|nut)[- ]free\b"),
+    # oats count as gluten: unless certified they are usually contaminated with wheat
+    "gluten": (r"\b(?:wheat|barley|rye|malt|bread|breaded|pasta|spaghetti|macaroni|noodles?|couscous|bulgur|"
+               r"semolina|farro|spelt|seitan|crackers?|biscuits?|bagels?|muffins?|croissants?|pretzels?|cookies?|"
+               r"cakes?|pancakes?|waffles?|tortillas?|flour|croutons?|beer|oats?|oatmeal|granola|cereal)\b",
+               r"\b(?:rice (?:noodles?|flour|cakes?|crackers?)|corn (?:tortillas?|flour)|"
+               r"(?:almond|coconut|chickpea|potato) flour)\b", r"\bgluten[- ]free\b"),
+    "soy": (r"\b(?:soy|soya|soybeans?|tofu|tempeh|edamame|miso|natto|tamari|shoyu)\b", None, r"\bsoy[- ]free\b"),
+    "sesame": (r"\b(?:sesame|tahini|halva|hummus)\b", None, r"\bsesame[- ]free\b"),
+    "honey": (r"\bhoney\b", None, r"\bvegan\b"),
+}
+
+
+def tag_mask(tags):
+    """uint64 word with the bits of the named tags set"""
+    mask = np.uint64(0)
+    for tag in tags:
+        if tag not in TAG_BITS:
+            raise ValueError(f"unknown food tag {tag!r}; expected one of: {', '.join(FOOD_TAGS)}")
+        mask |= TAG_BITS[tag]
+    return mask
+
+
+def restriction_mask(restrictions):
+    """uint64 word of every tag forbidden by any of the restrictions"""
+    unknown = [r for r in restrictions if r not in RESTRICTIONS]
+    if unknown:
+        raise ValueError(f"unknown dietary restriction {unknown[0]!r}; expected one of: {', '.join(RESTRICTIONS)}")
+    return tag_mask({tag for r in restrictions for tag in RESTRICTIONS[r]})
+
+
+def allowed_foods(tags, restrictions):
+    """Boolean mask of the foods that meet every restriction, or None when there are none to apply"""
+    forbidden = restriction_mask(restrictions)
+    if not forbidden:
+        return None
+    return (tags & forbidden) == 0
+
+
+def tag_names(word):
+    """Names of the tags set in one food's tag word"""
+    word = np.uint64(word)
+    return [tag for tag in FOOD_TAGS if word & TAG_BITS[tag]]
+
+
+def encode_tags(tag_lists):
+    """uint64 tag word per food from lists of tag names"""
+    return np.fromiter((tag_mask(tags) for tags in tag_lists), dtype=np.uint64, count=len(tag_lists))
+
+
+def infer_tags(names):
+    """uint64 tag word per food guessed from its name, one vectorized regex pass per tag"""
+    names = pd.Series(list(names), dtype=object).astype(str).str.lower()
+    out = np.zeros(len(names), dtype=np.uint64)
+    for tag, (pattern, strip, cancel) in TAG_PATTERNS.items():
+        text = names if strip is None else names.str.replace(strip, " ", regex=True)
+        hit = text.str.contains(pattern, regex=True).to_numpy(dtype=bool)
+        if hit.any() and cancel is not None:
+            hit = hit & ~names.str.contains(cancel, regex=True).to_numpy(dtype=bool)
+        out[hit] |= TAG_BITS[tag]
+    return out
+
+
+def remap_tags(tags, stored_tags):
+    """Tag words written under another FOOD_TAGS order, rewritten for this one (unknown tags are dropped)"""
+    if tuple(stored_tags) == FOOD_TAGS:
+        return tags
+    out = np.zeros(len(tags), dtype=np.uint64)
+    for i, tag in enumerate(stored_tags):
+        if tag in TAG_BITS:
+            out[(tags >> np.uint64(i)) & np.uint64(1) == 1] |= TAG_BITS[tag]
+    return out
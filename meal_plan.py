@@ -0,0 +1,102 @@
+"""Compact meal plans: food ids and servings into the shared food table, rendered on demand.
+
+A MealPlan holds three small typed arrays per plan: meal offsets, food ids and integer servings.
+Each plan also keeps a reference to the FoodIndex every session shares. Names, serving labels
+and macro totals are derived from the food table only when a view asks for them: rows(),
+to_frame(), display_frame() and item_labels(). A plan kept in session state or the plan cache
+is therefore a few hundred bytes. The old list-of-food-dicts DataFrame took tens of kilobytes.
+"""
+import numpy as np
+import pandas as pd
+
+from food_store import NUTRIENT_COLS
+
+MACRO_COLS = ["Calories", "Protein_g", "Carbs_g", "Fat_g"]
+
+
+class MealPlan:
+    """One day's meals as (food id, servings) pairs into a FoodIndex"""
+
+    __slots__ = ("foods", "meals", "offsets", "food_ids", "servings")
+
+    def __init__(self, foods, meals, offsets, food_ids, servings):
+        self.foods = foods
+        self.meals = tuple(meals)
+        self.offsets = offsets          # int32, len(meals) + 1; meal m is food_ids[offsets[m]:offsets[m + 1]]
+        self.food_ids = food_ids        # int32 rows of foods
+        self.servings = servings        # int16 servings per food id
+
+    @classmethod
+    def from_meals(cls, foods, meals, food_ids, servings=None):
+        """Plan from per-meal id arrays (and servings, default one each)"""
+        counts = [len(ids) for ids in food_ids]
+        offsets = np.zeros(len(counts) + 1, dtype=np.int32)
+        np.cumsum(counts, out=offsets[1:])
+        ids = np.concatenate([np.asarray(i, dtype=np.int32) for i in food_ids]) if counts else np.zeros(0, np.int32)
+        if servings is None:
+            x = np.ones(len(ids), dtype=np.int16)
+        else:
+            x = np.concatenate([np.asarray(s, dtype=np.int16) for s in servings]) if counts else np.zeros(0, np.int16)
+        return cls(foods, meals, offsets, ids.astype(np.int32, copy=False), x)
+
+    def __len__(self):
+        return len(self.meals)
+
+    def __repr__(self):
+        return f"MealPlan({', '.join(f'{m}: {n} foods' for m, n in zip(self.meals, np.diff(self.offsets)))})"
+
+    def meal(self, m):
+        """(food ids, servings) of the m-th meal"""
+        part = slice(self.offsets[m], self.offsets[m + 1])
+        return self.food_ids[part], self.servings[part]
+
+    def swap(self, m, position, food_id, servings=1):
+        """New plan with the food at position of the m-th meal replaced; plans are shared, so never edited in place"""
+        at = int(self.offsets[m]) + position
+        food_ids, x = self.food_ids.copy(), self.servings.copy()
+        food_ids[at], x[at] = food_id, servings
+        return MealPlan(self.foods, self.meals, self.offsets, food_ids, x)
+
+    ## derived values
+    def nutrients(self):
+        """(meals, 4) unrounded calories, protein, carbs and fat per meal"""
+        out = np.zeros((len(self.meals), len(NUTRIENT_COLS)))
+        if len(self.food_ids):
+            owner = np.repeat(np.arange(len(self.meals)), np.diff(self.offsets))
+            np.add.at(out, owner, self.foods.nutrients[self.food_ids] * self.servings[:, None])
+        return out
+
+    def totals(self):
+        """Per-meal macros rounded as plan rows show them: whole calories, grams to one decimal"""
+        out = self.nutrients()
+        out[:, 0] = np.round(out[:, 0])
+        out[:, 1:] = np.round(out[:, 1:], 1)
+        return out
+
+    def item_labels(self):
+        """Per meal, the "name (serving)" label of each food"""
+        name, serving = self.foods.name, self.foods.serving
+        labels = [f"{name[i]} ({serving[i]})" if k == 1 else f"{name[i]} ({k} x {serving[i]})"
+                  for i, k in zip(self.food_ids.tolist(), self.servings.tolist())]
+        bounds = self.offsets.tolist()
+        return [labels[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+
+    ## views
+    def rows(self):
+        """Row dicts with full food dicts in Items, the format of the JSON API and batch records"""
+        totals = self.totals().tolist()
+        return [{"Meal": meal, "Items": [self.foods.item(int(i), int(k)) for i, k in zip(*self.meal(m))],
+                 "Calories": int(t[0]), "Protein_g": t[1], "Carbs_g": t[2], "Fat_g": t[3]}
+                for m, (meal, t) in enumerate(zip(self.meals, totals))]
+
+    def to_frame(self):
+        """rows() as a DataFrame"""
+        return pd.DataFrame(self.rows(), columns=["Meal", "Items", *MACRO_COLS])
+
+    def display_frame(self):
+        """Meal, Food Items (one "; "-joined string) and macro columns, for tables and CSV export"""
+        frame = pd.DataFrame(self.totals(), columns=MACRO_COLS)
+        frame["Calories"] = frame["Calories"].astype(np.int64)
+        frame.insert(0, "Meal", list(self.meals))
+        frame.insert(1, "Food Items", ["; ".join(labels) for labels in self.item_labels()])
+        return frame
@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_profile(sex, weight_kg, height_cm, age, activity_level, goal, weight_step=0.5, height_step=0.5):
+    """Canonical, quantized form of a profile so near-identical submissions share one cache entry.
+
+    Plans are computed from the normalized values, so a cached result is exactly what a miss
+    would have produced for that key.
+    """
+    return {
+        "sex": "Male" if str(sex).lower().startswith('m') else "Female",
+        "weight_kg": round(round(float(weight_kg) / weight_step) * weight_step, 2),
+        "height_cm": round(round(float(height_cm) / height_step) * height_step, 2),
+        "age": int(age),
+        "activity_level": str(activity_level),
+        "goal": str(goal),
+    }
+
+
+class PlanCache:
+    """Thread-safe LRU + TTL cache shared by all sessions of one process.
+
+    Entries are keyed on normalized inputs and tagged with the food table fingerprint; binding a
+    different fingerprint drops every entry and starts a new generation. A value computed before
+    that is not stored (see put). Cached values are shared and must not be mutated.
+    """
+
+    def __init__(self, maxsize=4096, ttl=3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.fingerprint = None
+        self.generation = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def bind(self, fingerprint):
+        """Attach the cache to a food table; entries computed against another table are discarded"""
+        with self._lock:
+            if fingerprint != self.fingerprint:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self.fingerprint = fingerprint
+                self.generation += 1
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                    self.evictions += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, generation=None):
+        """Store value for key; with generation, only if no bind() or clear() has happened since it was read"""
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def get_or_compute(self, key, compute):
+        """Cached value for key, computing (outside the lock) and storing it on a miss.
+
+        A value whose compute() overlapped a bind() to another table is returned but not cached.
+        """
+        missing = object()
+        generation = self.generation
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value, generation)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
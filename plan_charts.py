@@ -0,0 +1,165 @@
+"""Nutrition charts, built once per distinct plan and reused across reruns and sessions.
+
+Two backends draw the same two charts (macro split and calories per meal):
+- "plotly", the default
+- "vega", a lightweight alternative whose Vega-Lite spec is a fraction of the Plotly payload
+
+Built charts are cached on a content hash of the values they plot. For Plotly the cache holds a
+figure whose spec was serialized once, so an unchanged rerun neither rebuilds the figure nor
+re-validates it.
+"""
+import functools
+import hashlib
+import json
+
+from meal_plan import MealPlan
+from plan_cache import PlanCache
+
+BACKENDS = ("plotly", "vega")
+MACRO_COLORS = ['#00ff88', '#00cc6a', '#00ff66']
+MEAL_COLORS = ['#00ff88', '#00cc6a', '#00ff66', '#00dd77']
+
+
+def chart_data(targets, meal_plan):
+    """Exactly the values the charts plot: macro calories and calories per meal"""
+    if isinstance(meal_plan, MealPlan):
+        meals, calories = meal_plan.meals, meal_plan.totals()[:, 0]
+    else:
+        meals, calories = meal_plan['Meal'], meal_plan['Calories']
+    return {
+        "macros": [int(targets['Protein_g']) * 4, int(targets['Carbs_g']) * 4, int(targets['Fat_g']) * 9],
+        "meals": [str(m) for m in meals],
+        "calories": [int(c) for c in calories],
+    }
+
+
+def content_key(backend, data):
+    return backend, hashlib.blake2b(json.dumps(data, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+## plotly
+@functools.lru_cache(maxsize=None)
+def _prepared_figure_class():
+    import plotly.graph_objects as go
+
+    class PreparedFigure(go.Figure):
+        """Figure whose dict form is computed once; st.plotly_chart reads it instead of re-serializing"""
+
+        def __init__(self, figure):
+            super().__init__(figure)
+            self._spec = figure.to_dict()
+
+        def to_dict(self):
+            return self._spec
+
+    return PreparedFigure
+
+
+def plotly_figures(data):
+    import plotly.graph_objects as go  # deferred: only needed once a plan is shown
+
+    fig_macro = go.Figure(data=[go.Pie(
+        labels=['Protein', 'Carbs', 'Fat'],
+        values=data['macros'],
+        hole=0.4,
+        marker=dict(colors=MACRO_COLORS),
+        textinfo='label+percent',
+        textfont=dict(size=14, color='#ffffff')
+    )])
+    fig_macro.update_layout(
+        title="Macronutrient Distribution",
+        title_font=dict(color='#00ff88', size=16, family='Inter'),
+        showlegend=True,
+        height=400,
+        margin=dict(t=50, b=20, l=20, r=20),
+        paper_bgcolor='#0a0a0a',
+        plot_bgcolor='#0a0a0a',
+        font=dict(color='#ffffff')
+    )
+
+    fig_meal = go.Figure(data=[go.Bar(
+        x=data['meals'],
+        y=data['calories'],
+        marker=dict(
+            color=MEAL_COLORS,
+            line=dict(color='#00ff88', width=2)
+        ),
+        text=data['calories'],
+        textposition='outside',
+        textfont=dict(size=12, color='#ffffff')
+    )])
+    fig_meal.update_layout(
+        title="Calories per Meal",
+        title_font=dict(color='#00ff88', size=16, family='Inter'),
+        xaxis_title="Meal",
+        yaxis_title="Calories",
+        height=400,
+        margin=dict(t=50, b=50, l=50, r=20),
+        showlegend=False,
+        paper_bgcolor='#0a0a0a',
+        plot_bgcolor='#0a0a0a',
+        font=dict(color='#ffffff'),
+        xaxis=dict(gridcolor='#2a2a2a'),
+        yaxis=dict(gridcolor='#2a2a2a')
+    )
+    prepared = _prepared_figure_class()
+    return prepared(fig_macro), prepared(fig_meal)
+
+
+## vega-lite
+_VEGA_CONFIG = {
+    "background": "#0a0a0a",
+    "view": {"stroke": None},
+    "title": {"color": "#00ff88", "fontSize": 16, "font": "Inter", "anchor": "start"},
+    "axis": {"labelColor": "#ffffff", "titleColor": "#ffffff", "gridColor": "#2a2a2a", "domainColor": "#2a2a2a"},
+    "legend": {"labelColor": "#ffffff"},
+    "text": {"color": "#ffffff"},
+}
+
+
+def vega_specs(data):
+    total = sum(data['macros']) or 1
+    macro_values = [{"Macronutrient": name, "Calories": cal, "Share": f"{name} {cal / total:.0%}"}
+                    for name, cal in zip(['Protein', 'Carbs', 'Fat'], data['macros'])]
+    color = {"field": "Macronutrient", "type": "nominal", "sort": None,
+             "scale": {"domain": ['Protein', 'Carbs', 'Fat'], "range": MACRO_COLORS}}
+    macro = {
+        "title": "Macronutrient Distribution",
+        "height": 340,
+        "data": {"values": macro_values},
+        "encoding": {"theta": {"field": "Calories", "type": "quantitative", "stack": True}, "color": color,
+                     "order": {"field": "Calories", "type": "quantitative", "sort": "descending"}},
+        "layer": [{"mark": {"type": "arc", "innerRadius": 60, "outerRadius": 140}},
+                  {"mark": {"type": "text", "radius": 165, "fontSize": 13}, "encoding": {"text": {"field": "Share"}}}],
+        "config": _VEGA_CONFIG,
+    }
+    meal = {
+        "title": "Calories per Meal",
+        "height": 340,
+        "data": {"values": [{"Meal": m, "Calories": c} for m, c in zip(data['meals'], data['calories'])]},
+        "encoding": {"x": {"field": "Meal", "type": "nominal", "sort": None, "axis": {"labelAngle": 0}},
+                     "y": {"field": "Calories", "type": "quantitative"}},
+        "layer": [{"mark": {"type": "bar", "stroke": "#00ff88", "strokeWidth": 2},
+                   "encoding": {"color": {"field": "Meal", "type": "nominal", "sort": None, "legend": None,
+                                          "scale": {"range": MEAL_COLORS}}}},
+                  {"mark": {"type": "text", "dy": -8, "fontSize": 12}, "encoding": {"text": {"field": "Calories"}}}],
+        "config": _VEGA_CONFIG,
+    }
+    return macro, meal
+
+
+BUILDERS = {"plotly": plotly_figures, "vega": vega_specs}
+
+
+def nutrition_charts(targets, meal_plan, backend="plotly", cache=None):
+    """(macro chart, calories-per-meal chart) for backend, from cache when the plotted values were seen before"""
+    if backend not in BUILDERS:
+        raise ValueError(f"unknown chart backend: {backend!r}")
+    data = chart_data(targets, meal_plan)
+    if cache is None:
+        return BUILDERS[backend](data)
+    return cache.get_or_compute(content_key(backend, data), lambda: BUILDERS[backend](data))
+
+
+def chart_cache(maxsize=512):
+    return PlanCache(maxsize=maxsize, ttl=24 * 3600)
@@ -0,0 +1,146 @@
+"""Incremental computation of derived plan values across reruns.
+
+Each stage is a function of named inputs and of other stages. The graph remembers the key each
+stage was last computed from and recomputes a stage only when that key changes. Changing the
+activity level therefore reuses BMR, and changing the goal leaves BMR and TDEE alone.
+
+A stage whose recomputed value equals the previous one keeps its version, so everything
+downstream is reused too. For example, a weight change too small to move any rounded target
+never reaches the meal plan.
+"""
+from fitness_core import (
+    ACTIVITY_FACTORS, GOAL_ADJUSTMENT, MEAL_SPLITS, ai_diet_suggestions, calculate_bmr, generate_meal_plan,
+    protein_per_kg,
+)
+
+
+def _same(a, b):
+    try:
+        return type(a) is type(b) and bool(a == b)
+    except (TypeError, ValueError):
+        # DataFrames and arrays compare element-wise; treat them as changed
+        return False
+
+
+class DependencyGraph:
+    """Named stages over named inputs, recomputed only when something they depend on changed"""
+
+    def __init__(self):
+        self.stages = {}        # name -> (fn, deps)
+        self._memo = {}         # name -> (key, value, version)
+        self._overridden = {}   # name -> (value, version) of the last override passed for it
+        self.computed = {}
+        self.reused = {}
+
+    def add(self, name, fn, *deps):
+        """Register stage name = fn(*deps); deps are input names or earlier stages"""
+        if name in self.stages:
+            raise ValueError(f"stage {name!r} is already defined")
+        self.stages[name] = (fn, deps)
+        self.computed[name] = self.reused[name] = 0
+        return self
+
+    def inputs(self):
+        return sorted({d for _, deps in self.stages.values() for d in deps if d not in self.stages})
+
+    def compute(self, inputs, *names, overrides=None):
+        """Values of the named stages (all stages if none named) for inputs, reusing what has not changed.
+
+        overrides maps stage names to values used instead of computing them, such as a meal plan the
+        user edited. Stages downstream of an override are computed from it. The overridden stage's
+        own memo is left as it was, so leaving the override out returns to the computed value.
+        """
+        overrides = overrides or {}
+        missing = [d for d in self.inputs() if d not in inputs]
+        if missing:
+            raise KeyError(f"missing graph inputs: {', '.join(missing)}")
+        versions = {}
+        values = {}
+
+        def visit(name):
+            if name in versions:
+                return
+            if name in overrides:
+                versions[name], values[name] = self._override(name, overrides[name])
+                return
+            fn, deps = self.stages[name]
+            for d in deps:
+                if d in self.stages:
+                    visit(d)
+            key = tuple(versions[d] if d in self.stages else inputs[d] for d in deps)
+            memo = self._memo.get(name)
+            if memo is not None and memo[0] == key:
+                self.reused[name] += 1
+                _, value, version = memo
+            else:
+                value = fn(*(values[d] if d in self.stages else inputs[d] for d in deps))
+                self.computed[name] += 1
+                if memo is not None and _same(value, memo[1]):
+                    value, version = memo[1], memo[2]
+                else:
+                    version = memo[2] + 1 if memo is not None else 0
+                self._memo[name] = (key, value, version)
+            versions[name], values[name] = version, value
+
+        for name in names or self.stages:
+            visit(name)
+        return {name: values[name] for name in (names or self.stages)}
+
+    def _override(self, name, value):
+        """Version of an override: kept while the same value is passed, so its dependents are reused"""
+        previous = self._overridden.get(name)
+        if previous is not None and _same(value, previous[0]):
+            return previous[1], previous[0]
+        version = ("override", previous[1][1] + 1 if previous is not None else 0)
+        self._overridden[name] = (value, version)
+        return version, value
+
+    def stats(self):
+        """Per stage: how often it was recomputed and how often its cached value was reused"""
+        return {name: {"computed": self.computed[name], "reused": self.reused[name]} for name in self.stages}
+
+    def reset_stats(self):
+        for name in self.stages:
+            self.computed[name] = self.reused[name] = 0
+
+
+## the nutrition pipeline: BMR -> TDEE -> target calories -> macros -> per-meal splits -> meal plan -> suggestions
+def _carbs_g(target_calories, protein_g):
+    return round(max(0, target_calories - (protein_g * 4 + 0.25 * target_calories)) / 4)
+
+
+def _targets(bmr, tdee, target_calories, protein_g, carbs_g, fat_g):
+    return {"BMR": round(bmr), "TDEE": round(tdee), "TargetCalories": round(target_calories),
+            "Protein_g": int(protein_g), "Carbs_g": int(carbs_g), "Fat_g": int(fat_g)}
+
+
+def _meal_targets(targets, meals):
+    """Per-meal [calories, protein, carbs, fat] targets, split as the meal planner splits them"""
+    available = [m for m in meals if m]
+    total = sum(MEAL_SPLITS.get(m, 0.15) for m in available)
+    daily = (targets["TargetCalories"], targets["Protein_g"], targets["Carbs_g"], targets["Fat_g"])
+    return {m: tuple(v * MEAL_SPLITS.get(m, 0.15) / total for v in daily) for m in available}
+
+
+def _meal_plan(targets, meals, restrictions):
+    return generate_meal_plan(targets["TargetCalories"], targets["Protein_g"], targets["Carbs_g"], targets["Fat_g"],
+                              meals=meals, solver="optimize", restrictions=restrictions)
+
+
+def nutrition_graph(meal_planner=_meal_plan):
+    """Graph over the inputs of calculate_tdee_and_targets plus meals and dietary restrictions.
+
+    Its targets stage matches that function. meal_planner(targets, meals, restrictions) -> MealPlan
+    replaces the default optimize solve (e.g. to route it through a shared cache).
+    """
+    return (DependencyGraph()
+            .add("bmr", calculate_bmr, "sex", "weight_kg", "height_cm", "age")
+            .add("tdee", lambda bmr, level: bmr * ACTIVITY_FACTORS.get(level, 1.375), "bmr", "activity_level")
+            .add("target_calories", lambda tdee, goal: tdee * GOAL_ADJUSTMENT.get(goal, 1.0), "tdee", "goal")
+            .add("protein_g", lambda weight, goal: round(protein_per_kg(goal) * weight), "weight_kg", "goal")
+            .add("fat_g", lambda target_calories: round(0.25 * target_calories / 9), "target_calories")
+            .add("carbs_g", _carbs_g, "target_calories", "protein_g")
+            .add("targets", _targets, "bmr", "tdee", "target_calories", "protein_g", "carbs_g", "fat_g")
+            .add("meal_targets", _meal_targets, "targets", "meals")
+            .add("meal_plan", meal_planner, "targets", "meals", "restrictions")
+            .add("suggestions", ai_diet_suggestions, "targets", "meal_plan"))
@@ -0,0 +1,267 @@
+"""Persistent plan history in an embedded SQLite database (WAL mode).
+
+Every generated plan is stored with a snapshot of the profile and targets. The snapshot fields
+are plain indexed columns, so progress queries never decode the plan JSON. Saves are queued and
+written in batches by a background thread, so saving never blocks a Streamlit rerun. A batch that
+cannot be written (a lock held by another process, say) is retried a few times and then dropped and
+counted. flush() and close() report it; save() never fails because an earlier batch did.
+
+The same database keeps each user's weight log, one weigh-in per day. Each row stores the
+weight trend and TDEE estimate after it, so logging a weigh-in reads one earlier row only.
+"""
+import atexit
+import datetime
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import weight_trend
+from meal_plan import MealPlan
+
+HISTORY_DB_PATH = os.environ.get("NOFIT_HISTORY_DB", "nofit_history.db")
+RETRY_DELAYS = (0.1, 0.5, 2.0)      # seconds before each retry of a failed batch write
+
+PROFILE_COLS = ["sex", "weight_kg", "height_cm", "age", "activity_level", "goal"]
+TARGET_COLS = {"BMR": "bmr", "TDEE": "tdee", "TargetCalories": "target_calories",
+               "Protein_g": "protein_g", "Carbs_g": "carbs_g", "Fat_g": "fat_g"}
+SUMMARY_COLS = ["id", "created_at", "kind", *PROFILE_COLS, *TARGET_COLS.values()]
+TEXT_COLS = {"kind", "sex", "activity_level", "goal"}
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS plans (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    kind TEXT NOT NULL,
+    sex TEXT, weight_kg REAL, height_cm REAL, age INTEGER, activity_level TEXT, goal TEXT,
+    {", ".join(f"{c} INTEGER" for c in TARGET_COLS.values())},
+    plan TEXT
+);
+-- covers the history() columns, so a user's time range is read from contiguous index pages only
+CREATE INDEX IF NOT EXISTS plans_user_time ON plans (user_id, created_at, {", ".join(SUMMARY_COLS[2:])});
+CREATE TABLE IF NOT EXISTS weights (
+    user_id TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    logged_at REAL NOT NULL,
+    weight_kg REAL NOT NULL,
+    intake_kcal REAL NOT NULL,
+    trend_kg REAL NOT NULL,
+    tdee_kcal REAL NOT NULL,
+    PRIMARY KEY (user_id, day)
+) WITHOUT ROWID;
+"""
+WEIGHT_COLS = ["day", "logged_at", "weight_kg", "intake_kcal", "trend_kg", "tdee_kcal"]
+INSERT_WEIGHT = (f"INSERT OR REPLACE INTO weights (user_id, {', '.join(WEIGHT_COLS)}) "
+                 f"VALUES ({', '.join(['?'] * (1 + len(WEIGHT_COLS)))})")
+INSERT = (f"INSERT INTO plans (user_id, created_at, kind, {', '.join(PROFILE_COLS)}, "
+          f"{', '.join(TARGET_COLS.values())}, plan) VALUES ({', '.join(['?'] * (4 + len(PROFILE_COLS) + len(TARGET_COLS)))})")
+
+
+def _timestamp(value):
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    return value.timestamp()
+
+
+def _plan_json(plan):
+    if plan is None:
+        return None
+    if isinstance(plan, MealPlan):
+        plan = plan.rows()
+    elif isinstance(plan, pd.DataFrame):
+        plan = plan.to_dict("records")
+    return json.dumps(plan, default=lambda v: v.item() if hasattr(v, "item") else str(v))
+
+
+class PlanHistory:
+    """Plan store for one database file, safe to share across sessions and threads"""
+
+    def __init__(self, path=HISTORY_DB_PATH, batch_size=256):
+        self.path = str(path)
+        self.batch_size = batch_size
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._error = None
+        self.failed = 0
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        self._writer = threading.Thread(target=self._write_loop, name="plan-history-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self._stop)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    ## writes
+    def save(self, user_id, profile, targets=None, plan=None, kind="nutrition", created_at=None):
+        """Queue a plan snapshot; returns immediately, the background writer persists it"""
+        created_at = time.time() if created_at is None else _timestamp(created_at)
+        self._queue.put((str(user_id), created_at, kind, dict(profile), dict(targets or {}), plan))
+
+    def _row(self, item):
+        user_id, created_at, kind, profile, targets, plan = item
+        return (user_id, created_at, kind, *(profile.get(c) for c in PROFILE_COLS),
+                *(None if targets.get(k) is None else int(targets[k]) for k in TARGET_COLS), _plan_json(plan))
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            items = [self._queue.get()]
+            # whatever queued up while the last batch was written goes into this one
+            while len(items) < self.batch_size:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in items
+            rows = []
+            for it in items:
+                if it is None:
+                    continue
+                try:
+                    rows.append(self._row(it))
+                except Exception as exc:
+                    self._failed(1, exc)
+            for delay in (*RETRY_DELAYS, None):
+                try:
+                    self._insert(conn, rows)
+                    break
+                except sqlite3.Error as exc:
+                    if delay is None:
+                        self._failed(len(rows), exc)
+                    else:
+                        time.sleep(delay)
+            for _ in items:
+                self._queue.task_done()
+            if stop:
+                conn.close()
+                return
+
+    def _insert(self, conn, rows):
+        with conn:
+            conn.executemany(INSERT, rows)
+
+    def _failed(self, count, exc):
+        """Drop count saves: counted in self.failed, the error kept for the next flush() or close()"""
+        self.failed += count
+        self._error = exc
+        print(f"plan history: dropped {count} plan(s): {exc}", file=sys.stderr)
+
+    def _raise_error(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise RuntimeError(f"plan history writer dropped plans ({self.failed} so far)") from error
+
+    def flush(self):
+        """Block until every queued save is written or dropped; RuntimeError if any was dropped since the last call"""
+        self._queue.join()
+        self._raise_error()
+
+    def _stop(self):
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+
+    def close(self):
+        """Write what is queued and stop the writer; RuntimeError if any save was dropped since the last flush()"""
+        self._stop()
+        self._raise_error()
+
+    ## reads
+    def history(self, user_id, since=None, until=None, kind=None, columns=SUMMARY_COLS):
+        """Profile and target snapshots for user_id in [since, until), oldest first, without the plans"""
+        unknown = set(columns) - set(SUMMARY_COLS)
+        if unknown:
+            raise ValueError(f"unknown history columns: {', '.join(sorted(unknown))}")
+        sql = f"SELECT {', '.join(columns)} FROM plans WHERE user_id = ? AND created_at >= ? AND created_at < ?"
+        params = [str(user_id), _timestamp(since) or 0.0, _timestamp(until) or float("inf")]
+        if kind is not None:
+            sql += " AND kind = ?"
+            params.append(kind)
+        rows = self._reader().execute(sql + " ORDER BY created_at", params).fetchall()
+        # built column by column with explicit dtypes; letting pandas infer costs more than the query
+        values = zip(*rows) if rows else [()] * len(columns)
+        data = {c: np.array(v, dtype=object if c in TEXT_COLS else np.int64 if c == "id" else np.float64)
+                for c, v in zip(columns, values)}
+        if "created_at" in data:
+            data["created_at"] = np.round(data["created_at"] * 1e6).astype("datetime64[us]")
+        return pd.DataFrame(data, columns=list(columns), copy=False)
+
+    def plan(self, plan_id):
+        """Full stored record for one history id, with the plan decoded; None if unknown"""
+        cur = self._reader().execute(f"SELECT user_id, {', '.join(SUMMARY_COLS)}, plan FROM plans WHERE id = ?",
+                                     (plan_id,))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        record = dict(zip(["user_id", *SUMMARY_COLS, "plan"], row))
+        record["plan"] = json.loads(record["plan"]) if record["plan"] else None
+        return record
+
+    ## weight log
+    def log_weight(self, user_id, weight_kg, intake_kcal, prior_tdee, logged_at=None):
+        """Record a weigh-in and return the TrendState after it.
+
+        intake_kcal is the average daily intake since the previous weigh-in (the plan's target
+        calories when not tracked). prior_tdee, the formula TDEE, seeds a user's first estimate.
+        A second weigh-in on the same day replaces the first. The estimate is updated from the
+        previous day's row alone; only a backdated weigh-in recomputes the days after it. Written
+        synchronously, unlike plan saves, because the caller shows the new estimate right away.
+        """
+        logged_at = time.time() if logged_at is None else _timestamp(logged_at)
+        day = weight_trend.day_number(logged_at)
+        user_id = str(user_id)
+        conn = self._reader()
+        with conn:
+            prev = conn.execute("SELECT day, trend_kg, tdee_kcal FROM weights WHERE user_id = ? AND day < ? "
+                                "ORDER BY day DESC LIMIT 1", (user_id, day)).fetchone()
+            if prev is None:
+                state = weight_trend.start(day, weight_kg, prior_tdee)
+            else:
+                state = weight_trend.update(weight_trend.TrendState(*prev), day, weight_kg, intake_kcal)
+            conn.execute(INSERT_WEIGHT, (user_id, day, logged_at, float(weight_kg), float(intake_kcal),
+                                         state.trend_kg, state.tdee_kcal))
+            later = conn.execute("SELECT day, weight_kg, intake_kcal FROM weights WHERE user_id = ? AND day > ? "
+                                 "ORDER BY day", (user_id, day)).fetchall()
+            if later:
+                days, weights, intakes = zip(*later)
+                redo = weight_trend.estimate(days, weights, intakes, seed=state)
+                conn.executemany("UPDATE weights SET trend_kg = ?, tdee_kcal = ? WHERE user_id = ? AND day = ?",
+                                 [(t, e, user_id, d) for d, t, e in
+                                  zip(days, redo["trend_kg"].tolist(), redo["tdee_kcal"].tolist())])
+        return state
+
+    def weights(self, user_id, since=None, until=None):
+        """Weigh-ins of user_id logged in [since, until), oldest first, with the trend and TDEE after each"""
+        rows = self._reader().execute(
+            f"SELECT {', '.join(WEIGHT_COLS)} FROM weights WHERE user_id = ? AND day >= ? AND day < ? ORDER BY day",
+            (str(user_id), weight_trend.day_number(_timestamp(since) or 86400.0),
+             weight_trend.day_number(_timestamp(until)) if until is not None else 2**62)).fetchall()
+        values = zip(*rows) if rows else [()] * len(WEIGHT_COLS)
+        data = {c: np.array(v, dtype=np.int64 if c == "day" else np.float64) for c, v in zip(WEIGHT_COLS, values)}
+        data["logged_at"] = np.round(data["logged_at"] * 1e6).astype("datetime64[us]")
+        return pd.DataFrame(data, columns=WEIGHT_COLS, copy=False)
+
+    def latest(self, user_id, kind="nutrition"):
+        """Most recent full record of kind for user_id, or None"""
+        row = self._reader().execute("SELECT id FROM plans WHERE user_id = ? AND kind = ? "
+                                     "ORDER BY created_at DESC LIMIT 1", (str(user_id), kind)).fetchone()
+        return self.plan(row[0]) if row else None
@@ -0,0 +1,140 @@
+"""Rerun profiling: timing spans, rerun and session counters, exposed in Prometheus text format.
+
+Off unless NOFIT_METRICS is set to something other than 0. When off, `timed` hands back the
+function it wraps and `span` returns one shared no-op context, so instrumented code costs
+nothing measurable. When on, `serve` exposes /metrics on 127.0.0.1:NOFIT_METRICS_PORT (default 9464).
+"""
+import bisect
+import contextlib
+import functools
+import http.server
+import os
+import threading
+import time
+
+ENABLED = os.environ.get("NOFIT_METRICS", "0") not in ("", "0")
+METRICS_PORT = int(os.environ.get("NOFIT_METRICS_PORT", "9464"))
+# seconds; the last bucket is +Inf
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NOOP = contextlib.nullcontext()
+
+
+def _labels(labels):
+    return ",".join(f'{k}="{v}"' for k, v in labels)
+
+
+class Metrics:
+    """Process-wide span histograms and counters; safe to update from every session thread"""
+
+    def __init__(self, prefix="nofit", buckets=BUCKETS):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._histograms = {}   # stage -> [bucket counts..., +Inf count, sum]
+        self._counters = {}     # (name, labels) -> value
+        self._local = threading.local()
+
+    ## recording
+    def observe(self, stage, seconds):
+        with self._lock:
+            h = self._histograms.get(stage)
+            if h is None:
+                h = self._histograms[stage] = [0] * (len(self.buckets) + 1) + [0.0]
+            h[bisect.bisect_left(self.buckets, seconds)] += 1
+            h[-1] += seconds
+        trace = getattr(self._local, "trace", None)
+        if trace is not None:
+            trace.append((stage, seconds))
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    @contextlib.contextmanager
+    def _span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def span(self, stage):
+        """Context that times its body as one observation of stage"""
+        return self._span(stage) if ENABLED else _NOOP
+
+    def timed(self, stage=None):
+        """Decorator timing every call as a span (named after the function unless stage is given)"""
+        def wrap(fn):
+            if not ENABLED:
+                return fn
+            name = stage or fn.__name__
+
+            @functools.wraps(fn)
+            def timed_fn(*args, **kwargs):
+                with self._span(name):
+                    return fn(*args, **kwargs)
+            return timed_fn
+        return wrap
+
+    @contextlib.contextmanager
+    def trace(self):
+        """Collect the (stage, seconds) spans recorded on this thread while the block runs"""
+        spans = []
+        previous, self._local.trace = getattr(self._local, "trace", None), spans
+        try:
+            yield spans
+        finally:
+            self._local.trace = previous
+
+    ## exposition
+    def render(self):
+        """All metrics in Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            histograms = {stage: list(h) for stage, h in self._histograms.items()}
+            counters = dict(self._counters)
+        name = f"{self.prefix}_stage_seconds"
+        lines = [f"# HELP {name} Wall time of each rerun stage.", f"# TYPE {name} histogram"]
+        for stage, h in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), h[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {h[-1]:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {cumulative}')
+        for metric in sorted({n for n, _ in counters}):
+            full = f"{self.prefix}_{metric}_total"
+            lines += [f"# TYPE {full} counter"]
+            for (n, labels), value in sorted(counters.items()):
+                if n == metric:
+                    lines.append(f"{full}{{{_labels(labels)}}} {value}" if labels else f"{full} {value}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+span = METRICS.span
+timed = METRICS.timed
+
+
+def serve(metrics=METRICS, port=METRICS_PORT, host="127.0.0.1"):
+    """Serve GET /metrics from a daemon thread; returns the server (port 0 picks a free one)"""
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
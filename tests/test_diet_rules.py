@@ -0,0 +1,30 @@
+import pytest
+
+from diet_rules import DIET_RULES, RuleSet
+
+SNACK = [{"Meal": "Snack", "Calories": 200, "Protein_g": 8, "Carbs_g": 10, "Fat_g": 16,
+          "Items": [{"name": "peanut butter (2 tbsp)"}]}]
+
+
+@pytest.mark.parametrize("cond", [
+    {"food": "Peanut Butter", "meal": "Snack", "presnt": False},
+    {"food": "Peanut Butter", "meals": "Dinner"},
+    {"target": "TargetCalories", "lte": 1600},
+    {"share": "Fat_g", "gt": 0.4, "meal": "Snack"},
+])
+def test_unknown_condition_keys_are_rejected(cond):
+    with pytest.raises(ValueError, match="unknown condition keys"):
+        RuleSet([{"id": "typo", "when": [cond], "tip": "never"}])
+
+
+def test_food_matches_case_insensitively():
+    tips = RuleSet(DIET_RULES).suggestions([{"TargetCalories": 2000, "Protein_g": 150}], [SNACK])[0]
+    assert "Swap some peanut-butter snacks for Greek yogurt + berries." in tips
+
+
+def test_low_calorie_tip_needs_a_positive_target():
+    rules = RuleSet(DIET_RULES)
+    fired = rules.fired([{"TargetCalories": 0, "Protein_g": 150}, {"TargetCalories": 1500, "Protein_g": 150}],
+                        [None, None])
+    low = rules.ids.index("low_calories")
+    assert fired[:, low].tolist() == [False, True]
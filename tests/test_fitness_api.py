@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+import fitness_api
+from fitness_api import FitnessAPI, call
+
+TARGETS = {"TargetCalories": 2200, "Protein_g": 150, "Carbs_g": 220, "Fat_g": 70, "solver": "greedy"}
+PROFILE = {"sex": "Male", "weight_kg": 80, "height_cm": 180, "age": 30,
+           "activity_level": "Moderate (3-5 days/week)", "goal": "Maintain weight"}
+
+
+def post(path, body):
+    return asyncio.run(call(FitnessAPI(workers=0), "POST", path, body))
+
+
+@pytest.mark.parametrize("path, good, bad", [
+    ("/meal-plan", TARGETS, [{**TARGETS, "TargetCalories": None}, {**TARGETS, "Fat_g": [70]},
+                             {**TARGETS, "time_budget": None}, {**TARGETS, "meals": None},
+                             {**TARGETS, "TargetCalories": float("inf")}, {**TARGETS, "Protein_g": float("nan")},
+                             {**TARGETS, "Carbs_g": -10}, {**TARGETS, "TargetCalories": 1e9},
+                             {**TARGETS, "time_budget": -1}, {**TARGETS, "time_budget": float("inf")},
+                             {**PROFILE, "weight_kg": -5}]),
+    ("/targets", PROFILE, [{**PROFILE, "age": None}, {**PROFILE, "goal": ["Maintain weight"]},
+                           {**PROFILE, "activity_level": {"x": 1}}, {**PROFILE, "weight_kg": -5},
+                           {**PROFILE, "weight_kg": float("inf")}, {**PROFILE, "height_cm": float("nan")},
+                           {**PROFILE, "age": 1000}, {**PROFILE, "height_cm": "1e400"}]),
+    ("/workout-plan", {"level": "beginner", "goal": "Maintain weight"},
+     [{"level": ["x"], "goal": "Maintain weight"}, {"level": None, "goal": "Maintain weight"}]),
+])
+def test_bad_items_fail_alone_in_a_batch(path, good, bad):
+    status, results = post(path, [good, *bad, good])
+    assert status == 200
+    assert len(results) == len(bad) + 2
+    assert "error" not in results[0] and results[-1] == results[0]
+    for result in results[1:-1]:
+        assert set(result) == {"error"}
+
+
+def test_bad_single_item_is_a_client_error():
+    status, result = post("/meal-plan", {**TARGETS, "TargetCalories": None})
+    assert status == 400
+    assert "TargetCalories" in result["error"]
+
+
+def test_infinite_target_is_rejected_not_echoed():
+    status, result = post("/meal-plan", {**TARGETS, "TargetCalories": float("inf")})
+    assert status == 400
+    assert result == {"error": "TargetCalories must be between 200 and 8000"}
+
+
+def test_non_finite_results_are_not_sent_as_json(monkeypatch):
+    monkeypatch.setitem(fitness_api.ROUTES, "/targets", lambda payload: {"TargetCalories": float("inf")})
+    status, result = post("/targets", PROFILE)
+    assert status == 500
+    assert "unserializable" in result["error"]
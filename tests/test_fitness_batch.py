@@ -0,0 +1,59 @@
+import json
+
+import pandas as pd
+import pytest
+
+from fitness_batch import _save_checkpoint, read_profiles, run_batch
+from fitness_export import read_batch_plans
+
+PROFILES = [{"sex": sex, "weight_kg": 60 + 5 * i, "height_cm": 170, "age": 30,
+             "activity_level": "Moderate (3-5 days/week)", "goal": "Maintain weight", "user_id": f"u{i}"}
+            for i, sex in enumerate(["Male", "Female"] * 4)]
+
+
+def write_profiles(path):
+    """Profiles with blank lines scattered between them, as hand-edited files have"""
+    if path.suffix == ".jsonl":
+        lines = [json.dumps(p) for p in PROFILES]
+    else:
+        frame = pd.DataFrame(PROFILES)
+        lines = [",".join(frame.columns)] + [",".join(map(str, row)) for row in frame.itertuples(index=False)]
+    for at in (6, 3, 1):
+        lines.insert(at, "")
+    path.write_text("\n".join(lines) + "\n\n")
+    return path
+
+
+@pytest.mark.parametrize("suffix", [".jsonl", ".csv"])
+def test_skip_counts_profiles_not_lines(tmp_path, suffix):
+    source = write_profiles(tmp_path / f"profiles{suffix}")
+    for skip in range(len(PROFILES) + 1):
+        ids = [u for chunk in read_profiles(source, 3, skip) for u in chunk["user_id"]]
+        assert ids == [p["user_id"] for p in PROFILES[skip:]]
+
+
+@pytest.mark.parametrize("suffix", [".jsonl", ".csv"])
+def test_resume_continues_after_the_checkpointed_rows(tmp_path, suffix):
+    source = write_profiles(tmp_path / f"profiles{suffix}")
+    full, resumed = tmp_path / "full.jsonl", tmp_path / "resumed.jsonl"
+    run_batch(source, full, workers=1, chunksize=3, progress=None)
+    lines = full.read_text().splitlines(keepends=True)
+
+    # as if the job had stopped after its first chunk
+    resumed.write_text("".join(lines[:3]))
+    _save_checkpoint(f"{resumed}.ckpt", source, 3, len("".join(lines[:3]).encode()))
+    assert run_batch(source, resumed, workers=1, chunksize=3, progress=None) == len(PROFILES)
+    assert resumed.read_text() == full.read_text()
+
+
+def test_unknown_restriction_fails_its_row_only(tmp_path):
+    source, output = tmp_path / "profiles.csv", tmp_path / "plans.jsonl"
+    pd.DataFrame([{**p, "restrictions": diet} for p, diet in zip(PROFILES, ["Vegan", "Keto", None, "Vegan;Paleo"])]
+                 ).to_csv(source, index=False)
+    assert run_batch(source, output, workers=1, chunksize=3, progress=None, suggestions=True) == 4
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [r["user_id"] for r in records] == ["u0", "u1", "u2", "u3"]
+    assert ["error" in r for r in records] == [False, True, False, True]
+    assert "'Keto'" in records[1]["error"] and "'Paleo'" in records[3]["error"]
+    assert "meal_plan" in records[0] and "suggestions" in records[2]
+    assert [p["plan_id"] for p in read_batch_plans(output)] == ["u0", "u2"]
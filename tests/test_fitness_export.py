@@ -0,0 +1,24 @@
+import pandas as pd
+
+from fitness_batch import run_batch
+from fitness_export import read_batch_plans, write_export
+
+PROFILES = """sex,weight_kg,height_cm,age,activity_level,goal,user_id
+Male,80,180,30,Moderate (3-5 days/week),Maintain weight,alice
+Female,60,165,40,Light (1-3 days/week),Lose weight (cut 20%),
+Male,95,185,25,Active (6-7 days/week),Gain weight (bulk 15%),carol
+"""
+
+
+def test_batch_output_round_trips_through_export(tmp_path):
+    source, plans, cohort = tmp_path / "profiles.csv", tmp_path / "plans.jsonl", tmp_path / "cohort.csv"
+    source.write_text(PROFILES)
+    assert run_batch(source, plans, workers=1, progress=None) == 3
+
+    write_export(read_batch_plans(plans), cohort)
+    frame = pd.read_csv(cohort, comment="#", keep_default_na=False)
+
+    # a profile without a user_id is identified by its input row
+    assert list(dict.fromkeys(frame["plan_id"].astype(str))) == ["alice", "1", "carol"]
+    assert (frame["Target_TargetCalories"] > 0).all()
+    assert frame["Items"].str.len().gt(0).all()
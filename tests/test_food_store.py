@@ -0,0 +1,34 @@
+import json
+
+import numpy as np
+import pytest
+
+from food_store import _read_fdc_json
+
+FOODS = [{"fdcId": 100 + i, "description": f"Food {i}",
+          "foodNutrients": [{"nutrient": {"id": 1003}, "amount": 2.0 + i}, {"nutrientId": 1005, "value": 10.0},
+                            {"nutrient": {"id": 1004}, "amount": 1.5}]
+                           + ([{"nutrient": {"id": 1008}, "amount": 90.0 + i}] if i % 2 else []),
+          "foodPortions": [{"gramWeight": 30 + i, "amount": 1, "modifier": "cup"}] if i % 3 else []}
+         for i in range(10)]
+
+
+@pytest.mark.parametrize("chunksize", [1, 3, 10, 1000])
+def test_json_reader_gives_the_same_foods_for_any_chunksize(tmp_path, chunksize):
+    src = tmp_path / "foods.jsonl"
+    src.write_text("\n".join(json.dumps(f) for f in FOODS) + "\n")
+    ids, names, grams, servings, per100 = _read_fdc_json(src, chunksize)
+    assert ids.tolist() == [f["fdcId"] for f in FOODS]
+    assert names == [f["description"] for f in FOODS]
+    assert servings == [("1 cup" if i % 3 else None) for i in range(10)]
+    np.testing.assert_array_equal(grams, [30 + i if i % 3 else np.nan for i in range(10)])
+    assert per100.shape == (10, 4)
+    # energy as reported, or 4/4/9 kcal per gram of protein, carbs and fat
+    np.testing.assert_allclose(per100[:, 0], [90 + i if i % 2 else 4 * (2 + i) + 40 + 13.5 for i in range(10)])
+
+
+def test_json_reader_handles_an_empty_file(tmp_path):
+    src = tmp_path / "foods.jsonl"
+    src.write_text("")
+    ids, names, grams, servings, per100 = _read_fdc_json(src, 3)
+    assert len(ids) == len(grams) == len(names) == 0 and per100.shape == (0, 4)
@@ -0,0 +1,25 @@
+from plan_cache import PlanCache
+
+
+def test_value_computed_across_a_bind_is_not_cached():
+    cache = PlanCache()
+    cache.bind("old table")
+
+    def compute():
+        cache.bind("new table")         # the food table changes while the plan is being computed
+        return "plan from the old table"
+
+    assert cache.get_or_compute("key", compute) == "plan from the old table"
+    assert cache.get("key") is None
+    assert cache.get_or_compute("key", lambda: "plan from the new table") == "plan from the new table"
+    assert cache.get("key") == "plan from the new table"
+
+
+def test_put_checks_the_generation():
+    cache = PlanCache()
+    generation = cache.generation
+    cache.clear()
+    assert not cache.put("key", 1, generation)
+    assert cache.put("key", 2, cache.generation)
+    assert cache.put("other", 3)
+    assert cache.get("key") == 2 and cache.get("other") == 3
@@ -0,0 +1,35 @@
+from fitness_core import ai_diet_suggestions, generate_meal_plan
+from plan_graph import DependencyGraph, nutrition_graph
+
+INPUTS = {"sex": "Male", "weight_kg": 80.0, "height_cm": 180.0, "age": 30,
+          "activity_level": "Moderate (3-5 days/week)", "goal": "Maintain weight",
+          "meals": ("Breakfast", "Lunch", "Dinner", "Snack"), "restrictions": ()}
+
+
+def greedy(targets, meals, restrictions):
+    return generate_meal_plan(targets["TargetCalories"], targets["Protein_g"], targets["Carbs_g"], targets["Fat_g"],
+                              meals=meals, restrictions=restrictions)
+
+
+def test_override_recomputes_dependents_and_keeps_the_stage_memo():
+    graph = (DependencyGraph()
+             .add("double", lambda x: 2 * x, "x")
+             .add("plus_one", lambda d: d + 1, "double"))
+    assert graph.compute({"x": 1}) == {"double": 2, "plus_one": 3}
+    assert graph.compute({"x": 1}, "plus_one", overrides={"double": 10}) == {"plus_one": 11}
+    graph.compute({"x": 1}, "plus_one", overrides={"double": 10})
+    assert graph.stats()["plus_one"] == {"computed": 2, "reused": 1}
+    # without the override the computed value comes back, from the memo
+    assert graph.compute({"x": 1}) == {"double": 2, "plus_one": 3}
+    assert graph.stats()["double"]["computed"] == 1
+
+
+def test_suggestions_follow_a_swapped_meal_plan():
+    graph = nutrition_graph(meal_planner=greedy)
+    values = graph.compute(INPUTS, "targets", "meal_plan")
+    plan = values["meal_plan"]
+    ids, servings = plan.meal(0)
+    swapped = plan.swap(0, 0, int(ids[-1]) if len(ids) > 1 else int(ids[0]) + 1, 3)
+    suggestions = graph.compute(INPUTS, "suggestions", overrides={"meal_plan": swapped})["suggestions"]
+    assert suggestions == ai_diet_suggestions(values["targets"], swapped)
+    assert graph.compute(INPUTS, "meal_plan")["meal_plan"] is plan
@@ -0,0 +1,56 @@
+import sqlite3
+
+import pytest
+
+import plan_history
+from plan_history import PlanHistory
+
+PROFILE = {"sex": "Male", "weight_kg": 80, "height_cm": 180, "age": 30,
+           "activity_level": "Moderate (3-5 days/week)", "goal": "Maintain weight"}
+TARGETS = {"TargetCalories": 2200, "Protein_g": 150, "Carbs_g": 220, "Fat_g": 70}
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    monkeypatch.setattr(plan_history, "RETRY_DELAYS", (0.01, 0.01))
+    store = PlanHistory(tmp_path / "history.db")
+    yield store
+    store._stop()
+
+
+def fail_inserts(store, monkeypatch, times):
+    insert, calls = store._insert, []
+
+    def flaky(conn, rows):
+        calls.append(len(rows))
+        if len(calls) <= times:
+            raise sqlite3.OperationalError("database is locked")
+        insert(conn, rows)
+    monkeypatch.setattr(store, "_insert", flaky)
+    return calls
+
+
+def test_a_locked_database_is_retried(history, monkeypatch):
+    fail_inserts(history, monkeypatch, times=2)
+    history.save("ann", PROFILE, TARGETS)
+    history.flush()
+    assert len(history.history("ann")) == 1 and history.failed == 0
+
+
+def test_a_dropped_batch_does_not_break_later_saves(history, monkeypatch):
+    fail_inserts(history, monkeypatch, times=3)
+    history.save("ann", PROFILE, TARGETS)
+    with pytest.raises(RuntimeError, match="dropped"):
+        history.flush()
+    assert history.failed == 1
+
+    history.save("ann", PROFILE, TARGETS)       # used to raise for good after one failed batch
+    history.flush()
+    assert len(history.history("ann")) == 1
+
+
+def test_close_reports_a_dropped_save(history, monkeypatch):
+    fail_inserts(history, monkeypatch, times=3)
+    history.save("ann", PROFILE, TARGETS)
+    with pytest.raises(RuntimeError):
+        history.close()
@@ -0,0 +1,14 @@
+from theme_assets import FONT_DIR, font_faces, render, stylesheet
+
+
+def test_prebuilt_stylesheet_is_up_to_date():
+    # the app only reads static/theme.<hash>.css; rebuild with `python theme_assets.py` after editing the theme
+    assert stylesheet() == render()[0]
+
+
+def test_inter_is_bundled():
+    faces = font_faces()
+    assert {f.name for f in FONT_DIR.glob("Inter*.woff2")} >= {"Inter-Regular.woff2", "Inter-SemiBold.woff2",
+                                                               "Inter-Bold.woff2"}
+    assert len(faces) >= 3 and all("unicode-range" in face for face in faces)
+    assert (FONT_DIR / "LICENSE.txt").exists()
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from fitness_core import calculate_tdee_and_targets
+from weekly_plan import RELAX, WeeklyPlan
+
+GOALS = ["Lose weight (cut 20%)", "Maintain weight", "Gain weight (bulk 15%)"]
+
+
+def targets(goal):
+    return calculate_tdee_and_targets("Male", 80, 180, 30, "Moderate (3-5 days/week)", goal)
+
+
+@pytest.mark.parametrize("goal", GOALS)
+@pytest.mark.parametrize("restrictions", [(), ("Vegetarian",)])
+def test_days_meet_targets_within_tolerance(goal, restrictions):
+    week = WeeklyPlan(targets(goal), restrictions=restrictions)
+    totals = week.daily_totals()[["Calories", "Protein_g", "Carbs_g", "Fat_g"]].to_numpy()
+    assert np.all(np.abs(totals - week.daily) <= week.tolerance * week.daily + 1)
+    assert week.misses().empty
+
+
+@pytest.mark.parametrize("goal", GOALS)
+@pytest.mark.parametrize("restrictions", [(), ("Vegetarian",), ("Vegan",)])
+def test_quota_is_only_exceeded_by_meals_planned_past_it(goal, restrictions):
+    week = WeeklyPlan(targets(goal), restrictions=restrictions)
+    days = week.food_days()
+    # the quota grows by the slack of the most relaxed meal that uses a food, never silently
+    for (w, food), n in days[days > week.max_food_days].items():
+        ids = np.flatnonzero(week.foods.name == food)
+        slack = [RELAX[week.relaxed.get((d, m), 0)][2] for d in range(7 * (w - 1), 7 * w) for k, m in
+                 enumerate(week.meals) if np.isin(week.days[d].meal(k)[0], ids).any()]
+        assert None in slack or n <= week.max_food_days + max(s for s in slack if s is not None)
+    assert set(week.overused().index) == set(days[days > week.max_food_days].index)
+
+
+@pytest.mark.parametrize("daily", [targets(goal) for goal in GOALS]
+                         + [{"TargetCalories": 2200, "Protein_g": 150, "Carbs_g": 220, "Fat_g": 70}])
+def test_no_food_goes_over_the_quota_without_restrictions(daily):
+    # 15 foods x 4 days is enough for 7 days, so the built-in table never needs the quota relaxed
+    week = WeeklyPlan(daily)
+    assert week.overused().empty
+    assert week.misses().empty
+
+
+def test_regenerating_a_day_replans_only_what_it_breaks():
+    week = WeeklyPlan({"TargetCalories": 2200, "Protein_g": 150, "Carbs_g": 220, "Fat_g": 70})
+    before = [week.day_plan(d) for d in range(len(week))]
+    week.lock(0)
+    week.recomputed = {"days": 0, "meals": 0}
+    week.regenerate(3)
+    changed = [d for d in range(len(week)) if week.day_plan(d) is not before[d]]
+    # day 3 itself, plus only days that share a food it put over the quota or its neighbours
+    assert 3 in changed and 0 not in changed
+    assert week.recomputed["days"] == len(changed) <= 3
+    assert week.overused().empty
+
+
+def test_unmeetable_targets_are_reported():
+    # about 30% of calories from protein is out of reach with the vegan foods of the built-in table
+    week = WeeklyPlan(targets("Lose weight (cut 20%)"), restrictions=("Vegan",))
+    misses = week.misses()
+    assert not misses.empty
+    assert misses["Protein_g"].max() > week.tolerance
@@ -0,0 +1,118 @@
+"""Build step for the app theme: minified stylesheet and self-hosted Inter fonts.
+
+    python theme_assets.py [--fonts DIR]        # --fonts needs `pip install fonttools brotli`
+
+Minifies assets/theme.css into static/theme.<hash>.css, which Streamlit serves from
+/app/static/. Run it after changing the theme and commit the result: the app only reads the
+prebuilt file and never writes to the source tree. Inter (OFL) is served from static/fonts/, which
+holds a Latin subset of the regular, medium, semibold and bold weights; --fonts replaces them
+with the .woff2 files of another Inter release (its web/ folder), subset the same way. Nothing is
+ever fetched from the network. The stylesheet name carries a hash of its content, so browsers
+can keep it cached and still pick up changes.
+"""
+import argparse
+import hashlib
+import re
+import shutil
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+SOURCE = ROOT / "assets" / "theme.css"
+STATIC_DIR = ROOT / "static"            # Streamlit serves this folder next to the main script
+FONT_DIR = STATIC_DIR / "fonts"
+# Basic Latin, Latin-1 and common punctuation, as in Google Fonts' "latin" subset
+LATIN = ("U+0000-00FF,U+0131,U+0152-0153,U+02BB-02BC,U+02C6,U+02DA,U+02DC,U+2000-206F,U+2074,U+20AC,U+2122,"
+         "U+2191,U+2193,U+2212,U+2215,U+FEFF,U+FFFD")
+WEIGHTS = {"thin": 100, "extralight": 200, "light": 300, "regular": 400, "medium": 500, "semibold": 600,
+           "bold": 700, "extrabold": 800, "black": 900}
+
+
+def minify_css(css):
+    """Strip comments and the whitespace the browser ignores"""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+
+def _font_face(path):
+    """@font-face rule for an Inter .woff2 file, e.g. Inter-SemiBold.woff2 or InterVariable-Italic.woff2"""
+    stem = path.stem.lower()
+    italic = stem.endswith("italic")
+    if stem.startswith("intervariable"):
+        weight = "100 900"
+    else:
+        style = stem.split("-", 1)[-1][:-len("italic") if italic else None] or "regular"
+        weight = WEIGHTS.get(style, 400)
+    return (f"@font-face{{font-family:'Inter';font-style:{'italic' if italic else 'normal'};font-weight:{weight};"
+            f"font-display:swap;src:url('fonts/{path.name}') format('woff2');unicode-range:{LATIN}}}")
+
+
+def font_faces(font_dir=FONT_DIR):
+    """Rules for the bundled Inter files; the variable font, when present, covers every weight on its own"""
+    files = sorted(Path(font_dir).glob("Inter*.woff2"))
+    variable = [f for f in files if f.stem.lower().startswith("intervariable")]
+    return [_font_face(f) for f in (variable or files)]
+
+
+def bundle_fonts(source_dir, font_dir=FONT_DIR):
+    """Subset Inter .woff2 files (searched recursively) to LATIN into the static font folder; returns how many"""
+    try:
+        from fontTools import subset
+    except ImportError:
+        raise SystemExit("bundling fonts requires `pip install fonttools brotli`") from None
+    files = sorted(Path(source_dir).rglob("Inter*.woff2"))
+    Path(font_dir).mkdir(parents=True, exist_ok=True)
+    for stale in Path(font_dir).glob("Inter*.woff2"):
+        stale.unlink()
+    options = subset.Options(flavor="woff2", layout_features=["*"])
+    for f in files:
+        font = subset.load_font(f, options)
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(unicodes=subset.parse_unicodes(LATIN))
+        subsetter.subset(font)
+        subset.save_font(font, Path(font_dir) / f.name, options)
+    # the OFL requires the license to travel with the fonts
+    for license_file in sorted(Path(source_dir).rglob("LICENSE*"))[:1]:
+        shutil.copyfile(license_file, Path(font_dir) / "LICENSE.txt")
+    return len(files)
+
+
+def render(source=SOURCE, static_dir=STATIC_DIR):
+    """(file name, text) of the stylesheet built from source and the fonts in static_dir"""
+    css = "".join(font_faces(Path(static_dir) / "fonts")) + minify_css(Path(source).read_text())
+    return f"theme.{hashlib.blake2b(css.encode(), digest_size=6).hexdigest()}.css", css
+
+
+def stylesheet(static_dir=STATIC_DIR):
+    """File name of the prebuilt stylesheet, or None when it has not been built"""
+    built = sorted(Path(static_dir).glob("theme.*.css"))
+    return built[-1].name if built else None
+
+
+def build(source=SOURCE, static_dir=STATIC_DIR):
+    """Write the minified stylesheet unless an identical one exists; returns its file name"""
+    name, css = render(source, static_dir)
+    out = Path(static_dir) / name
+    if not out.exists():
+        out.parent.mkdir(parents=True, exist_ok=True)
+        for stale in out.parent.glob("theme.*.css"):
+            stale.unlink()
+        out.write_text(css)
+    return name
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fonts", help="directory holding Inter .woff2 files to bundle")
+    args = parser.parse_args()
+    if args.fonts:
+        print(f"bundled {bundle_fonts(args.fonts)} font files into {FONT_DIR}")
+    name = build()
+    print(f"{STATIC_DIR / name}: {(STATIC_DIR / name).stat().st_size:,} bytes "
+          f"(source {SOURCE.stat().st_size:,}), {len(font_faces())} font faces")
+
+
+if __name__ == "__main__":
+    main()
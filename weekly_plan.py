@@ -0,0 +1,288 @@
+"""Multi-day meal planning with variety rules and incremental recompute.
+
+A WeeklyPlan holds 7 days (or 4-week cycles of 28) planned against the same daily targets. Two
+variety rules apply:
+- a food appears on at most max_food_days days of a calendar week
+- a meal never repeats a food from the same meal on the day before or after
+
+Dietary restrictions (food_tags.RESTRICTIONS) hold for every meal and are never relaxed.
+Each day is planned against the quota the days already planned leave over. It uses no more
+distinct foods than its share of the food-days still left in the week, and no food beyond its share
+of the quota for the days planned so far. Within that share it picks from menus drawn by how much
+quota each food has left, so the first days cannot use up the foods the last ones need.
+
+Targets come first. When the rules leave too few foods to meet a day's targets within tolerance,
+they are relaxed for that day's unlocked meals in a fixed order (RELAX). The neighbour rule goes
+first, then the day's share, then the weekly quota itself. The first level that meets the targets
+is kept, or else the one that comes closest. misses() and overused() report what could not be met,
+for the UI to show.
+
+Editing, locking or regenerating a meal only replans the rest of that day. After that, only the
+neighbouring days and the days sharing a food the change put over its quota are checked. Of those,
+only the ones whose variety rules broke are replanned, so edits stay interactive.
+"""
+import numpy as np
+import pandas as pd
+
+from fitness_core import FOOD_STORE_PATH, MEAL_SPLITS, load_food_index, plan_meal
+from food_tags import allowed_foods
+from meal_plan import MACRO_COLS, MealPlan
+
+DEFAULT_MEALS = ("Breakfast", "Lunch", "Dinner", "Snack")
+# (neighbour rule on, day held to its share of the week's food-days, extra days allowed over max_food_days or
+# None for no quota) per relaxation level, in the order they are tried; dietary restrictions always apply
+RELAX = ((True, True, 0), (False, True, 0), (False, False, 0), (False, False, 1), (False, False, 2),
+         (False, False, None))
+MENU_TRIES = 3          # menus sampled per level when a day's own choice uses more than its share of foods
+
+
+def _miss(totals, target):
+    """Largest relative miss of [calories, protein, carbs, fat] totals against target"""
+    return float(np.max(np.abs(totals - target) / np.maximum(target, 1.0)))
+
+
+class WeeklyPlan:
+    """Days of meal plans sharing one set of daily targets; recomputed counts replans by days and meals"""
+
+    def __init__(self, targets, meals=DEFAULT_MEALS, weeks=1, max_food_days=4, time_budget=0.1, tolerance=0.1,
+                 seed=0, foods=None, restrictions=()):
+        self.foods = load_food_index(FOOD_STORE_PATH) if foods is None else foods
+        self.targets = dict(targets)
+        self.restrictions = tuple(restrictions)
+        allowed = allowed_foods(self.foods.tags, self.restrictions)
+        self.allowed = np.ones(len(self.foods), dtype=bool) if allowed is None else allowed
+        self.allowed_count = int(self.allowed.sum())
+        self.daily = np.array([targets["TargetCalories"], targets["Protein_g"], targets["Carbs_g"], targets["Fat_g"]],
+                              dtype=np.float64)
+        self.meals = [m for m in meals if m]
+        self.max_food_days = max_food_days
+        self.tolerance = tolerance
+        self.time_budget = time_budget
+        self.seed = seed
+        n = 7 * weeks
+        self.days = [None] * n                          # day -> MealPlan, meals in self.meals order
+        self.locked = set()                             # (day, meal)
+        self.relaxed = {}                               # (day, meal) -> index into RELAX, when above 0
+        self.generation = [0] * n                       # bumped per replan so regenerating gives a new day
+        self.recomputed = {"days": 0, "meals": 0}
+        for day in range(n):
+            self._plan_day(day)
+
+    def __len__(self):
+        return len(self.days)
+
+    ## storage: one packed MealPlan per day
+    def _meals(self, day):
+        """meal -> (food ids, servings) for day; empty before the day is planned"""
+        plan = self.days[day]
+        return {} if plan is None else {m: plan.meal(k) for k, m in enumerate(plan.meals)}
+
+    def _meal_ids(self, day, meal):
+        meals = self._meals(day)
+        return meals[meal][0] if meal in meals else ()
+
+    def _pack(self, meals):
+        return MealPlan.from_meals(self.foods, self.meals, [meals[m][0] for m in self.meals],
+                                   [meals[m][1] for m in self.meals])
+
+    ## constraints
+    def _week(self, day):
+        start = day - day % 7
+        return range(start, min(start + 7, len(self)))
+
+    def _days_using(self, day):
+        """Food id -> number of other days in day's week that use it"""
+        counts = {}
+        for d in self._week(day):
+            if d != day and self.days[d] is not None:
+                for f in set(self.days[d].food_ids.tolist()):
+                    counts[f] = counts.get(f, 0) + 1
+        return counts
+
+    def _exclude(self, day, meal, counts, level):
+        """Food ids a meal may not use at a RELAX level"""
+        neighbour, capped, slack = RELAX[level]
+        limit = self._paced_limit(day) if capped else self.max_food_days + (slack or 0)
+        banned = set() if slack is None else {f for f, c in counts.items() if c >= limit}
+        if neighbour:
+            for d in (day - 1, day + 1):
+                if 0 <= d < len(self):
+                    banned.update(int(f) for f in self._meal_ids(d, meal))
+        return np.fromiter(banned, dtype=np.int64, count=len(banned))
+
+    def _paced_limit(self, day):
+        """Days a food may already have in day's week: its share of the quota for the days planned so far"""
+        week = self._week(day)
+        planned = sum(1 for d in week if d != day and self.days[d] is not None)
+        return -(-self.max_food_days * (planned + 1) // len(week))
+
+    def _distinct_cap(self, day, counts):
+        """Distinct foods day may use so that the week's unplanned days still get an equal share of the quota"""
+        unplanned = sum(1 for d in self._week(day) if d == day or self.days[d] is None)
+        left = self.allowed_count * self.max_food_days - sum(min(c, self.max_food_days) for c in counts.values())
+        return max(left // unplanned, 1)
+
+    def _violations(self, day):
+        """Whether day breaks a variety rule that its meals were planned under"""
+        counts = self._days_using(day)
+        for meal, (ids, _) in self._meals(day).items():
+            if (day, meal) in self.locked:
+                continue
+            neighbour, _, slack = RELAX[self.relaxed.get((day, meal), 0)]
+            if slack is not None and any(counts.get(f, 0) >= self.max_food_days + slack for f in ids):
+                return True
+            if neighbour and any(np.intersect1d(ids, self._meal_ids(d, meal)).size
+                                 for d in (day - 1, day + 1) if 0 <= d < len(self)):
+                return True
+        return False
+
+    ## planning
+    def _plan_day(self, day):
+        """Replan every unlocked meal of day so that, with the locked ones, it meets the daily targets"""
+        locked = [m for m in self.meals if (day, m) in self.locked]
+        free = [m for m in self.meals if (day, m) not in self.locked]
+        if not free:
+            return
+        planned = self._meals(day)
+        kept = {m: planned[m] for m in locked}
+        have = sum((self._nutrients(*kept[m]) for m in locked), np.zeros(4))
+        rng = np.random.default_rng([self.seed, day, self.generation[day]])
+        counts = self._days_using(day)
+        cap = self._distinct_cap(day, counts)
+        best = None
+        for level, (_, capped, _) in enumerate(RELAX):
+            exclude = {meal: self._exclude(day, meal, counts, level) for meal in free}
+            for _ in range(MENU_TRIES if capped else 1):
+                # a capped day plans from a menu of its share of the week's food-days, drawn by how much of its
+                # quota each food has left, so no food is favoured day after day
+                menu = self._menu(counts, kept, cap, rng) if capped else None
+                if menu is not None:
+                    off = np.setdiff1d(np.arange(len(self.foods)), menu)
+                    meals = self._plan_meals(free, kept, have, {m: np.union1d(e, off) for m, e in exclude.items()},
+                                             rng)
+                else:
+                    meals = self._plan_meals(free, kept, have, exclude, rng)
+                error = self._day_miss(have, meals, free)
+                if best is None or error < best[0]:
+                    best = (error, level, meals)
+                if menu is None or error <= self.tolerance:
+                    break
+            if best[0] <= self.tolerance:
+                break
+        _, level, meals = best
+        for meal in free:
+            if level:
+                self.relaxed[(day, meal)] = level
+            else:
+                self.relaxed.pop((day, meal), None)
+        self.days[day] = self._pack(meals)
+        self.generation[day] += 1
+        self.recomputed["days"] += 1
+        self.recomputed["meals"] += len(free)
+
+    def _plan_meals(self, free, kept, have, exclude, rng):
+        """meal -> (food ids, servings) for the free meals around the kept ones, each avoiding its exclude ids"""
+        meals, remaining = dict(kept), np.maximum(self.daily - have, 0.0)
+        splits = np.array([MEAL_SPLITS.get(m, 0.15) for m in free])
+        for k, meal in enumerate(free):
+            # each meal gets its share of what is still missing, so later meals make up for earlier misses
+            target = remaining * splits[k] / splits[k:].sum()
+            meals[meal] = plan_meal(target, self.foods, exclude[meal], time_budget=self.time_budget / len(free),
+                                    seed=rng, restrictions=self.restrictions)
+            remaining = np.maximum(remaining - self._nutrients(*meals[meal]), 0.0)
+        return meals
+
+    def _day_miss(self, have, meals, free):
+        return _miss(have + sum((self._nutrients(*meals[m]) for m in free), np.zeros(4)), self.daily)
+
+    @staticmethod
+    def _day_foods(meals):
+        return np.unique(np.concatenate([[], *(ids for ids, _ in meals.values())]).astype(np.int64))
+
+    def _menu(self, counts, kept, cap, rng):
+        """Kept foods plus allowed foods drawn by days of quota left, cap in all; None when that is every food"""
+        left = np.where(self.allowed, float(self.max_food_days), 0.0)
+        used = np.fromiter(counts, dtype=np.int64, count=len(counts))
+        left[used] = np.maximum(left[used] - np.fromiter(counts.values(), dtype=np.float64, count=len(counts)), 0)
+        menu = self._day_foods(kept)
+        left[menu] = 0.0
+        pool = np.flatnonzero(left)
+        size = max(cap - len(menu), 1)
+        if size >= len(pool):
+            return None
+        return np.union1d(menu, rng.choice(pool, size, replace=False, p=left[pool] / left[pool].sum()))
+
+    def _repair(self, changed):
+        """Replan the unlocked days whose variety rules were broken by the days in changed"""
+        todo = set()
+        for c in changed:
+            # only a neighbour (same-meal rule) or a day sharing a food c put over its quota can be broken
+            counts = self._days_using(c)
+            over = [f for f in set(self.days[c].food_ids.tolist()) if counts.get(f, 0) >= self.max_food_days]
+            todo.update(d for d in (c - 1, c + 1) if 0 <= d < len(self))
+            todo.update(d for d in self._week(c) if over and np.isin(self.days[d].food_ids, over).any())
+        for day in sorted(todo - set(changed)):
+            if self._violations(day):
+                self._plan_day(day)
+
+    def _nutrients(self, ids, servings):
+        return self.foods.nutrients[ids].T @ servings if len(ids) else np.zeros(4)
+
+    ## edits
+    def lock(self, day, meal=None):
+        """Keep a meal (or every meal of a day) as it is through later replans"""
+        self.locked.update((day, m) for m in ([meal] if meal else self.meals))
+
+    def unlock(self, day, meal=None):
+        self.locked.difference_update((day, m) for m in ([meal] if meal else self.meals))
+
+    def regenerate(self, day):
+        """New choices for the unlocked meals of day; other days change only if variety now requires it"""
+        self._plan_day(day)
+        self._repair([day])
+
+    def set_meal(self, day, meal, servings):
+        """Replace a meal with {food id: servings} and lock it; the rest of the day rebalances around it"""
+        ids = sorted(servings)
+        self.days[day] = self._pack({**self._meals(day), meal: (ids, [servings[i] for i in ids])})
+        self.locked.add((day, meal))
+        self._plan_day(day)
+        self._repair([day])
+
+    ## views
+    def day_plan(self, day):
+        """MealPlan for one day, as generate_meal_plan returns"""
+        return self.days[day]
+
+    def to_frame(self):
+        """Every meal of the plan, with a Day column (1-based)"""
+        return pd.concat([self.day_plan(day).to_frame().assign(Day=day + 1) for day in range(len(self))],
+                         ignore_index=True)[["Day", "Meal", "Items", *MACRO_COLS]]
+
+    def daily_totals(self):
+        """Per-day calories and macros next to the targets"""
+        totals = pd.DataFrame([self.day_plan(day).totals().sum(axis=0) for day in range(len(self))],
+                              columns=MACRO_COLS, index=pd.RangeIndex(1, len(self) + 1, name="Day"))
+        totals["Calories"] = totals["Calories"].astype(np.int64)
+        for col, target in zip(MACRO_COLS, self.daily):
+            totals[f"{col}_target"] = target
+        return totals
+
+    def misses(self):
+        """Days whose totals miss a daily target by more than tolerance, with the relative miss per macro"""
+        totals = self.daily_totals()
+        error = (totals[MACRO_COLS] - self.daily).abs() / np.maximum(self.daily, 1.0)
+        return error[(error > self.tolerance).any(axis=1)]
+
+    def overused(self):
+        """(Week, Food) -> days, for foods on more than max_food_days days of a week"""
+        days = self.food_days()
+        return days[days > self.max_food_days]
+
+    def food_days(self):
+        """Food name -> number of days it appears on, per week"""
+        out = []
+        for day in range(len(self)):
+            for f in set(self.days[day].food_ids.tolist()):
+                out.append({"Week": day // 7 + 1, "Food": self.foods.name[f]})
+        return pd.DataFrame(out).groupby(["Week", "Food"]).size().rename("Days")
@@ -0,0 +1,132 @@
+"""Weight trend and adaptive TDEE estimation from logged weights and intake.
+
+Daily scale weights are noisy, so the trend is an exponentially weighted average of them
+(10% per day, as in The Hacker's Diet). Between two weigh-ins the change in trend, at about
+7700 kcal per kg, is the energy surplus or deficit. Intake minus that surplus is the expenditure
+the log implies. The TDEE estimate is a slower exponentially weighted average of those implied
+values. It starts at the formula TDEE (Mifflin-St Jeor times the activity factor) and moves toward
+what the log shows.
+
+Days without a weigh-in decay both averages as if the days were there. update() therefore costs
+the same whatever the length of the history, and estimate() gives the same numbers for a whole
+log at once.
+"""
+import datetime
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+KCAL_PER_KG = 7700.0
+TREND_ALPHA = 0.1       # per-day weight of a new weigh-in in the trend
+TDEE_ALPHA = 0.05       # per-day weight of a new implied expenditure in the estimate
+
+
+class TrendState(NamedTuple):
+    """Everything the next update needs: the day (ordinal) of the last weigh-in, its trend and TDEE"""
+    day: int
+    trend_kg: float
+    tdee_kcal: float
+
+
+def day_number(when=None):
+    """Ordinal day of a date, datetime or timestamp (today by default)"""
+    if when is None:
+        return datetime.date.today().toordinal()
+    if isinstance(when, (int, float)):
+        when = datetime.datetime.fromtimestamp(when)
+    return when.toordinal()
+
+
+def _blend(old, new, alpha, gap):
+    # an adjust=False, ignore_na=False EWM step across gap days, as pandas computes it
+    keep = (1.0 - alpha) ** gap
+    return (keep * old + alpha * new) / (keep + alpha)
+
+
+def start(day, weight_kg, prior_tdee):
+    """State after the first weigh-in: the trend is the weight and TDEE is the formula value"""
+    return TrendState(int(day), float(weight_kg), float(prior_tdee))
+
+
+def update(state, day, weight_kg, intake_kcal, trend_alpha=TREND_ALPHA, tdee_alpha=TDEE_ALPHA):
+    """State after one more weigh-in, from the previous state alone.
+
+    intake_kcal is the average daily intake since the previous weigh-in.
+    """
+    gap = int(day) - state.day
+    if gap <= 0:
+        raise ValueError("weigh-ins must be on a later day than the state they update")
+    trend = _blend(state.trend_kg, float(weight_kg), trend_alpha, gap)
+    implied = float(intake_kcal) - KCAL_PER_KG * (trend - state.trend_kg) / gap
+    return TrendState(int(day), trend, _blend(state.tdee_kcal, implied, tdee_alpha, gap))
+
+
+def _ewm(days, values, alpha):
+    """EWM of values observed on sorted ordinal days, with the days in between counted as gaps"""
+    grid = np.full(days[-1] - days[0] + 1, np.nan)
+    grid[days - days[0]] = values
+    return pd.Series(grid).ewm(alpha=alpha, adjust=False, ignore_na=False).mean().to_numpy()[days - days[0]]
+
+
+def estimate(days, weights, intakes, prior_tdee=None, seed=None, trend_alpha=TREND_ALPHA, tdee_alpha=TDEE_ALPHA):
+    """Trend, implied expenditure and TDEE after every weigh-in of a log, in one vectorized pass.
+
+    days are ordinal days, one weigh-in per day. Start from prior_tdee at the first weigh-in, or
+    continue from seed, the TrendState of the weigh-in before days[0]. The result matches calling
+    update() once per weigh-in.
+    """
+    days = np.asarray(days, dtype=np.int64)
+    weights = np.asarray(weights, dtype=np.float64)
+    intakes = np.asarray(intakes, dtype=np.float64)
+    if not len(days):
+        return pd.DataFrame(columns=["day", "weight_kg", "intake_kcal", "trend_kg", "implied_kcal", "tdee_kcal"])
+    if np.any(np.diff(days) <= 0):
+        raise ValueError("days must be strictly increasing")
+    if seed is None:
+        if prior_tdee is None:
+            raise ValueError("either prior_tdee or seed is needed")
+        # the first weigh-in only anchors the trend; it implies nothing about expenditure yet
+        seed_day, seed_trend, seed_tdee = days[0], weights[0], float(prior_tdee)
+        obs_days, obs_weights, obs_intakes = days[1:], weights[1:], intakes[1:]
+    else:
+        seed_day, seed_trend, seed_tdee = seed
+        obs_days, obs_weights, obs_intakes = days, weights, intakes
+    all_days = np.r_[seed_day, obs_days]
+    trend = _ewm(all_days, np.r_[seed_trend, obs_weights], trend_alpha)
+    implied = obs_intakes - KCAL_PER_KG * np.diff(trend) / np.diff(all_days)
+    tdee = _ewm(all_days, np.r_[seed_tdee, implied], tdee_alpha)
+    if seed is None:
+        implied = np.r_[np.nan, implied]
+    else:
+        trend, tdee = trend[1:], tdee[1:]
+    return pd.DataFrame({"day": days, "weight_kg": weights, "intake_kcal": intakes, "trend_kg": trend,
+                         "implied_kcal": implied, "tdee_kcal": tdee})
+
+
+def trend_frame(log):
+    """Daily chart frame from a weight log with day, weight_kg, trend_kg and tdee_kcal columns.
+
+    Indexed by date, with the raw weight, its 7-day rolling mean, the trend, its change per week
+    and the TDEE estimate. Days without a weigh-in carry the last trend and estimate forward.
+    """
+    if not len(log):
+        return pd.DataFrame(columns=["weight_kg", "avg_7d_kg", "trend_kg", "kg_per_week", "tdee_kcal"])
+    offset = np.asarray(log["day"], dtype=np.int64) - int(log["day"].iloc[0])
+    grid = np.full((offset[-1] + 1, 3), np.nan)
+    grid[offset] = log[["weight_kg", "trend_kg", "tdee_kcal"]].to_numpy(dtype=np.float64)
+    index = pd.date_range(datetime.date.fromordinal(int(log["day"].iloc[0])), periods=len(grid), freq="D", name="date")
+    daily = pd.DataFrame(grid, index=index, columns=["weight_kg", "trend_kg", "tdee_kcal"])
+    daily["avg_7d_kg"] = daily["weight_kg"].rolling("7D", min_periods=1).mean()
+    daily[["trend_kg", "tdee_kcal"]] = daily[["trend_kg", "tdee_kcal"]].ffill()
+    daily["kg_per_week"] = daily["trend_kg"].diff(7)
+    return daily[["weight_kg", "avg_7d_kg", "trend_kg", "kg_per_week", "tdee_kcal"]]
+
+
+def downsample(frame, max_points=400):
+    """frame with at most about max_points rows for charting, each the mean of an equal time bucket"""
+    if len(frame) <= max_points:
+        return frame
+    span = (frame.index[-1] - frame.index[0]) / max_points
+    bucket = max(pd.Timedelta(days=1), pd.Timedelta(span).ceil("D"))
+    return frame.resample(bucket, origin="start").mean().dropna(how="all")
@@ -0,0 +1,224 @@
+"""Periodized multi-week programs built from the weekly workout templates.
+
+Template entries are parsed into exercise records ("Bench Press 4x6-8" -> 4 sets of 6-8 reps,
+"Plank 30s" -> a 30 s hold, "20-30 min intervals" -> 20-30 minutes). A program is made of
+8-16 week blocks; a year is split into equal blocks (52 weeks -> 4 x 13). Within a block:
+- intensity (a fraction of training max) rises linearly from the goal's start to its peak
+- rep ranges move from their top to their bottom end as intensity rises
+- sets, bodyweight reps and timed work grow over each run of loading weeks
+- every 4th week counted back from the end of the block is a deload, so each block ends with one
+Training max grows from block to block. It comes from `training_max` when given, else from
+bodyweight times a per-lift ratio scaled by level. Lifts without a ratio (push-ups, lunges)
+are bodyweight work.
+
+Everything is computed as (weeks, exercises) arrays, and loads as (people, weeks, exercises),
+so a year-long program for a whole cohort is a few array operations per template.
+"""
+import functools
+import re
+
+import numpy as np
+import pandas as pd
+
+from fitness_core import WORKOUT_TEMPLATES, generate_workout_plan
+
+MIN_BLOCK_WEEKS, MAX_BLOCK_WEEKS = 8, 16
+DELOAD_EVERY = 4
+DELOAD = {"intensity": 0.9, "sets": 0.6}
+LOAD_STEP_KG = 2.5
+# goal keyword (as in generate_workout_plan) -> intensity start/peak, sets added per loading run,
+# growth of timed work per loading week
+PERIODIZATION = {
+    "Lose": {"intensity": (0.65, 0.80), "extra_sets": 0, "duration_step": 0.08},
+    "Gain": {"intensity": (0.65, 0.82), "extra_sets": 2, "duration_step": 0.03},
+    "default": {"intensity": (0.70, 0.85), "extra_sets": 1, "duration_step": 0.05},
+}
+# training max growth per block
+TM_STEP = {"beginner": 0.05, "intermediate": 0.025, "advanced": 0.0125}
+# rough beginner training max as a fraction of bodyweight; first matching keyword wins
+LOAD_RATIOS = (
+    ("deadlift", 1.2), ("front squat", 0.8), ("goblet squat", 0.3), ("squat", 1.0), ("bench", 0.75),
+    ("incline db", 0.25), ("db press", 0.25), ("overhead press", 0.5), ("power clean", 0.6),
+    ("dumbbell row", 0.3), ("barbell row", 0.6), ("rows", 0.6),
+)
+LEVEL_STRENGTH = {"beginner": 1.0, "intermediate": 1.35, "advanced": 1.7}
+BODYWEIGHT_REP_GROWTH = 0.5     # bodyweight reps at the end of a block vs the start
+MAX_DURATION_GROWTH = 1.5       # cap for timed work without an explicit upper bound
+
+_SETS = re.compile(r"^(?P<name>.+?)\s+(?P<sets>\d+)\s*x\s*(?P<lo>\d+)(?:-(?P<hi>\d+))?\s*(?P<unit>m|s)?$", re.I)
+_TIMED_AFTER = re.compile(r"^(?P<name>.+?)\s+(?P<lo>\d+)(?:-(?P<hi>\d+))?\s*(?P<unit>s|min)$", re.I)
+_TIMED_BEFORE = re.compile(r"^(?P<lo>\d+)(?:-(?P<hi>\d+))?\s*(?P<unit>s|min)\s+(?P<name>.+)$", re.I)
+_UNIT_KIND = {"reps": "strength", "m": "distance", "s": "timed", "min": "timed"}
+
+
+def parse_exercise(text):
+    """Exercise record for one template entry: name, kind, sets, low, high, unit.
+
+    kind is strength (reps), distance (m per set), timed (s or min) or note (sets 0).
+    """
+    text = " ".join(str(text).split())
+    m = _SETS.match(text) or _TIMED_AFTER.match(text) or _TIMED_BEFORE.match(text)
+    if m is None:
+        return {"name": text, "kind": "note", "sets": 0, "low": 0, "high": 0, "unit": ""}
+    parts = m.groupdict()
+    unit = (parts.get("unit") or "reps").lower()
+    low = int(parts["lo"])
+    return {"name": parts["name"].strip(), "kind": _UNIT_KIND[unit], "sets": int(parts.get("sets") or 1),
+            "low": low, "high": int(parts["hi"] or low), "unit": unit}
+
+
+def load_ratio(name):
+    """Beginner training max as a fraction of bodyweight, 0 for bodyweight work"""
+    lower = name.lower()
+    return next((ratio for keyword, ratio in LOAD_RATIOS if keyword in lower), 0.0)
+
+
+def exercise_table(level, goal):
+    """The week's exercises for a level and goal (with generate_workout_plan's additions) as records"""
+    rows = []
+    for day, (session, entries) in enumerate(generate_workout_plan(level, goal), start=1):
+        for entry in entries:
+            if entry.startswith("Progressive overload"):
+                continue    # the program itself is the progression
+            rows.append({"day": day, "session": session, **parse_exercise(entry)})
+    table = pd.DataFrame(rows)
+    table["load_ratio"] = table["name"].map(load_ratio).where(table["kind"] == "strength", 0.0)
+    return table
+
+
+def block_lengths(weeks):
+    """Split weeks into the fewest equal-as-possible blocks of 8-16 weeks"""
+    if weeks < MIN_BLOCK_WEEKS:
+        raise ValueError(f"a program needs at least {MIN_BLOCK_WEEKS} weeks, got {weeks}")
+    n = -(-weeks // MAX_BLOCK_WEEKS)
+    base, extra = divmod(weeks, n)
+    return [base + 1] * extra + [base] * (n - extra)
+
+
+def periodization(goal):
+    return next((v for k, v in PERIODIZATION.items() if k in str(goal)), PERIODIZATION["default"])
+
+
+def week_schedule(weeks, goal, level="beginner"):
+    """One row per week: block, deload, progress through the block, loading step, intensity, TM growth"""
+    lengths = np.array(block_lengths(weeks))
+    block = np.repeat(np.arange(len(lengths)), lengths)
+    starts = np.cumsum(lengths) - lengths
+    pos = np.arange(weeks) - starts[block]
+    length = lengths[block]
+    deload = ((length - 1 - pos) % DELOAD_EVERY == 0) & (pos >= DELOAD_EVERY - 1)
+    # loading step: weeks since the block start or the last deload
+    run_start = (pos == 0) | np.r_[False, deload[:-1]]
+    step = np.arange(weeks) - np.flatnonzero(run_start)[np.cumsum(run_start) - 1]
+    progress = pos / (length - 1)
+    lo, hi = periodization(goal)["intensity"]
+    intensity = (lo + (hi - lo) * progress) * np.where(deload, DELOAD["intensity"], 1.0)
+    return pd.DataFrame({
+        "week": np.arange(1, weeks + 1), "block": block + 1, "deload": deload, "progress": progress,
+        "step": np.where(deload, 0, step), "intensity": intensity,
+        "tm_growth": (1 + TM_STEP.get(level, TM_STEP["beginner"])) ** block,
+    })
+
+
+class Program:
+    """A periodized program for one level and goal: (weeks, exercises) sets and reps, loads per person"""
+
+    def __init__(self, level, goal, weeks=12):
+        self.level, self.goal, self.weeks = level, goal, weeks
+        self.exercises = exercise_table(level, goal)
+        self.schedule = week_schedule(weeks, goal, level)
+        ex, wk, rules = self.exercises, self.schedule, periodization(goal)
+
+        deload = wk["deload"].to_numpy()[:, None]
+        progress = wk["progress"].to_numpy()[:, None]
+        step = wk["step"].to_numpy()[:, None]
+        kind = ex["kind"].to_numpy()[None, :]
+        base_sets = ex["sets"].to_numpy()[None, :]
+        low, high = ex["low"].to_numpy()[None, :], ex["high"].to_numpy()[None, :]
+        loaded = ex["load_ratio"].to_numpy()[None, :] > 0
+
+        # sets: a set more per loading week up to extra_sets (strength and sprints), cut on deloads
+        grows = (kind == "strength") | (kind == "distance")
+        sets = base_sets + grows * np.minimum(step, rules["extra_sets"])
+        sets = np.where(deload, np.maximum(1, np.ceil(base_sets * DELOAD["sets"])), sets)
+        self.sets = np.where(kind == "note", 0, sets).astype(np.int64)
+
+        # reps: loaded lifts walk their range down as intensity rises; bodyweight reps and timed work grow
+        loaded_reps = high - np.round((high - low) * progress)
+        bodyweight_reps = np.round(low * (1 + BODYWEIGHT_REP_GROWTH * progress))
+        cap = np.where(high > low, high, np.floor(low * MAX_DURATION_GROWTH))
+        timed = np.minimum(np.round(low * (1 + rules["duration_step"] * step)), cap)
+        reps = np.select([kind == "distance", loaded, kind == "strength", kind == "timed"],
+                         [low, loaded_reps, bodyweight_reps, timed], 0)
+        self.reps = np.where(deload & (kind != "distance"), np.where(loaded, high, low) * (kind != "note"),
+                             reps).astype(np.int64)
+        self.intensity = wk["intensity"].to_numpy()
+        self.loaded = loaded[0]
+
+    def training_max(self, bodyweight_kg, training_max=None):
+        """(people, exercises) first-block training max: estimated from bodyweight, overridden by name"""
+        bw = np.atleast_1d(np.asarray(bodyweight_kg, dtype=np.float64))
+        ratio = self.exercises["load_ratio"].to_numpy() * LEVEL_STRENGTH.get(self.level, 1.0)
+        tm = bw[:, None] * np.where(self.loaded, ratio, np.nan)[None, :]
+        for j, name in enumerate(self.exercises["name"]):
+            if training_max and name in training_max:
+                tm[:, j] = training_max[name]
+        return tm
+
+    def loads(self, bodyweight_kg, training_max=None):
+        """Working load in kg per week and exercise, rounded to LOAD_STEP_KG; NaN for bodyweight work.
+
+        A scalar bodyweight gives (weeks, exercises); an array of bodyweights (people, weeks, exercises).
+        """
+        tm = self.training_max(bodyweight_kg, training_max).astype(np.float32)
+        steps = (self.intensity * self.schedule["tm_growth"].to_numpy() / LOAD_STEP_KG).astype(np.float32)
+        # float32 and in place: a cohort's loads are memory-bound, and 2.5 kg steps are exact in float32
+        loads = np.multiply(tm[:, None, :], steps[None, :, None])
+        np.round(loads, out=loads)
+        loads *= LOAD_STEP_KG
+        return loads[0] if np.ndim(bodyweight_kg) == 0 else loads
+
+    def volume(self):
+        """(weeks, exercises) total reps (or seconds, minutes, metres) per week"""
+        return self.sets * self.reps
+
+    def to_frame(self, bodyweight_kg=None, training_max=None):
+        """Long table: one row per week and exercise, with loads and tonnage when bodyweight is given"""
+        w, e = self.sets.shape
+        ex = self.exercises.iloc[np.tile(np.arange(e), w)].reset_index(drop=True)
+        wk = self.schedule.iloc[np.repeat(np.arange(w), e)].reset_index(drop=True)
+        frame = pd.DataFrame({
+            "week": wk["week"], "block": wk["block"], "deload": wk["deload"], "day": ex["day"],
+            "session": ex["session"], "exercise": ex["name"], "kind": ex["kind"],
+            "sets": self.sets.ravel(), "reps": self.reps.ravel(), "unit": ex["unit"],
+            "intensity": np.where(self.loaded, self.intensity[:, None], np.nan).ravel(),
+            "volume": self.volume().ravel(),
+        })
+        if bodyweight_kg is not None:
+            loads = self.loads(float(bodyweight_kg), training_max).ravel()
+            frame["load_kg"] = loads
+            frame["tonnage_kg"] = loads * frame["volume"]
+        return frame
+
+
+@functools.lru_cache(maxsize=64)
+def build_program(level, goal, weeks=12):
+    """Program for a level and goal; cached, since it depends only on the templates"""
+    return Program(level if level in WORKOUT_TEMPLATES else "beginner", goal, weeks)
+
+
+def cohort_loads(profiles, weeks=52):
+    """Loads for many people at once, grouped by template.
+
+    profiles has weight_kg, goal and optionally experience (default beginner). Returns
+    {(level, goal): (row positions, Program, (people, weeks, exercises) loads)}.
+    """
+    frame = pd.DataFrame({
+        "level": profiles["experience"] if "experience" in profiles else "beginner",
+        "goal": profiles["goal"], "weight_kg": profiles["weight_kg"],
+    })
+    out = {}
+    for (level, goal), idx in frame.groupby(["level", "goal"], sort=False).indices.items():
+        program = build_program(level, goal, weeks)
+        out[(level, goal)] = (idx, program, program.loads(frame["weight_kg"].to_numpy(dtype=np.float64)[idx]))
+    return out